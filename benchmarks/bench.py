@@ -0,0 +1,361 @@
+# benchmarks/bench.py
+'''
+Бенчмарки основных операций базы. Запуск из корня проекта:
+    python -m benchmarks.bench [--sizes 1000,100000,1000000] [--out bench.json]
+                               [--compare old.json] [--threshold 0.2]
+Таблицы создаются во временном каталоге (PRIMITIVE_DB_DATA), данные
+генерируются с фиксированным seed. Для каждого сценария считаются p50/p99
+задержки, пропускная способность и пик памяти (tracemalloc, отдельным
+прогоном, чтобы трассировка не искажала время).
+'''
+import argparse
+import json as js
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+# Каталог таблиц и мета данные подменяются до импорта базы: constants читает
+# их при импорте
+DATA_DIR = tempfile.mkdtemp(prefix='primitive_db_bench_')
+os.environ['PRIMITIVE_DB_DATA'] = DATA_DIR
+os.environ['PRIMITIVE_DB_META'] = os.path.join(DATA_DIR, 'db_meta.json')
+
+from src.primitive_db import (  # noqa: E402
+    aggregate,
+    catalog,
+    core,
+    parallel,
+    storage,
+    utils,
+)
+from src.primitive_db.cache import create_cacher  # noqa: E402
+from src.primitive_db.columns import column_bytes  # noqa: E402
+from src.primitive_db.decorators import RUN_OPTIONS  # noqa: E402
+from src.primitive_db.index import build_table_indexes  # noqa: E402
+from src.primitive_db.predicate import where_positions  # noqa: E402
+
+TABLE = 'bench'
+COLUMNS = ['name:str', 'age:int', 'active:bool', 'city:str']
+CITIES = [f'city{i}' for i in range(20)]
+# Маленькая таблица для join с основной по городу
+JOIN_TABLE = 'cities'
+JOIN_COLUMNS = ['name:str', 'region:int']
+DEFAULT_SIZES = '1000,100000,1000000'
+# Размер пачки при заполнении таблицы
+LOAD_CHUNK_ROWS = 10000
+# Изменение p50 меньше этого порога (мс) не считается регрессией: шум таймера
+MIN_DELTA_MS = 0.05
+
+
+# Функция генерации строк таблицы
+def generate_rows(rng: random.Random, count: int, start: int = 0) -> list:
+    '''
+    rng - генератор случайных чисел,
+    count - сколько строк,
+    start - номер первой строки (для имен).
+    '''
+    return [
+        (f'user{i}', rng.randrange(100), rng.random() < 0.5, rng.choice(CITIES))
+        for i in range(start, start + count)
+    ]
+
+
+# Функция создания таблицы для бенчмарков
+def build_state(size: int, seed: int) -> dict:
+    '''
+    size - число строк,
+    seed - seed генератора данных.
+    Функция создает таблицу через core.create_table и заполняет ее через
+    core.insert пачками. Время заполнения - отдельный результат insert_bulk.
+    '''
+    metadata = {}
+    for table_name, columns in ((TABLE, COLUMNS), (JOIN_TABLE, JOIN_COLUMNS)):
+        storage.remove_table_files(table_name)
+        catalog.drop_table_options(metadata, table_name)
+        core.create_table(metadata, table_name, list(columns))
+    # Блоки id резервируются в файле мета данных, поэтому таблица должна
+    # быть в нем
+    catalog.save_catalog(metadata)
+    data = utils.load_table_data(TABLE)
+    indexes = build_table_indexes(metadata, TABLE, data)
+    state = {
+        'size': size, 'rng': random.Random(seed), 'metadata': metadata,
+        'data': data, 'indexes': indexes, 'cache': create_cacher(verbose=False),
+    }
+
+    start = time.perf_counter()
+    for chunk_start in range(0, size, LOAD_CHUNK_ROWS):
+        rows = generate_rows(state['rng'], min(LOAD_CHUNK_ROWS, size - chunk_start), chunk_start) # noqa: E501
+        core.insert(metadata, data, state['cache'], TABLE, rows, indexes)
+    state['load_seconds'] = time.perf_counter() - start
+
+    state['join_data'] = utils.load_table_data(JOIN_TABLE)
+    core.insert(metadata, state['join_data'], state['cache'], JOIN_TABLE, [(city, i % 4) for i, city in enumerate(CITIES)]) # noqa: E501
+    core.create_index(metadata, TABLE, 'age', data, indexes, 'sorted')
+    return state
+
+
+# Функция выбора случайного существующего id
+def random_id(state: dict) -> int:
+    ids = state['data']['id']
+    return ids[state['rng'].randrange(len(ids))]
+
+
+# Функция вызова select с выводом в TSV
+def run_select(state: dict, where_clause: dict = None, **options) -> None:
+    core.select(TABLE, state['data'], state['cache'], state['metadata'], where_clause, state['indexes'], output='tsv', **options) # noqa: E501
+
+
+# Функция вызова select с join по городу
+def run_join(state: dict, where_clause: dict = None, **options) -> None:
+    tables = {TABLE: state['data'], JOIN_TABLE: state['join_data']}
+    indexes = {TABLE: state['indexes'], JOIN_TABLE: {}}
+    core.select_join(tables, state['cache'], state['metadata'], {'table': JOIN_TABLE, 'on': ('city', f'{JOIN_TABLE}.name')}, where_clause, indexes, output='tsv', **options) # noqa: E501
+
+
+# Функция сброса кэша таблицы (как после записи)
+def invalidate(state: dict, _) -> None:
+    state['cache']((TABLE,), '', 'update')
+
+
+# Сценарии: name - имя, run(state, i) - измеряемая операция, setup(state, i) -
+# подготовка без замера, repeat - число повторов на 1000 строк, scan - время
+# растет с размером таблицы (число повторов уменьшается), rows - строк за
+# операцию для пропускной способности в строках. Сценарии, которые меняют
+# число строк, идут последними, чтобы чтение мерилось на заявленном размере.
+SCENARIOS = [
+    {'name': 'where_id_index', 'repeat': 500,
+     'setup': lambda state, i: state.__setitem__('key', random_id(state)),
+     'run': lambda state, i: where_positions(state['data'], {'column': 'id', 'op': '=', 'value': state['key']}, state['indexes'])}, # noqa: E501
+    {'name': 'where_range_index', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: where_positions(state['data'], {'column': 'age', 'op': 'between', 'value': (10, 19)}, state['indexes'])}, # noqa: E501
+    {'name': 'where_scan', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: where_positions(state['data'], {'column': 'city', 'op': '=', 'value': 'city3'}, state['indexes'])}, # noqa: E501
+    {'name': 'where_compound', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: where_positions(state['data'], {'op': 'and', 'args': [{'column': 'age', 'op': '<', 'value': 30}, {'column': 'city', 'op': '=', 'value': 'city3'}, {'op': 'not', 'args': [{'column': 'active', 'op': '=', 'value': True}]}]}, state['indexes'])}, # noqa: E501
+    {'name': 'where_scan_parallel', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: parallel.scan_positions(TABLE, state['data'], {'column': 'city', 'op': '=', 'value': 'city3'}, state['indexes'])}, # noqa: E501
+    {'name': 'where_compound_parallel', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: parallel.scan_positions(TABLE, state['data'], {'op': 'and', 'args': [{'column': 'age', 'op': '<', 'value': 30}, {'column': 'city', 'op': '=', 'value': 'city3'}, {'op': 'not', 'args': [{'column': 'active', 'op': '=', 'value': True}]}]}, state['indexes'])}, # noqa: E501
+    {'name': 'select_point_miss', 'repeat': 200,
+     'setup': lambda state, i: state.__setitem__('key', random_id(state)),
+     'run': lambda state, i: run_select(state, {'column': 'id', 'op': '=', 'value': state['key']})}, # noqa: E501
+    {'name': 'select_scan_limit_100', 'repeat': 50, 'scan': True, 'setup': invalidate,
+     'run': lambda state, i: run_select(state, {'column': 'city', 'op': '=', 'value': 'city5'}, limit=100)}, # noqa: E501
+    {'name': 'cache_miss', 'repeat': 50, 'scan': True, 'setup': invalidate,
+     'run': lambda state, i: run_select(state, {'column': 'city', 'op': '=', 'value': 'city7'}, limit=10)}, # noqa: E501
+    {'name': 'cache_hit', 'repeat': 500,
+     'run': lambda state, i: run_select(state, {'column': 'city', 'op': '=', 'value': 'city7'}, limit=10)}, # noqa: E501
+    {'name': 'aggregate_group_by', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: run_select(state, columns=[{'column': 'city'}, {'func': 'count', 'column': '*'}, {'func': 'avg', 'column': 'age'}], group='city')}, # noqa: E501
+    {'name': 'order_topk_10', 'repeat': 50, 'scan': True,
+     'run': lambda state, i: run_select(state, order={'column': 'name', 'desc': True}, limit=10)}, # noqa: E501
+    {'name': 'order_index_walk_100', 'repeat': 200,
+     'run': lambda state, i: run_select(state, order={'column': 'age', 'desc': False}, limit=100)}, # noqa: E501
+    {'name': 'order_sort_where', 'repeat': 20, 'scan': True, 'setup': invalidate,
+     'run': lambda state, i: run_select(state, {'column': 'city', 'op': '=', 'value': 'city3'}, order={'column': 'name', 'desc': False})}, # noqa: E501
+    {'name': 'join_limit_100', 'repeat': 200,
+     'run': lambda state, i: run_join(state, limit=100)},
+    {'name': 'join_aggregate', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: run_join(state, {'column': 'age', 'op': '<', 'value': 50}, columns=[{'column': 'region'}, {'func': 'count', 'column': '*'}, {'func': 'avg', 'column': 'age'}], group='region')}, # noqa: E501
+    {'name': 'update_point', 'repeat': 200,
+     'setup': lambda state, i: state.__setitem__('key', random_id(state)),
+     'run': lambda state, i: core.update(TABLE, state['metadata'], state['cache'], state['data'], [{'column': 'age', 'expr': {'value': i % 100}}], {'column': 'id', 'op': '=', 'value': state['key']}, state['indexes'])}, # noqa: E501
+    {'name': 'update_scan_expr', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: core.update(TABLE, state['metadata'], state['cache'], state['data'], [{'column': 'age', 'expr': {'op': '+', 'args': [{'column': 'age'}, {'value': 1}]}}], {'column': 'city', 'op': '=', 'value': 'city3'}, state['indexes'])}, # noqa: E501
+    {'name': 'save_json', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: utils.save_table_data(TABLE, state['data'])},
+    {'name': 'load_json', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: utils.load_table_data(TABLE)},
+    {'name': 'save_binary', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: storage.save_snapshot(TABLE, state['data'], 'binary')},
+    {'name': 'load_binary_all_columns', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: utils.load_table_data(TABLE).values()},
+    {'name': 'load_binary_one_column', 'repeat': 20, 'scan': True,
+     'run': lambda state, i: utils.load_table_data(TABLE)['age']},
+    {'name': 'insert_row', 'repeat': 200,
+     'run': lambda state, i: core.insert(state['metadata'], state['data'], state['cache'], TABLE, generate_rows(state['rng'], 1, i), state['indexes'])}, # noqa: E501
+    {'name': 'insert_batch_1000', 'repeat': 20, 'scan': True, 'rows': 1000,
+     'setup': lambda state, i: state.__setitem__('batch', generate_rows(state['rng'], 1000, i * 1000)), # noqa: E501
+     'run': lambda state, i: core.insert(state['metadata'], state['data'], state['cache'], TABLE, state['batch'], state['indexes'])}, # noqa: E501
+    {'name': 'delete_point', 'repeat': 100, 'scan': True,
+     'setup': lambda state, i: state.__setitem__('key', random_id(state)),
+     'run': lambda state, i: core.delete(state['data'], TABLE, state['cache'], state['metadata'], {'column': 'id', 'op': '=', 'value': state['key']}, state['indexes'])}, # noqa: E501
+]
+
+
+# Функция вычисления числа повторов сценария
+def scenario_repeat(scenario: dict, size: int) -> int:
+    if not scenario.get('scan'):
+        return scenario['repeat']
+    return max(3, min(scenario['repeat'], scenario['repeat'] * 1000 // size))
+
+
+# Функция замера одного сценария
+def measure(scenario: dict, state: dict) -> dict:
+    '''
+    scenario - сценарий из SCENARIOS,
+    state - состояние таблицы из build_state.
+    Функция возвращает задержки (p50, p99, среднее), пропускную способность
+    и пик памяти одного вызова.
+    '''
+    setup = scenario.get('setup')
+    run = scenario['run']
+    repeat = scenario_repeat(scenario, state['size'])
+
+    samples = []
+    for i in range(repeat):
+        if setup is not None:
+            setup(state, i)
+        start = time.perf_counter()
+        run(state, i)
+        samples.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup(state, repeat)
+    tracemalloc.start()
+    run(state, repeat)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples.sort()
+    mean = statistics.fmean(samples)
+    result = {
+        'size': state['size'],
+        'repeat': repeat,
+        'p50_ms': round(statistics.median(samples) * 1000, 4),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 4), # noqa: E501
+        'mean_ms': round(mean * 1000, 4),
+        'ops_per_s': round(1 / mean, 1) if mean else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+    if 'rows' in scenario:
+        result['rows_per_s'] = round(scenario['rows'] / mean, 1) if mean else None
+    return result
+
+
+# Функция прогона всех сценариев
+def run_benchmarks(sizes: list, seed: int, only: list = None) -> dict:
+    '''
+    sizes - размеры таблиц,
+    seed - seed генератора данных,
+    only - имена сценариев (None - все).
+    '''
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for size in sizes:
+            with redirect_stdout(devnull):
+                state = build_state(size, seed)
+            # Выгрузки столбцов для параллельного скана относятся к прошлой
+            # таблице
+            parallel.forget_table(TABLE)
+            results[f'insert_bulk@{size}'] = {
+                'size': size, 'repeat': 1,
+                'p50_ms': round(state['load_seconds'] * 1000, 4),
+                'rows_per_s': round(size / state['load_seconds'], 1) if state['load_seconds'] else None, # noqa: E501
+                'table_kib': round(sum(map(column_bytes, state['data'].values())) / 1024, 1), # noqa: E501
+            }
+            report(f'insert_bulk@{size}', results[f'insert_bulk@{size}'])
+            for scenario in SCENARIOS:
+                if only and scenario['name'] not in only:
+                    continue
+                with redirect_stdout(devnull):
+                    result = measure(scenario, state)
+                key = f'{scenario["name"]}@{size}'
+                results[key] = result
+                report(key, result)
+    return results
+
+
+# Функция вывода результата сценария
+def report(key: str, result: dict) -> None:
+    extra = f'  {result["rows_per_s"]:.0f} строк/с' if result.get('rows_per_s') else ''
+    p99 = f'p99 {result["p99_ms"]:10.3f} мс' if 'p99_ms' in result else ''
+    peak = f'  пик {result["peak_kib"]:.0f} КиБ' if 'peak_kib' in result else ''
+    table = f'  таблица {result["table_kib"]:.0f} КиБ' if 'table_kib' in result else ''
+    print(f'{key:32} p50 {result["p50_ms"]:10.3f} мс  {p99}{peak}{extra}{table}', flush=True) # noqa: E501
+
+
+# Функция сравнения двух прогонов
+def compare(old: dict, new: dict, threshold: float, min_delta: float = MIN_DELTA_MS) -> list: # noqa: E501
+    '''
+    old, new - результаты (раздел results) двух прогонов,
+    threshold - допустимый рост p50 (0.2 - на 20%),
+    min_delta - рост p50 в мс, который меньше этого, не считается регрессией.
+    Функция печатает изменения и возвращает имена сценариев с регрессией.
+    '''
+    regressions = []
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key]['p50_ms'], new[key]['p50_ms']
+        change = (after - before) / before if before else 0.0
+        regressed = change > threshold and after - before > min_delta
+        mark = '  РЕГРЕССИЯ' if regressed else ''
+        print(f'{key:32} {before:10.3f} -> {after:10.3f} мс ({change:+.1%}){mark}')
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарки основных операций базы.') # noqa: E501
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры таблиц через запятую') # noqa: E501
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--only', default='', help='сценарии через запятую (по умолчанию все)') # noqa: E501
+    parser.add_argument('--out', help='куда записать результаты в JSON')
+    parser.add_argument('--compare', metavar='FILE', help='JSON прошлого прогона для сравнения') # noqa: E501
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимый рост p50 (доля, по умолчанию 0.2)') # noqa: E501
+    parser.add_argument('--min-delta', type=float, default=MIN_DELTA_MS, help='рост p50 в мс, который не считается регрессией') # noqa: E501
+    parser.add_argument('--no-wal', action='store_true', help='не вести журнал изменений') # noqa: E501
+    parser.add_argument('--workers', type=int, help='процессов параллельного скана (по умолчанию по числу ядер)') # noqa: E501
+    args = parser.parse_args()
+
+    RUN_OPTIONS['assume_yes'] = True
+    RUN_OPTIONS['log_time'] = False
+    RUN_OPTIONS['wal'] = not args.no_wal
+    RUN_OPTIONS['workers'] = args.workers
+    sizes = [int(size) for size in args.sizes.split(',')]
+    only = [name for name in args.only.split(',') if name]
+
+    try:
+        results = run_benchmarks(sizes, args.seed, only)
+    finally:
+        parallel.shutdown_parallel()
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    report_data = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': aggregate.np is not None,
+            'wal': RUN_OPTIONS['wal'],
+            'workers': parallel.scan_workers(),
+            'seed': args.seed,
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as out_file:
+            js.dump(report_data, out_file, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as old_file:
+            old = js.load(old_file)['results']
+        regressions = compare(old, results, args.threshold, args.min_delta)
+        if regressions:
+            print(f'Регрессии больше {args.threshold:.0%}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
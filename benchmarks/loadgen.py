@@ -0,0 +1,184 @@
+# benchmarks/loadgen.py
+'''
+Генератор нагрузки на сервер базы (database serve). Запуск из корня проекта:
+    python -m benchmarks.loadgen [--port 5433 | --socket PATH] [--clients 8]
+                                 [--requests 1000] [--pipeline 1] [--out load.json]
+Создает таблицу loadgen, заполняет ее и запускает несколько клиентов
+одновременно. Каждый клиент отправляет смесь запросов (поиск по id,
+диапазон по индексу, агрегат со сканом, вставка) пачками по --pipeline
+команд без ожидания ответов. Выводятся пропускная способность и задержки
+(p50/p90/p99) по всем запросам и по видам.
+'''
+import argparse
+import asyncio
+import json as js
+import random
+import statistics
+import sys
+import time
+
+from src.primitive_db.client import open_connection, read_response, send_commands
+from src.primitive_db.constants import SERVER_HOST, SERVER_PORT
+
+TABLE = 'loadgen'
+# Размер пачки строк при заполнении таблицы
+LOAD_CHUNK_ROWS = 1000
+# Смесь запросов по умолчанию: вид=вес
+DEFAULT_MIX = 'point=60,range=20,scan=10,insert=10'
+
+
+# Функция получения команды заданного вида
+def make_command(kind: str, rng: random.Random, rows: int, number: int) -> str:
+    '''
+    kind - вид запроса (point, range, scan или insert),
+    rng - генератор случайных чисел клиента,
+    rows - число строк в таблице после заполнения,
+    number - номер запроса (для уникальных значений вставки).
+    '''
+    match kind:
+        case 'point':
+            return f'select from {TABLE} where id = {rng.randint(1, rows)}'
+        case 'range':
+            low = rng.randint(0, 97)
+            return f'select from {TABLE} where age between {low} and {low + 2} limit 10' # noqa: E501
+        case 'scan':
+            return f'select count(*), avg(age) from {TABLE} where active = true and age > {rng.randint(0, 99)}' # noqa: E501
+        case 'insert':
+            return f'insert into {TABLE} values ("load{number}", {rng.randint(0, 99)}, {rng.choice(["true", "false"])})' # noqa: E501
+    raise ValueError(f'неизвестный вид запроса {kind}.')
+
+
+# Функция подготовки таблицы
+async def prepare_table(address: dict, rows: int, seed: int) -> None:
+    '''
+    address - адрес сервера (аргументы client.open_connection),
+    rows - сколько строк вставить,
+    seed - seed данных.
+    '''
+    rng = random.Random(seed)
+    commands = [
+        f'drop_table {TABLE}',
+        f'create_table {TABLE} name:str age:int active:bool',
+        f'create_index {TABLE} age sorted',
+    ]
+    for start in range(0, rows, LOAD_CHUNK_ROWS):
+        values = ', '.join(
+            f'("user{i}", {rng.randint(0, 99)}, {rng.choice(["true", "false"])})'
+            for i in range(start, min(rows, start + LOAD_CHUNK_ROWS))
+        )
+        commands.append(f'insert into {TABLE} values {values}')
+    reader, writer = await open_connection(**address)
+    try:
+        await send_commands(reader, writer, commands)
+    finally:
+        writer.close()
+
+
+# Функция работы одного клиента
+async def run_client(address: dict, mix: list, requests: int, pipeline: int, rows: int, seed: int) -> list: # noqa: E501
+    '''
+    address - адрес сервера (аргументы client.open_connection),
+    mix - виды запросов с весами [(вид, вес), ...],
+    requests - сколько запросов отправить,
+    pipeline - сколько запросов отправлять, не дожидаясь ответов,
+    rows - число строк таблицы,
+    seed - seed клиента.
+    Функция возвращает [(вид, задержка в секундах, ошибка ли), ...].
+    Задержка запроса в пачке - от отправки пачки до получения его ответа.
+    '''
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix)
+    reader, writer = await open_connection(**address)
+    samples = []
+    try:
+        for batch_start in range(0, requests, pipeline):
+            batch = rng.choices(kinds, weights, k=min(pipeline, requests - batch_start))
+            commands = [make_command(kind, rng, rows, seed * requests + batch_start + n) for n, kind in enumerate(batch)] # noqa: E501
+            sent = time.perf_counter()
+            writer.write(''.join(command + '\n' for command in commands).encode('utf-8')) # noqa: E501
+            await writer.drain()
+            for kind in batch:
+                output = await read_response(reader)
+                samples.append((kind, time.perf_counter() - sent, 'ошибка' in output.lower())) # noqa: E501
+    finally:
+        writer.close()
+    return samples
+
+
+# Функция подсчета статистики задержек
+def summarize(latencies: list, elapsed: float, errors: int) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(share: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1000, 3) # noqa: E501
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'ops_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': percentile(0.5),
+        'p90_ms': percentile(0.9),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    }
+
+
+# Функция вывода строки отчета
+def report(name: str, result: dict) -> None:
+    print(f'{name:8} {result["requests"]:8} запр. {result["ops_per_s"]:10.1f} запр/с  p50 {result["p50_ms"]:8.3f} мс  p90 {result["p90_ms"]:8.3f} мс  p99 {result["p99_ms"]:8.3f} мс  макс {result["max_ms"]:8.3f} мс  ошибок {result["errors"]}', flush=True) # noqa: E501
+
+
+# Функция прогона нагрузки
+async def run_load(address: dict, clients: int, requests: int, pipeline: int, rows: int, mix: list, seed: int) -> dict: # noqa: E501
+    await prepare_table(address, rows, seed)
+    start = time.perf_counter()
+    per_client = await asyncio.gather(*(
+        run_client(address, mix, requests, pipeline, rows, seed + client + 1)
+        for client in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for client_samples in per_client for sample in client_samples]
+    results = {'all': summarize([latency for _, latency, _ in samples], elapsed, sum(error for _, _, error in samples))} # noqa: E501
+    for kind, _ in mix:
+        kind_samples = [sample for sample in samples if sample[0] == kind]
+        if kind_samples:
+            results[kind] = summarize([latency for _, latency, _ in kind_samples], elapsed, sum(error for _, _, error in kind_samples)) # noqa: E501
+    return {'elapsed_s': round(elapsed, 3), 'results': results}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Генератор нагрузки на сервер базы.') # noqa: E501
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--socket', metavar='PATH', help='Unix сокет сервера вместо TCP') # noqa: E501
+    parser.add_argument('--clients', type=int, default=8, help='число одновременных клиентов') # noqa: E501
+    parser.add_argument('--requests', type=int, default=1000, help='запросов на клиента') # noqa: E501
+    parser.add_argument('--pipeline', type=int, default=1, help='запросов в пачке без ожидания ответов') # noqa: E501
+    parser.add_argument('--rows', type=int, default=10000, help='строк в таблице перед нагрузкой') # noqa: E501
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'смесь запросов вид=вес через запятую (по умолчанию {DEFAULT_MIX})') # noqa: E501
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--out', help='куда записать результаты в JSON')
+    args = parser.parse_args()
+
+    mix = [(kind, float(weight)) for kind, weight in (item.split('=') for item in args.mix.split(','))] # noqa: E501
+    address = {'host': args.host, 'port': args.port, 'socket_path': args.socket}
+    try:
+        load = asyncio.run(run_load(address, args.clients, args.requests, max(1, args.pipeline), args.rows, mix, args.seed)) # noqa: E501
+    except (ConnectionError, OSError) as error:
+        print(f'Ошибка соединения: {error}')
+        return 1
+
+    print(f'Клиентов: {args.clients}, конвейер: {args.pipeline}, время: {load["elapsed_s"]} с') # noqa: E501
+    for name, result in load['results'].items():
+        report(name, result)
+    if args.out:
+        load['meta'] = {key: getattr(args, key) for key in ('clients', 'requests', 'pipeline', 'rows', 'mix', 'seed')} # noqa: E501
+        with open(args.out, 'w', encoding='utf-8') as out_file:
+            js.dump(load, out_file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
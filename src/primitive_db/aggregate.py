@@ -0,0 +1,180 @@
+# src/primitive_db/aggregate.py
+from collections import defaultdict
+from itertools import chain
+
+from .columns import gather
+from .decorators import timed
+from .metrics import count
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Агрегатные функции select
+AGGREGATES = ['count', 'sum', 'min', 'max', 'avg']
+# Функции, которым нужен столбец типа int
+NUMERIC_AGGREGATES = ['sum', 'avg']
+
+
+# Функция получения заголовка столбца результата
+def item_name(item: dict) -> str:
+    '''
+    item - столбец из списка select: {'column': столбец} или
+    {'func': функция, 'column': столбец или *}.
+    '''
+    if item.get('func') is None:
+        return item['column']
+    return f'{item["func"]}({item["column"]})'
+
+
+# Функция проверки, есть ли в списке select агрегатные функции
+def is_aggregate(items: list) -> bool:
+    return any(item.get('func') is not None for item in items)
+
+
+# Функция получения значений столбца для группы строк
+def group_values(column: list, positions) -> list:
+    '''
+    column - значения столбца,
+    positions - позиции строк группы.
+    Если группа - вся таблица, столбец используется как есть, без копии.
+    '''
+    if isinstance(positions, range) and len(positions) == len(column):
+        return column
+    return list(gather(column, positions))
+
+
+# Функция вычисления агрегатной функции по значениям
+def aggregate_values(func: str, values: list):
+    '''
+    func - агрегатная функция,
+    values - значения столбца в группе.
+    Каждая функция - один проход по списку на стороне C. Для пустой выборки
+    count и sum возвращают 0, остальные - None.
+    '''
+    match func:
+        case 'count':
+            return len(values)
+        case 'sum':
+            return sum(values)
+        case 'min':
+            return min(values, default=None)
+        case 'max':
+            return max(values, default=None)
+        case 'avg':
+            return sum(values) / len(values) if values else None
+
+
+# Функция расположения групп для NumPy
+def group_layout(groups: list) -> tuple:
+    '''
+    groups - позиции строк по группам.
+    Функция возвращает (позиции всех строк подряд по группам, начала групп,
+    размеры групп) в виде массивов NumPy. Если группа одна и это вся
+    таблица, позиции не нужны (None).
+    '''
+    sizes = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+    starts = np.zeros(len(groups), dtype=np.int64)
+    np.cumsum(sizes[:-1], out=starts[1:])
+    if len(groups) == 1 and isinstance(groups[0], range) and groups[0].start == 0:
+        return None, starts, sizes
+    order = np.fromiter(chain.from_iterable(groups), dtype=np.int64, count=int(sizes.sum())) # noqa: E501
+    return order, starts, sizes
+
+
+# Функция перевода столбца int в массив NumPy в порядке групп
+def group_array(column: list, layout: tuple):
+    '''
+    column - значения столбца типа int,
+    layout - расположение групп из group_layout.
+    '''
+    order = layout[0]
+    values = np.fromiter(column, dtype=np.int64, count=len(column))
+    return values if order is None else values[order]
+
+
+# Функция вычисления агрегатной функции по группам через NumPy
+def aggregate_array(func: str, values, layout: tuple) -> list:
+    '''
+    func - агрегатная функция (кроме count),
+    values - массив из group_array,
+    layout - расположение групп из group_layout.
+    Функция считает функцию сразу для всех групп одной операцией reduceat.
+    '''
+    _, starts, sizes = layout
+    match func:
+        case 'sum':
+            return np.add.reduceat(values, starts).tolist()
+        case 'min':
+            return np.minimum.reduceat(values, starts).tolist()
+        case 'max':
+            return np.maximum.reduceat(values, starts).tolist()
+        case 'avg':
+            return (np.add.reduceat(values, starts) / sizes).tolist()
+
+
+# Функция разбиения выборки на группы
+def group_positions(column: list, positions, index: dict = None) -> tuple:
+    '''
+    column - значения столбца group by,
+    positions - позиции строк выборки,
+    index - хэш-индекс по столбцу, если выборка - вся таблица.
+    Функция возвращает (значения групп, позиции строк по группам). Группы
+    собираются хэш-агрегацией за один проход, а если есть хэш-индекс, то
+    берутся из него готовыми.
+    '''
+    if index is not None and index['kind'] == 'hash':
+        return list(index['map'].keys()), list(index['map'].values())
+
+    groups = defaultdict(list)
+    for key, position in zip(gather(column, positions), positions):
+        groups[key].append(position)
+    return list(groups.keys()), list(groups.values())
+
+
+# Функция вычисления агрегатного запроса
+@timed('aggregate')
+def aggregate(table_data: dict, schema: dict, positions, items: list, group: str = None, index: dict = None) -> dict: # noqa: E501
+    '''
+    table_data - данные таблицы,
+    schema - схема таблицы {столбец: тип},
+    positions - позиции строк выборки (после where),
+    items - столбцы результата (см. item_name),
+    group - столбец group by (None - вся выборка одна группа),
+    index - хэш-индекс по столбцу group by, если выборка - вся таблица.
+    Функция возвращает результат столбцами {заголовок: [значения]}, поэтому
+    его можно вывести так же, как обычную таблицу. Строки таблицы не
+    копируются: каждая функция проходит только по своему столбцу.
+    Если установлен NumPy, sum, min, max и avg по столбцам int считаются
+    векторно.
+    '''
+    count('rows_scanned', len(positions))
+    if group is None:
+        keys, groups = [None], [positions]
+    else:
+        keys, groups = group_positions(table_data[group], positions, index)
+
+    vectorized = np is not None and len(positions) > 0
+    layout = None
+    # Значения столбца по группам готовятся один раз на все его функции
+    prepared = {}
+    result = {}
+    for item in items:
+        func, column_name = item.get('func'), item['column']
+        if func is None:
+            values = keys
+        elif func == 'count':
+            values = list(map(len, groups))
+        elif vectorized and schema[column_name] == 'int':
+            layout = layout or group_layout(groups)
+            if column_name not in prepared:
+                prepared[column_name] = group_array(table_data[column_name], layout)
+            values = aggregate_array(func, prepared[column_name], layout)
+        else:
+            if column_name not in prepared:
+                column = table_data[column_name]
+                prepared[column_name] = [group_values(column, rows) for rows in groups] # noqa: E501
+            values = [aggregate_values(func, group_rows) for group_rows in prepared[column_name]] # noqa: E501
+        result[item_name(item)] = values
+    return result
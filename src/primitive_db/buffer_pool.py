@@ -0,0 +1,336 @@
+# src/primitive_db/buffer_pool.py
+import time
+from collections import OrderedDict
+
+from .constants import CHECKPOINT_EVERY_WRITES, CHECKPOINT_INTERVAL, POOL_MAX_BYTES
+from .decorators import RUN_OPTIONS
+from .index import build_table_indexes
+from .locks import (
+    acquire_lock,
+    file_version,
+    release_lock,
+    table_lock,
+    table_lock_path,
+)
+from .parallel import forget_table
+from .storage import LazyTable, table_file
+from .transaction import in_transaction
+from .utils import estimate_size, load_table_data, row_count
+from .wal import compact, log_path, needs_compaction, replay
+
+
+# Функция создания буферного пула
+def create_buffer_pool(max_bytes: int = POOL_MAX_BYTES,
+                       flush_every: int = CHECKPOINT_EVERY_WRITES,
+                       flush_interval: float = CHECKPOINT_INTERVAL) -> dict:
+    '''
+    max_bytes - бюджет памяти на загруженные таблицы,
+    flush_every - через сколько изменений сбрасывать грязные таблицы на диск,
+    flush_interval - через сколько секунд сбрасывать грязные таблицы на диск.
+    Функция создает пул, в котором таблицы хранятся в памяти между командами.
+    Порядок ключей в tables - порядок использования (LRU). В versions
+    хранятся версии файлов таблицы, с которыми совпадает ее копия в памяти,
+    в pinned - таблицы, которые держатся под исключительной блокировкой до
+    записи на диск (пакетный режим без журнала).
+    '''
+    return {
+        'tables': OrderedDict(),
+        'indexes': {},
+        'sizes': {},
+        'measured': {},
+        'versions': {},
+        'partial': set(),
+        'dirty': set(),
+        'pinned': set(),
+        'writes': 0,
+        'last_flush': time.monotonic(),
+        'max_bytes': max_bytes,
+        'flush_every': flush_every,
+        'flush_interval': flush_interval,
+    }
+
+
+# Функция получения таблицы из пула
+def get_table(pool: dict, table_name: str) -> dict:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция возвращает таблицу из памяти, а если ее там нет, то загружает
+    ее снимок с диска один раз, применяет к нему журнал и оставляет в пуле.
+    Вызывающий держит блокировку таблицы (см. locks.table_lock).
+    '''
+    tables = pool['tables']
+    if table_name in tables:
+        tables.move_to_end(table_name)
+        # Столбцы бинарных таблиц загружаются лениво, поэтому размер растет
+        if table_name in pool['partial']:
+            measure_table(pool, table_name)
+        return tables[table_name]
+
+    table_data = load_table_data(table_name=table_name)
+    if not table_data:
+        return table_data
+
+    if replay(table_name, table_data):
+        pool['dirty'].add(table_name)
+    tables[table_name] = table_data
+    pool['versions'][table_name] = table_version(table_name)
+    measure_table(pool, table_name)
+    evict(pool)
+    return table_data
+
+
+# Функция получения версии файлов таблицы на диске
+def table_version(table_name: str) -> tuple:
+    '''
+    table_name - имя таблицы.
+    Функция возвращает (версия снимка, версия журнала) - см. locks.file_version.
+    Это несколько вызовов stat, без чтения файлов.
+    '''
+    return (file_version(table_file(table_name)), file_version(log_path(table_name)))
+
+
+# Функция проверки таблицы в пуле на изменения другими процессами
+def refresh_table(pool: dict, table_name: str) -> bool:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция сравнивает версию файлов таблицы с той, что была при загрузке
+    или последней записи этим процессом. Если другой процесс только дописал
+    журнал, к копии в памяти применяются новые записи журнала, иначе
+    (новый снимок) таблица забывается и будет загружена заново. Возвращает
+    True, если таблица изменилась. Вызывающий держит блокировку таблицы.
+    '''
+    if table_name not in pool['tables']:
+        return False
+    known = pool['versions'].get(table_name)
+    version = table_version(table_name)
+    if version == known:
+        return False
+
+    snapshot, log = version
+    known_snapshot, known_log = known
+    appended = log is not None and (known_log is None or (log[0] == known_log[0] and log[2] > known_log[2])) # noqa: E501
+    if snapshot is None or snapshot != known_snapshot or not appended:
+        discard_table(pool, table_name)
+        return True
+
+    replay(table_name, pool['tables'][table_name], 0 if known_log is None else known_log[2]) # noqa: E501
+    pool['indexes'].pop(table_name, None)
+    forget_table(table_name)
+    pool['versions'][table_name] = table_version(table_name)
+    measure_table(pool, table_name)
+    return True
+
+
+# Функция оценки памяти таблицы в пуле
+def measure_table(pool: dict, table_name: str) -> None:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция оценивает память таблицы по выборке значений и запоминает,
+    при каком числе строк это сделано: между оценками размер после записи
+    пересчитывается пропорционально числу строк за O(1).
+    '''
+    table_data = pool['tables'][table_name]
+    size = estimate_size(table_data)
+    pool['sizes'][table_name] = size
+    pool['measured'][table_name] = (size, row_count(table_data))
+    if isinstance(table_data, LazyTable) and table_data.pending:
+        pool['partial'].add(table_name)
+    else:
+        pool['partial'].discard(table_name)
+
+
+# Функция получения индексов таблицы
+def get_indexes(pool: dict, metadata: dict, table_name: str) -> dict:
+    '''
+    pool - буферный пул,
+    metadata - текущие мета данные,
+    table_name - имя таблицы.
+    Функция возвращает индексы загруженной таблицы, строя их при первом
+    обращении. Индексы живут в пуле столько же, сколько сама таблица.
+    '''
+    if table_name not in pool['indexes']:
+        pool['indexes'][table_name] = build_table_indexes(
+            metadata, table_name, pool['tables'][table_name]
+        )
+    return pool['indexes'][table_name]
+
+
+# Функция пометки таблицы как измененной
+def mark_dirty(pool: dict, table_name: str) -> None:
+    '''
+    pool - буферный пул,
+    table_name - имя измененной таблицы.
+    Функция помечает таблицу как измененную (ее изменения уже лежат в журнале,
+    но еще не в снимке) и при необходимости запускает сжатие журнала,
+    контрольную точку или вытеснение.
+    '''
+    if table_name not in pool['tables']:
+        return
+    pool['dirty'].add(table_name)
+    pool['versions'][table_name] = table_version(table_name)
+    forget_table(table_name)
+    # Без журнала изменения есть только в памяти: до записи на диск другие
+    # процессы не должны ни читать, ни менять таблицу
+    if not RUN_OPTIONS['wal'] and table_name not in pool['pinned']:
+        acquire_lock(table_lock_path(table_name), exclusive=True)
+        pool['pinned'].add(table_name)
+    size, measured_rows = pool['measured'][table_name]
+    rows = row_count(pool['tables'][table_name])
+    if rows > 2 * measured_rows:
+        measure_table(pool, table_name)
+    else:
+        pool['sizes'][table_name] = size * rows // max(measured_rows, 1)
+    pool['writes'] += 1
+    if needs_compaction(table_name):
+        flush_table(pool, table_name)
+    if pool['writes'] >= pool['flush_every']:
+        checkpoint(pool)
+    evict(pool)
+
+
+# Функция сброса одной таблицы на диск
+def flush_table(pool: dict, table_name: str) -> None:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция сжимает журнал таблицы в снимок, если она была изменена.
+    Снимок пишется под исключительной блокировкой и только после того, как
+    в память применены записи журнала, дописанные другими процессами.
+    Таблица открытой транзакции не пишется: в памяти у нее есть
+    незафиксированные изменения.
+    '''
+    if table_name not in pool['dirty'] or in_transaction(table_name):
+        return
+    with table_lock(table_name, exclusive=True):
+        refresh_table(pool, table_name)
+        if table_name in pool['dirty']:
+            compact(table_name, pool['tables'][table_name])
+            pool['dirty'].discard(table_name)
+            pool['versions'][table_name] = table_version(table_name)
+            measure_table(pool, table_name)
+    unpin_table(pool, table_name)
+
+
+# Функция снятия удерживаемой блокировки таблицы
+def unpin_table(pool: dict, table_name: str) -> None:
+    if table_name in pool['pinned']:
+        pool['pinned'].discard(table_name)
+        release_lock(table_lock_path(table_name))
+
+
+# Функция принудительного сжатия журнала таблицы
+def vacuum(pool: dict, table_name: str) -> bool:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция сворачивает журнал таблицы в снимок независимо от его размера.
+    '''
+    table_data = get_table(pool, table_name)
+    if not table_data:
+        return False
+    pool['dirty'].add(table_name)
+    flush_table(pool, table_name)
+    return True
+
+
+# Функция контрольной точки
+def checkpoint(pool: dict) -> None:
+    '''
+    pool - буферный пул.
+    Функция записывает на диск все измененные таблицы и сбрасывает счетчики.
+    '''
+    for table_name in list(pool['dirty']):
+        flush_table(pool, table_name)
+    pool['writes'] = 0
+    pool['last_flush'] = time.monotonic()
+
+
+# Функция проверки таймера контрольной точки
+def maybe_checkpoint(pool: dict) -> None:
+    '''
+    pool - буферный пул.
+    Функция запускает контрольную точку, если с прошлой прошло больше
+    flush_interval секунд и есть измененные таблицы.
+    '''
+    if not pool['dirty']:
+        return
+    if time.monotonic() - pool['last_flush'] >= pool['flush_interval']:
+        checkpoint(pool)
+
+
+# Функция вытеснения холодных таблиц
+def evict(pool: dict) -> None:
+    '''
+    pool - буферный пул.
+    Функция вытесняет давно не используемые таблицы, пока пул не уложится
+    в бюджет памяти. Измененные таблицы перед вытеснением записываются на диск.
+    Последняя использованная таблица и таблицы открытых транзакций не
+    вытесняются никогда.
+    '''
+    tables = pool['tables']
+    for table_name in list(tables)[:-1]:
+        if sum(pool['sizes'].values()) <= pool['max_bytes']:
+            break
+        if in_transaction(table_name):
+            continue
+        flush_table(pool, table_name)
+        del tables[table_name]
+        del pool['sizes'][table_name]
+        pool['measured'].pop(table_name, None)
+        pool['versions'].pop(table_name, None)
+        pool['partial'].discard(table_name)
+        pool['indexes'].pop(table_name, None)
+        forget_table(table_name)
+
+
+# Функция учета зафиксированной транзакции
+def commit_tables(pool: dict, table_names: list) -> None:
+    '''
+    pool - буферный пул,
+    table_names - таблицы, изменения которых только что дописаны в журналы.
+    Функция запоминает новые версии файлов (это свои записи, перечитывать
+    их не нужно) и при необходимости сжимает журналы.
+    '''
+    for table_name in table_names:
+        if table_name not in pool['tables']:
+            continue
+        pool['versions'][table_name] = table_version(table_name)
+        if needs_compaction(table_name):
+            flush_table(pool, table_name)
+    evict(pool)
+
+
+# Функция учета отмененной транзакции
+def rollback_tables(pool: dict, table_names: list) -> None:
+    '''
+    pool - буферный пул,
+    table_names - таблицы, изменения которых только что отменены.
+    Индексы этих таблиц перестраиваются при следующем обращении.
+    '''
+    for table_name in table_names:
+        if table_name not in pool['tables']:
+            continue
+        pool['indexes'].pop(table_name, None)
+        forget_table(table_name)
+        measure_table(pool, table_name)
+
+
+# Функция удаления таблицы из пула без записи
+def discard_table(pool: dict, table_name: str) -> None:
+    '''
+    pool - буферный пул,
+    table_name - имя таблицы.
+    Функция забывает таблицу (например, после drop_table), ничего не записывая.
+    '''
+    pool['tables'].pop(table_name, None)
+    pool['indexes'].pop(table_name, None)
+    pool['sizes'].pop(table_name, None)
+    pool['measured'].pop(table_name, None)
+    pool['versions'].pop(table_name, None)
+    pool['partial'].discard(table_name)
+    pool['dirty'].discard(table_name)
+    forget_table(table_name)
+    unpin_table(pool, table_name)
@@ -0,0 +1,147 @@
+# src/primitive_db/bulk.py
+import csv
+import json as js
+import time
+from itertools import islice
+from pathlib import Path
+
+from .constants import IMPORT_CHUNK_ROWS
+from .core import insert_rows
+from .decorators import handle_db_errors, timed
+from .index import build_index
+from .metrics import count
+
+# Текстовые значения, которые в CSV понимаются как bool
+BOOL_VALUES = {
+    'true': True, '1': True, 'yes': True, 'да': True,
+    'false': False, '0': False, 'no': False, 'нет': False,
+}
+
+
+# Функция приведения столбца значений из CSV к типу схемы
+def convert_column(values: tuple, type_name: str) -> list:
+    '''
+    values - значения одного столбца пачки,
+    type_name - тип столбца из схемы.
+    Функция приводит строки к типу столбца (int, bool или str) целым
+    столбцом за раз.
+    '''
+    if type_name == 'int':
+        return list(map(int, values))
+    if type_name == 'bool':
+        bad = set(map(str.lower, map(str.strip, values))) - BOOL_VALUES.keys()
+        if bad:
+            raise ValueError(f'значение "{bad.pop()}" не является bool.')
+        return [BOOL_VALUES[value.strip().lower()] for value in values]
+    return list(values)
+
+
+# Функция чтения CSV файла пачками строк
+def read_csv_chunks(filepath: Path, schema: dict, chunk_rows: int):
+    '''
+    filepath - путь до .csv файла с заголовком,
+    schema - схема таблицы,
+    chunk_rows - размер пачки.
+    Функция по первой строке сопоставляет столбцы файла со схемой
+    (столбец id, если он есть, игнорируется) и отдает пачки приведенных
+    к типам схемы строк, не читая файл целиком.
+    '''
+    columns = list(schema.keys())[1:]
+    with open(filepath, encoding='utf-8', newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        header = [name.strip().lower() for name in next(reader)]
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f'в заголовке файла нет столбцов: {", ".join(missing)}.')
+        order = [header.index(name) for name in columns]
+        types = [schema[name] for name in columns]
+
+        while True:
+            chunk = list(islice(reader, chunk_rows))
+            if not chunk:
+                return
+            if any(len(line) != len(header) for line in chunk):
+                raise ValueError('число значений в строке не совпадает с заголовком.') # noqa: E501
+            file_columns = list(zip(*chunk))
+            yield list(zip(*(
+                convert_column(file_columns[i], type_name)
+                for i, type_name in zip(order, types)
+            )))
+
+
+# Функция чтения JSONL файла пачками строк
+def read_jsonl_chunks(filepath: Path, schema: dict, chunk_rows: int):
+    '''
+    filepath - путь до .jsonl файла,
+    schema - схема таблицы,
+    chunk_rows - размер пачки.
+    Каждая строка файла - объект {столбец: значение} (id игнорируется) или
+    массив значений в порядке схемы без id.
+    '''
+    columns = list(schema.keys())[1:]
+    with open(filepath, encoding='utf-8') as jsonl_file:
+        lines = (line for line in jsonl_file if line.strip())
+        while True:
+            chunk = list(islice(lines, chunk_rows))
+            if not chunk:
+                return
+            rows = []
+            for line in chunk:
+                record = js.loads(line)
+                if isinstance(record, dict):
+                    rows.append(tuple(record[name] for name in columns))
+                else:
+                    rows.append(tuple(record))
+            yield rows
+
+
+# Функция импорта данных в таблицу из файла
+@handle_db_errors
+@timed('import')
+def import_table(metadata: dict, data: dict, cache, table_name: str, filepath: str, indexes: dict = None, chunk_rows: int = IMPORT_CHUNK_ROWS) -> dict: # noqa: E501
+    '''
+    metadata - текущие метаданные БД,
+    data - данные таблицы,
+    table_name - имя таблицы,
+    filepath - путь до .csv или .jsonl файла,
+    indexes - индексы таблицы,
+    chunk_rows - размер пачки.
+    Функция потоково читает файл пачками и проводит каждую пачку через ту же
+    проверку типов, что и insert. Каждая пачка сохраняется одной записью.
+    Индексы не поддерживаются по строкам, а перестраиваются один раз в конце.
+    '''
+    table_name_clean = table_name.strip().lower()
+    if table_name_clean not in metadata.keys():
+        print(f'Ошибка: таблицы с именем {table_name_clean} не существует.')
+        return data
+
+    path = Path(filepath)
+    match path.suffix.lower():
+        case '.csv':
+            chunks = read_csv_chunks(path, metadata[table_name_clean], chunk_rows)
+        case '.jsonl':
+            chunks = read_jsonl_chunks(path, metadata[table_name_clean], chunk_rows)
+        case _:
+            print('Ошибка: поддерживается импорт только из .csv и .jsonl файлов.')
+            return data
+
+    start_time = time.monotonic()
+    imported = 0
+    try:
+        for rows in chunks:
+            if insert_rows(metadata, data, cache, table_name_clean, rows) is None:
+                print(f'Импорт остановлен на пачке, начинающейся со строки {imported + 1}.') # noqa: E501
+                break
+            imported += len(rows)
+    except (ValueError, KeyError, IndexError, TypeError) as error:
+        print(f'Ошибка валидации в пачке после строки {imported}: {error}')
+    finally:
+        if imported and indexes is not None:
+            for column, index in indexes.items():
+                indexes[column] = build_index(data[column], index['kind'])
+
+    count('bytes_read', path.stat().st_size)
+    elapsed = time.monotonic() - start_time
+    speed = imported / elapsed if elapsed > 0 else float(imported)
+    print(f'Импортировано {imported} записей в таблицу "{table_name_clean}" за {elapsed:.3f} секунд ({speed:.0f} строк/сек).') # noqa: E501
+    return data
@@ -0,0 +1,133 @@
+# src/primitive_db/cache.py
+from collections import OrderedDict
+
+from .constants import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_VERBOSE
+from .utils import estimate_size
+
+# Режимы, в которых кэш таблицы становится недействительным
+WRITE_MODES = ('insert', 'update', 'delete', 'drop')
+
+
+# Функция пометки значения его типом
+def tag_value(value) -> tuple:
+    '''
+    value - значение из условия (для between - пара значений).
+    В ключе кэша значение хранится вместе с именем типа, иначе 1 и True
+    (равные для словаря) дали бы один и тот же ключ.
+    '''
+    if isinstance(value, tuple):
+        return tuple(tag_value(item) for item in value)
+    return (type(value).__name__, value)
+
+
+# Функция построения ключа условия where
+def where_key(where_clause: dict) -> tuple:
+    '''
+    where_clause - условие where (сравнение или and/or/not над условиями).
+    '''
+    if 'args' in where_clause:
+        return (where_clause['op'], tuple(map(where_key, where_clause['args'])))
+    return (
+        where_clause['column'],
+        where_clause['op'],
+        tag_value(where_clause['value']),
+    )
+
+
+# Функция построения ключа кэша по плану запроса
+def plan_key(table_name: str, where_clause: dict = None) -> tuple:
+    '''
+    table_name - имя таблицы,
+    where_clause - условие where.
+    Функция возвращает нормализованный ключ запроса: первый элемент -
+    имя таблицы, остальные - разобранное условие.
+    '''
+    if where_clause is None:
+        return (table_name, 'all')
+    return (table_name, *where_key(where_clause))
+
+
+# Функция получения/записи кэша
+def create_cacher(max_entries: int = CACHE_MAX_ENTRIES,
+                  max_bytes: int = CACHE_MAX_BYTES,
+                  verbose: bool = CACHE_VERBOSE):
+    '''
+    max_entries - максимальное число результатов в кэше,
+    max_bytes - примерный бюджет памяти кэша,
+    verbose - печатать ли сообщения о попаданиях в кэш.
+    Функция создает LRU кэш результатов select. Для каждой таблицы хранится
+    номер поколения: запись в таблицу просто увеличивает его, и все старые
+    результаты перестают находиться (сброс за O(1)), а затем вытесняются.
+    '''
+    cache = OrderedDict()
+    sizes = {}
+    generations = {}
+    stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'bytes': 0}
+    settings = {'verbose': verbose}
+
+    def evict():
+        while cache and (len(cache) > max_entries or stats['bytes'] > max_bytes):
+            old_key, _ = cache.popitem(last=False)
+            stats['bytes'] -= sizes.pop(old_key)
+            stats['evictions'] += 1
+
+    def cache_result(key, value_func, mode, *args, **kwargs):
+        '''
+        key - ключ plan_key (для записи достаточно (имя_таблицы,)),
+        value_func - функция вычисления результата,
+        mode - select, режим записи из WRITE_MODES, stats, clear или verbose.
+        '''
+        table_name = key[0]
+        if mode in WRITE_MODES:
+            generations[table_name] = generations.get(table_name, 0) + 1
+            stats['invalidations'] += 1
+            return
+
+        if mode == 'stats':
+            return dict(stats, entries=len(cache), max_entries=max_entries, max_bytes=max_bytes) # noqa: E501
+
+        if mode == 'clear':
+            cache.clear()
+            sizes.clear()
+            stats['bytes'] = 0
+            return
+
+        if mode == 'verbose':
+            settings['verbose'] = bool(args[0])
+            return
+
+        full_key = (table_name, generations.get(table_name, 0), key[1:])
+        if full_key in cache:
+            cache.move_to_end(full_key)
+            stats['hits'] += 1
+            if settings['verbose']:
+                print('Получено значение из кэша!')
+            return cache[full_key]
+
+        stats['misses'] += 1
+        result = value_func(*args, **kwargs)
+        size = estimate_size(result)
+        if size <= max_bytes:
+            cache[full_key] = result
+            sizes[full_key] = size
+            stats['bytes'] += size
+            evict()
+            if settings['verbose']:
+                print('Запрос кэширован.')
+        return result
+
+    return cache_result
+
+
+# Функция вывода статистики кэша
+def print_cache_stats(cache) -> None:
+    '''
+    cache - функция кэша из create_cacher.
+    '''
+    stats = cache(('',), '', 'stats')
+    requests = stats['hits'] + stats['misses']
+    ratio = stats['hits'] / requests * 100 if requests else 0.0
+    print(f'Записей в кэше: {stats["entries"]} из {stats["max_entries"]}')
+    print(f'Память: {stats["bytes"]} из {stats["max_bytes"]} байт')
+    print(f'Попадания: {stats["hits"]}, промахи: {stats["misses"]} ({ratio:.1f}% попаданий)') # noqa: E501
+    print(f'Вытеснения: {stats["evictions"]}, сбросы по записи: {stats["invalidations"]}') # noqa: E501
@@ -0,0 +1,197 @@
+# src/primitive_db/catalog.py
+from .constants import META_FILEPATH, OPTIONS_KEY, SEQUENCE_BLOCK
+from .locks import catalog_lock, file_version
+from .utils import load_metadata, save_metadata
+
+# Состояние мета данных в этом процессе:
+#   version - версия файла мета данных (locks.file_version) на момент
+#   последней загрузки или записи этим процессом,
+#   sequences - блоки id, зарезервированные этим процессом:
+#   {таблица: {'sequence': последний выданный id, 'reserved': конец блока}}.
+# В файле мета данных reserved таблицы - граница, до которой id уже
+# зарезервированы всеми процессами, поэтому блоки процессов не пересекаются.
+# sequence таблицы в файле записывают только reseed и штатный выход
+# (release_sequences), от повторной выдачи id он не защищает.
+CATALOG_STATE = {'version': None, 'sequences': {}}
+
+
+# Функция получения имен таблиц из метаданных
+def table_names(metadata: dict) -> list:
+    '''
+    metadata - текущие мета данные.
+    Функция возвращает имена таблиц без служебного раздела.
+    '''
+    return [name for name in metadata.keys() if name != OPTIONS_KEY]
+
+
+# Функция получения служебных настроек таблицы
+def table_options(metadata: dict, table_name: str) -> dict:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы.
+    Функция возвращает (и при необходимости создает) служебные настройки
+    таблицы: индексы и т.п. Они лежат в разделе OPTIONS_KEY, чтобы схема
+    metadata[table_name] по-прежнему содержала только столбцы.
+    '''
+    options = metadata.setdefault(OPTIONS_KEY, {}).setdefault(table_name, {})
+    options.setdefault('indexes', {'id': 'hash'})
+    return options
+
+
+# Функция удаления служебных настроек таблицы
+def drop_table_options(metadata: dict, table_name: str) -> None:
+    metadata.get(OPTIONS_KEY, {}).pop(table_name, None)
+    CATALOG_STATE['sequences'].pop(table_name, None)
+
+
+# Функция загрузки мета данных с запоминанием версии файла
+def load_catalog() -> dict:
+    with catalog_lock():
+        version = file_version(META_FILEPATH)
+        metadata = load_metadata(filepath=META_FILEPATH)
+    CATALOG_STATE['version'] = version
+    return metadata
+
+
+# Функция проверки мета данных на изменения другими процессами
+def refresh_catalog(metadata: dict) -> bool:
+    '''
+    metadata - текущие мета данные.
+    Если файл мета данных изменился с последней загрузки или записи этим
+    процессом (один вызов stat), мета данные перечитываются на месте, так
+    что все ссылки на словарь остаются в силе. Возвращает True, если мета
+    данные изменились.
+    '''
+    if file_version(META_FILEPATH) == CATALOG_STATE['version']:
+        return False
+    fresh = load_catalog()
+    if fresh is None:
+        return False
+    metadata.clear()
+    metadata.update(fresh)
+    for table_name in list(CATALOG_STATE['sequences']):
+        if table_name not in metadata:
+            del CATALOG_STATE['sequences'][table_name]
+    return True
+
+
+# Функция сохранения мета данных
+def save_catalog(metadata: dict) -> bool:
+    '''
+    metadata - текущие мета данные.
+    Вызывающий должен держать исключительную блокировку мета данных с
+    момента refresh_catalog, иначе запись затрет чужие изменения.
+    '''
+    with catalog_lock(exclusive=True):
+        if not save_metadata(filepath=META_FILEPATH, data=metadata):
+            return False
+        CATALOG_STATE['version'] = file_version(META_FILEPATH)
+    return True
+
+
+# Функция получения последовательности id таблицы
+def table_sequence(metadata: dict, table_name: str, id_column: list) -> dict:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    id_column - столбец id (нужен один раз для таблиц без последовательности).
+    Функция возвращает последовательность таблицы в этом процессе:
+    sequence - последний выданный id, reserved - граница зарезервированного
+    процессом блока. Все выданные id не больше reserved. После запуска блок
+    пуст: выдача продолжается с границы из файла, поэтому id, выданные до
+    сбоя или другими процессами, не повторяются.
+    '''
+    sequences = CATALOG_STATE['sequences']
+    if table_name not in sequences:
+        options = table_options(metadata, table_name)
+        start = options.get('reserved', max(id_column, default=0))
+        sequences[table_name] = {'sequence': start, 'reserved': start}
+    return sequences[table_name]
+
+
+# Функция резервирования блока id
+def reserve_ids(metadata: dict, table_name: str, sequence: dict, count: int) -> None:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    sequence - последовательность из table_sequence,
+    count - сколько id нужно сразу.
+    Под исключительной блокировкой из файла читается граница, до которой
+    id уже зарезервированы. Если она не сдвинулась с прошлого резерва этого
+    процесса, блок продолжается с последнего выданного id без пропуска,
+    иначе новый блок берется сразу за чужим. В файл записывается только
+    новая граница (sequence в файле не меняется: id из блока выдаются уже
+    после записи), остальное содержимое файла не трогается, а версия файла
+    запоминается, как в save_catalog.
+    '''
+    with catalog_lock(exclusive=True):
+        stored = load_metadata(filepath=META_FILEPATH)
+        if stored is None or table_name not in stored:
+            raise OSError('таблица не найдена в файле мета данных.')
+        options = table_options(stored, table_name)
+        reserved = options.get('reserved', 0)
+        start = sequence['sequence'] if reserved == sequence['reserved'] else max(sequence['sequence'], reserved) # noqa: E501
+        options['reserved'] = start + count + SEQUENCE_BLOCK
+        if not save_metadata(filepath=META_FILEPATH, data=stored):
+            raise OSError('не удалось зарезервировать id в файле мета данных.')
+        CATALOG_STATE['version'] = file_version(META_FILEPATH)
+    sequence['sequence'] = start
+    sequence['reserved'] = options['reserved']
+    table_options(metadata, table_name)['reserved'] = options['reserved']
+
+
+# Функция установки последовательности id
+def set_sequence(metadata: dict, table_name: str, value: int) -> None:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    value - последний выданный id.
+    Мета данные после этого нужно сохранить (save_catalog).
+    '''
+    CATALOG_STATE['sequences'][table_name] = {'sequence': value, 'reserved': value}
+    table_options(metadata, table_name).update(sequence=value, reserved=value)
+
+
+# Функция выделения новых id
+def allocate_ids(metadata: dict, table_name: str, id_column: list, count: int) -> int:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    id_column - столбец id,
+    count - сколько id нужно.
+    Функция выдает count подряд идущих id и возвращает первый из них.
+    Мета данные сохраняются только когда кончается зарезервированный блок:
+    резервируется сразу count + SEQUENCE_BLOCK id, поэтому пачка любого
+    размера укладывается в одну запись на диск.
+    '''
+    sequence = table_sequence(metadata, table_name, id_column)
+    if sequence['sequence'] + count > sequence['reserved']:
+        reserve_ids(metadata, table_name, sequence, count)
+    first_id = sequence['sequence'] + 1
+    sequence['sequence'] += count
+    return first_id
+
+
+# Функция освобождения неиспользованных блоков id
+def release_sequences() -> None:
+    '''
+    При штатном выходе граница в файле опускается до последнего выданного
+    id, чтобы после перезапуска в нумерации не было пропуска. Если после
+    этого процесса блок зарезервировал другой процесс, граница не меняется.
+    '''
+    sequences = CATALOG_STATE['sequences']
+    if not sequences:
+        return
+    with catalog_lock(exclusive=True):
+        stored = load_metadata(filepath=META_FILEPATH)
+        if stored is None:
+            return
+        released = False
+        for table_name, sequence in sequences.items():
+            options = stored.get(OPTIONS_KEY, {}).get(table_name)
+            if options is not None and options.get('reserved') == sequence['reserved']: # noqa: E501
+                options['sequence'] = options['reserved'] = sequence['sequence']
+                released = True
+        if released:
+            save_metadata(filepath=META_FILEPATH, data=stored)
+    sequences.clear()
@@ -0,0 +1,74 @@
+# src/primitive_db/client.py
+import asyncio
+import sys
+from itertools import islice
+
+from .constants import CLIENT_PIPELINE, SERVER_HOST, SERVER_MAX_LINE, SERVER_PORT
+from .engine import interactive_commands, script_commands
+
+
+# Функция подключения к серверу
+async def open_connection(host: str = SERVER_HOST, port: int = SERVER_PORT, socket_path: str = None) -> tuple: # noqa: E501
+    '''
+    host, port - адрес TCP сервера,
+    socket_path - путь Unix сокета (вместо TCP).
+    Функция возвращает (reader, writer) соединения.
+    '''
+    if socket_path is not None:
+        return await asyncio.open_unix_connection(socket_path, limit=SERVER_MAX_LINE)
+    return await asyncio.open_connection(host, port, limit=SERVER_MAX_LINE)
+
+
+# Функция чтения одного ответа сервера
+async def read_response(reader) -> str:
+    header = await reader.readline()
+    if not header:
+        raise ConnectionError('сервер закрыл соединение.')
+    payload = await reader.readexactly(int(header))
+    return payload.decode('utf-8')
+
+
+# Функция выполнения команд конвейером
+async def send_commands(reader, writer, commands: list) -> list:
+    '''
+    reader, writer - соединение из open_connection,
+    commands - команды (строки без перевода строки).
+    Функция отправляет все команды сразу, не дожидаясь ответов, и
+    возвращает ответы в том же порядке.
+    '''
+    writer.write(''.join(command + '\n' for command in commands).encode('utf-8'))
+    await writer.drain()
+    return [await read_response(reader) for _ in commands]
+
+
+# Функция работы клиента
+async def client_loop(host: str, port: int, socket_path: str = None) -> None:
+    '''
+    host, port - адрес TCP сервера,
+    socket_path - путь Unix сокета.
+    С клавиатуры команды отправляются по одной. Из файла или канала
+    они отправляются пачками по CLIENT_PIPELINE команд без ожидания ответов.
+    '''
+    reader, writer = await open_connection(host, port, socket_path)
+    try:
+        if sys.stdin.isatty():
+            for command in interactive_commands():
+                output, = await send_commands(reader, writer, [command])
+                print(output, end='')
+                if command.strip().lower() in ('exit', 'quit'):
+                    break
+        else:
+            commands = script_commands(sys.stdin)
+            while chunk := list(islice(commands, CLIENT_PIPELINE)):
+                for output in await send_commands(reader, writer, chunk):
+                    print(output, end='')
+    finally:
+        writer.close()
+
+
+# Функция запуска клиента
+def run_client(host: str = SERVER_HOST, port: int = SERVER_PORT, socket_path: str = None) -> None: # noqa: E501
+    try:
+        asyncio.run(client_loop(host, port, socket_path))
+    except (ConnectionError, OSError) as error:
+        print(f'Ошибка соединения: {error}')
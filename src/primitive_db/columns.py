@@ -0,0 +1,439 @@
+# src/primitive_db/columns.py
+import operator
+import sys
+from array import array
+from itertools import chain, compress, islice, repeat, tee
+
+# Столбцы таблицы в памяти хранятся компактно, по типу значений:
+#   int  - array('q'): 8 байт на строку вместо указателя и объекта int,
+#   bool - BitColumn: битовая карта, 1 бит на строку,
+#   str  - DictColumn, если различных значений мало (не больше одного на
+#          DICT_MIN_REPEATS строк): массив кодов по 1-4 байта и таблица
+#          значений, каждое различное значение хранится один раз. Иначе
+#          столбец остается списком.
+# Контейнеры ведут себя как список значений (len, [i], [a:b], итерация,
+# append, extend, del [n:]), поэтому остальной код работает с ними так же,
+# как со списками. Для выборки значений по позициям есть gather: у
+# контейнеров она идет на стороне C, без вызова Python-метода на строку.
+# Целые вне диапазона int64 в array не помещаются: такой столбец из JSON
+# остается списком, а новые значения проверяет int64_overflow.
+DICT_MIN_REPEATS = 4
+# До скольких удаляемых строк столбец не пересобирается (compress_column)
+SMALL_DELETE = 64
+# Сколько первых строк смотреть, чтобы быстро отсеять столбцы с большим
+# числом различных значений (имена, адреса)
+DICT_SAMPLE_ROWS = 4096
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Распаковка байта битовой карты в 8 значений bool и обратно (младший бит -
+# первая строка, как в бинарном формате storage)
+UNPACK_BITS = [tuple(bool(byte >> bit & 1) for bit in range(8)) for byte in range(256)]
+PACK_BITS = {bits: byte for byte, bits in enumerate(UNPACK_BITS)}
+# Байт битовой карты -> 8 байт 0/1 (маска строк для predicate)
+UNPACK_FLAGS = [bytes(bits) for bits in UNPACK_BITS]
+# Типы массива кодов DictColumn по возрастанию размера
+CODE_TYPECODES = ['B', 'H', 'I', 'Q']
+
+
+# Функция упаковки значений bool в битовую карту
+def pack_bits(values) -> bytearray:
+    '''
+    values - значения bool.
+    Функция упаковывает по 8 значений в байт (на стороне C), последний байт
+    дополняется нулями.
+    '''
+    values = list(values)
+    padded = chain(values, repeat(False, -len(values) % 8))
+    return bytearray(map(PACK_BITS.__getitem__, zip(*[padded] * 8)))
+
+
+# Класс столбца bool в виде битовой карты
+class BitColumn:
+    '''
+    bits - битовая карта (bytearray, младший бит - первая строка, биты за
+    последней строкой всегда нулевые),
+    size - число строк.
+    '''
+    def __init__(self, values=()):
+        self.bits = bytearray()
+        self.size = 0
+        self.extend(values)
+
+    @classmethod
+    def from_bitmap(cls, bitmap: bytes, size: int):
+        '''
+        bitmap - битовая карта из бинарного файла,
+        size - число строк.
+        '''
+        column = cls()
+        column.bits = bytearray(bitmap)
+        column.size = size
+        return column
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return islice(chain.from_iterable(map(UNPACK_BITS.__getitem__, self.bits)), self.size) # noqa: E501
+
+    def __repr__(self):
+        return f'BitColumn({list(self)!r})'
+
+    def position(self, key: int) -> int:
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError('индекс вне столбца')
+        return key
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(gather(self, range(self.size)[key]))
+        key = self.position(key)
+        return bool(self.bits[key >> 3] >> (key & 7) & 1)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            if key == slice(None):
+                values = list(value)
+            else:
+                values = list(self)
+                values[key] = value
+            self.bits = pack_bits(values)
+            self.size = len(values)
+            return
+        key = self.position(key)
+        if value:
+            self.bits[key >> 3] |= 1 << (key & 7)
+        else:
+            self.bits[key >> 3] &= ~(1 << (key & 7)) & 0xFF
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step == 1 and stop == self.size and start <= stop:
+                # Отрезание хвоста (отмена вставки): обнуляются биты за концом
+                self.bits[(start + 7) // 8:] = b''
+                if start % 8:
+                    self.bits[-1] &= (1 << start % 8) - 1
+                self.size = start
+                return
+        elif isinstance(key, int):
+            # Биты после удаляемого сдвигаются на один целым числом
+            key = self.position(key)
+            bits = int.from_bytes(self.bits, 'little')
+            bits = bits & ((1 << key) - 1) | bits >> (key + 1) << key
+            self.size -= 1
+            self.bits = bytearray(bits.to_bytes((self.size + 7) // 8, 'little'))
+            return
+        values = list(self)
+        del values[key]
+        self[:] = values
+
+    def append(self, value):
+        if self.size % 8 == 0:
+            self.bits.append(0)
+        if value:
+            self.bits[self.size >> 3] |= 1 << (self.size & 7)
+        self.size += 1
+
+    def extend(self, values):
+        values = list(values)
+        head = -self.size % 8
+        for value in values[:head]:
+            self.append(value)
+        rest = values[head:]
+        self.bits.extend(pack_bits(rest))
+        self.size += len(rest)
+
+    def flags(self) -> bytes:
+        '''
+        Функция возвращает по байту 0/1 на строку.
+        '''
+        return b''.join(map(UNPACK_FLAGS.__getitem__, self.bits))[:self.size]
+
+
+# Класс столбца str со словарным кодированием
+class DictColumn:
+    '''
+    codes - коды строк (array, тип кода расширяется по мере роста словаря),
+    values - таблица значений (код -> строка),
+    lookup - словарь строка -> код.
+    Значения не удаляются из словаря, когда пропадают их строки: коды
+    остальных строк не меняются.
+    '''
+    def __init__(self, values=()):
+        self.codes = array(CODE_TYPECODES[0])
+        self.values = []
+        self.lookup = {}
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+    def __repr__(self):
+        return f'DictColumn({list(self)!r})'
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(map(self.values.__getitem__, self.codes[key]))
+        return self.values[self.codes[key]]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            self.codes[key] = self.encode(value)
+        else:
+            self.codes[key] = self.code(value)
+
+    def __delitem__(self, key):
+        del self.codes[key]
+
+    # Код считается до обращения к self.codes: новое значение может
+    # заменить массив кодов на более широкий
+    def append(self, value):
+        code = self.code(value)
+        self.codes.append(code)
+
+    def extend(self, values):
+        codes = self.encode(values)
+        self.codes.extend(codes)
+
+    def add(self, value) -> int:
+        '''
+        value - новое значение словаря.
+        Функция добавляет значение и при необходимости расширяет тип кодов.
+        '''
+        code = len(self.values)
+        self.values.append(value)
+        self.lookup[value] = code
+        if code >> (8 * self.codes.itemsize):
+            typecode = CODE_TYPECODES[CODE_TYPECODES.index(self.codes.typecode) + 1]
+            self.codes = array(typecode, self.codes)
+        return code
+
+    def code(self, value) -> int:
+        code = self.lookup.get(value)
+        return self.add(value) if code is None else code
+
+    def encode(self, values) -> array:
+        '''
+        values - строки.
+        Функция добавляет в словарь новые строки и возвращает их коды.
+        Коды ищутся на стороне C (map).
+        '''
+        if not isinstance(values, list):
+            values = list(values)
+        for value in set(values).difference(self.lookup):
+            self.add(value)
+        codes = array(self.codes.typecode)
+        codes.fromlist(list(map(self.lookup.__getitem__, values)))
+        return codes
+
+
+# Функция выбора представления столбца
+def pack_column(values, column_type: str = None):
+    '''
+    values - значения столбца (список или уже упакованный столбец),
+    column_type - тип из схемы (None - по первому значению).
+    Функция возвращает компактный контейнер для значений. Пустой столбец
+    без типа и столбец, которому компактное представление не подходит,
+    остаются списком.
+    '''
+    if not isinstance(values, list):
+        return values
+    if column_type is None:
+        if not values:
+            return values
+        column_type = type(values[0]).__name__
+    match column_type:
+        case 'int':
+            try:
+                return array('q', values)
+            except OverflowError:
+                return values
+        case 'bool':
+            return BitColumn(values)
+        case 'str':
+            sample = values[:DICT_SAMPLE_ROWS]
+            if len(set(sample)) * DICT_MIN_REPEATS > len(sample):
+                return values
+            column = DictColumn(values)
+            if len(column.values) * DICT_MIN_REPEATS <= len(values):
+                return column
+    return values
+
+
+# Функция упаковки всех столбцов таблицы
+def pack_table(table_data: dict, schema: dict = None) -> dict:
+    '''
+    table_data - данные таблицы,
+    schema - схема {столбец: тип} или None.
+    Еще не загруженные столбцы ленивой таблицы (storage.LazyTable)
+    упаковываются при декодировании и здесь не трогаются.
+    '''
+    for name in table_data.keys():
+        column = dict.get(table_data, name)
+        if isinstance(column, list):
+            table_data[name] = pack_column(column, (schema or {}).get(name))
+    return table_data
+
+
+# Функция получения значений столбца списком
+def plain_values(column) -> list:
+    if isinstance(column, list):
+        return column
+    if isinstance(column, array):
+        return column.tolist()
+    return list(column)
+
+
+# Функция замены всех значений столбца на месте
+def replace_values(column, values) -> None:
+    '''
+    column - столбец,
+    values - новые значения (итерируемое).
+    '''
+    if isinstance(column, array):
+        column[:] = array(column.typecode, values)
+    else:
+        column[:] = values
+
+
+# Функция удаления строк столбца по маске
+def compress_column(column, mask) -> None:
+    '''
+    column - столбец,
+    mask - маска уцелевших строк (bytearray, байт 0/1 на строку).
+    У DictColumn отбираются коды, строки не перекодируются. Несколько
+    строк удаляются по одной с конца: каждое удаление - сдвиг буфера
+    (memmove), это быстрее, чем пересобрать столбец целиком.
+    '''
+    if isinstance(column, DictColumn):
+        column = column.codes
+    if mask.count(0) <= SMALL_DELETE:
+        position = mask.rfind(0)
+        while position != -1:
+            del column[position]
+            position = mask.rfind(0, 0, position)
+        return
+    replace_values(column, compress(column, mask))
+
+
+# Функция выборки значений столбца по позициям
+def gather(column, positions):
+    '''
+    column - столбец,
+    positions - позиции строк.
+    Функция лениво отдает значения. Для DictColumn и BitColumn значения
+    собираются из кодов и битов цепочкой map на стороне C, а подряд идущие
+    позиции (range) берутся срезом кодов или битовой карты.
+    '''
+    if isinstance(positions, range) and positions.step == 1 and isinstance(column, (DictColumn, BitColumn)): # noqa: E501
+        start, stop = positions.start, max(positions.start, positions.stop)
+        if isinstance(column, DictColumn):
+            return map(column.values.__getitem__, column.codes[start:stop])
+        bits = map(UNPACK_BITS.__getitem__, column.bits[start >> 3:(stop + 7) >> 3])
+        return islice(chain.from_iterable(bits), start & 7, (start & 7) + stop - start)
+    if isinstance(column, DictColumn):
+        return map(column.values.__getitem__, map(column.codes.__getitem__, positions))
+    if isinstance(column, BitColumn):
+        bytes_positions, bit_positions = tee(positions)
+        bytes_values = map(column.bits.__getitem__, map(operator.rshift, bytes_positions, repeat(3))) # noqa: E501
+        return map(operator.getitem, map(UNPACK_BITS.__getitem__, bytes_values), map(operator.and_, bit_positions, repeat(7))) # noqa: E501
+    return map(column.__getitem__, positions)
+
+
+# Функция получения быстрого доступа к значениям по позиции
+def value_getter(column, positions=None):
+    '''
+    column - столбец,
+    positions - позиции, для которых нужны значения (None - все строки).
+    Функция возвращает функцию позиция -> значение для сортировок.
+    Упакованный столбец для этого разворачивается во временный список (или
+    словарь для списка позиций): сами строки и bool общие, копируются
+    только указатели.
+    '''
+    if isinstance(column, list):
+        return column.__getitem__
+    if positions is None or isinstance(positions, range):
+        # Список быстрее array при многократном доступе: числа в нем уже
+        # созданы
+        return column.tolist().__getitem__ if isinstance(column, array) else list(column).__getitem__ # noqa: E501
+    if isinstance(column, array):
+        return column.__getitem__
+    return dict(zip(positions, gather(column, positions))).__getitem__
+
+
+# Функция получения маски строк, равных значению
+def equal_flags(column, value):
+    '''
+    column - столбец,
+    value - значение условия =.
+    Функция возвращает по байту 0/1 на строку или None, если у столбца нет
+    быстрого пути. Для DictColumn сравниваются коды, а не строки: значение
+    ищется в словаре один раз, и если его нет, подходящих строк нет.
+    '''
+    if isinstance(column, BitColumn):
+        flags = column.flags()
+        return flags if value else flags.translate(bytes.maketrans(b'\x00\x01', b'\x01\x00')) # noqa: E501
+    if isinstance(column, DictColumn):
+        code = column.lookup.get(value)
+        if code is None:
+            return bytes(len(column))
+        if column.codes.typecode == 'B':
+            table = bytearray(256)
+            table[code] = 1
+            return column.codes.tobytes().translate(table)
+        return bytes(map(operator.eq, column.codes, repeat(code)))
+    return None
+
+
+# Функция получения операндов проверки равенства на отобранных строках
+def equal_operands(column, value) -> tuple:
+    '''
+    column - столбец,
+    value - значение условия =.
+    Функция возвращает (что сравнивать, с чем). У DictColumn сравниваются
+    коды строк с кодом значения (-1, если значения нет в словаре).
+    '''
+    if isinstance(column, DictColumn):
+        return column.codes, column.lookup.get(value, -1)
+    return column, value
+
+
+# Функция проверки целых на выход за int64
+def int64_overflow(values) -> bool:
+    values = list(values)
+    return bool(values) and (min(values) < INT64_MIN or max(values) > INT64_MAX)
+
+
+# Функция получения описания представления столбца
+def column_kind(column) -> str:
+    if isinstance(column, array):
+        return 'array int64'
+    if isinstance(column, BitColumn):
+        return 'битовая карта'
+    if isinstance(column, DictColumn):
+        return f'словарь на {len(column.values)} значений, коды по {column.codes.itemsize} байт' # noqa: E501
+    return 'список'
+
+
+# Функция подсчета памяти столбца
+def column_bytes(column) -> int:
+    '''
+    column - столбец.
+    Функция возвращает фактический размер столбца в байтах: контейнер и
+    его буферы, а для списка - еще и сами объекты значений (общие
+    объекты, например одинаковые строки, считаются один раз).
+    '''
+    if isinstance(column, array):
+        return sys.getsizeof(column)
+    if isinstance(column, BitColumn):
+        return sys.getsizeof(column) + sys.getsizeof(column.bits)
+    if isinstance(column, DictColumn):
+        return (sys.getsizeof(column) + sys.getsizeof(column.codes) + sys.getsizeof(column.values) # noqa: E501
+                + sys.getsizeof(column.lookup) + sum(map(sys.getsizeof, column.values)))
+    unique = {id(value): value for value in column}
+    return sys.getsizeof(column) + sum(map(sys.getsizeof, unique.values()))
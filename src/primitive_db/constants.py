@@ -1,4 +1,5 @@
 # src/primitive_db/constants.py
+import os
 from pathlib import Path
 
 COMMANDS = {
@@ -6,19 +7,102 @@ COMMANDS = {
   'drop_table <имя_таблицы>': 'удалить таблицу.',
   'list_tables': 'показать список всех таблиц.',
   'insert into <имя_таблицы> values (<значение1>, <значение2>, ...)': 'создать запись.',
+  'insert into <имя_таблицы> values (...), (...), ...': 'создать несколько записей за раз.', # noqa: E501
+  'import <имя_таблицы> from <файл.csv|файл.jsonl>': 'загрузить записи из файла.',
   'select from <имя_таблицы> where <столбец> = <значение>': 'прочитать записи по условию.', # noqa: E501
+  'select from <имя_таблицы> where <столбец> <|>|<=|>= <значение>': 'прочитать записи по диапазону.', # noqa: E501
+  'select from <имя_таблицы> where <столбец> between <значение1> and <значение2>': 'прочитать записи в диапазоне включительно.', # noqa: E501
+  'select from <имя_таблицы> where <условие> and|or <условие> ...': 'прочитать записи по составному условию (доступны not и скобки).', # noqa: E501
   'select from <имя_таблицы>': 'прочитать все записи.',
-  'update <имя_таблицы> set <столбец1> = <новое_значение1> where <столбец_условия> = <значение_условия>': 'обновить запись.', # noqa: E501
-  'delete from <имя_таблицы> where <столбец> = <значение>': 'удалить запись.',
+  'select <столбец1>, <столбец2>, ... from <имя_таблицы> [where ...]': 'прочитать только нужные столбцы.', # noqa: E501
+  'select count(*), sum(<столбец>), min|max|avg(<столбец>) from <имя_таблицы> [where ...]': 'посчитать агрегатные функции.', # noqa: E501
+  'select <столбец>, count(*), ... from <имя_таблицы> [where ...] group by <столбец>': 'посчитать агрегатные функции по группам.', # noqa: E501
+  'select from <имя_таблицы> [where ...] [limit <n>] [offset <n>] [format table|tsv|fixed|page]': 'прочитать часть записей и выбрать вид вывода.', # noqa: E501
+  'select ... from <имя_таблицы> [where ...] [group by ...] order by <столбец> [asc|desc] [limit <n>]': 'отсортировать результат (с limit - отбор первых n через кучу).', # noqa: E501
+  'select ... from <таблица1> join <таблица2> on <таблица1>.<столбец> = <таблица2>.<столбец> [where ...]': 'соединить записи двух таблиц (hash join).', # noqa: E501
+  'update <имя_таблицы> set <столбец1> = <выражение1>, ... where <условие> [limit <n>]': 'обновить все подходящие записи (выражения: значения, столбцы, +, -, *, скобки).', # noqa: E501
+  'delete from <имя_таблицы> where <условие>': 'удалить все подходящие записи.',
   'info <имя_таблицы>': 'вывести информацию о таблице.',
+  'reseed <имя_таблицы> [<значение>]': 'сбросить последовательность id (по умолчанию до максимального id).', # noqa: E501
+  'create_index <имя_таблицы> <столбец> [hash|sorted]': 'создать индекс по столбцу.',
+  'drop_index <имя_таблицы> <столбец>': 'удалить индекс по столбцу.',
+  'vacuum <имя_таблицы>': 'свернуть журнал изменений таблицы в снимок.',
+  'migrate <имя_таблицы> to <json|binary>': 'перевести таблицу в другой формат хранения.', # noqa: E501
+  'checkpoint': 'записать все изменения на диск.',
+  'begin': 'начать транзакцию.',
+  'commit': 'зафиксировать транзакцию (одна запись на диск на каждую измененную таблицу).', # noqa: E501
+  'rollback': 'отменить изменения транзакции.',
+  'prepare <имя> as <команда с параметрами ?>': 'подготовить команду для повторного выполнения.', # noqa: E501
+  'execute <имя> [<значение1>, <значение2>, ...]': 'выполнить подготовленную команду с параметрами.', # noqa: E501
+  'deallocate <имя>': 'удалить подготовленную команду.',
+  'cache stats': 'показать статистику кэша запросов.',
+  'cache clear': 'очистить кэш запросов.',
+  'cache verbose <on|off>': 'включить/выключить сообщения о попаданиях в кэш.',
+  'stats [on|off|reset]': 'показать метрики (время команд и фаз, строки, байты), включить/выключить или сбросить их.', # noqa: E501
   'exit': 'выйти из программы.',
   'help': 'справочная информация.'
 }
 
 META_FILE = 'db_meta.json'
-META_FILEPATH = Path(__file__).parent / META_FILE
-TABLE_PATH = Path(__file__).parent / 'data'
+# Служебный раздел метаданных с настройками таблиц (индексы и т.п.)
+OPTIONS_KEY = '__options__'
+# Каталог файлов таблиц и файл мета данных можно переопределить (например,
+# для бенчмарков)
+META_FILEPATH = Path(os.environ.get('PRIMITIVE_DB_META', Path(__file__).parent / META_FILE)) # noqa: E501
+TABLE_PATH = Path(os.environ.get('PRIMITIVE_DB_DATA', Path(__file__).parent / 'data'))
 
 CURRENT_TYPES  = ['str', 'int', 'bool']
+# Операторы сравнения в условии where (плюс between ... and ...)
+WHERE_OPERATORS = ['=', '<', '>', '<=', '>=']
 
+# Настройки буферного пула таблиц
+POOL_MAX_BYTES = 256 * 1024 * 1024
+CHECKPOINT_EVERY_WRITES = 10000
+CHECKPOINT_INTERVAL = 300.0
 
+# Сколько id резервировать в мета данных сверх нужного за одну запись
+SEQUENCE_BLOCK = 1000
+
+# Адрес сервера по умолчанию и максимальная длина команды в байтах
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 5433
+SERVER_MAX_LINE = 16 * 1024 * 1024
+# Сколько команд клиент отправляет сразу, не дожидаясь ответов
+CLIENT_PIPELINE = 64
+
+# Сколько секунд ждать блокировку, занятую другим процессом, и как часто
+# ее проверять
+LOCK_TIMEOUT = 30.0
+LOCK_POLL_INTERVAL = 0.01
+
+# Ограничения кэша результатов select
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_VERBOSE = True
+
+# Вывод результата select: строк на странице и в одной пачке потокового вывода
+PAGE_ROWS = 20
+STREAM_CHUNK_ROWS = 1000
+
+# Параллельный скан: условие where без индекса проверяется в нескольких
+# процессах, если в таблице не меньше PARALLEL_MIN_ROWS строк; каждому
+# процессу достается не меньше PARALLEL_CHUNK_ROWS строк
+PARALLEL_MIN_ROWS = 200000
+PARALLEL_CHUNK_ROWS = 50000
+
+# Join: строки большей таблицы проходят по хэш-таблице меньшей пачками
+# по JOIN_CHUNK_ROWS строк
+JOIN_CHUNK_ROWS = 10000
+
+# Сколько разобранных команд хранить в кэше планов
+PLAN_CACHE_ENTRIES = 512
+
+# Размер пачки строк при импорте из файла
+IMPORT_CHUNK_ROWS = 10000
+
+# Журнал изменений сжимается в снимок, когда становится больше снимка
+WAL_COMPACT_MIN_BYTES = 1024 * 1024
+
+# Границы корзин гистограмм времени (секунды) и период выгрузки метрик в файл
+METRICS_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0) # noqa: E501
+METRICS_DUMP_INTERVAL = 60.0
@@ -1,13 +1,49 @@
 # src/primitive_db/core.py
-import ast
 import json as js
-import os
 import re
+from array import array
+from itertools import repeat
 
-import prettytable as pt
-
-from .constants import CURRENT_TYPES, META_FILE, TABLE_PATH
+from .aggregate import NUMERIC_AGGREGATES, aggregate, is_aggregate, item_name
+from .cache import plan_key
+from .catalog import (
+    allocate_ids,
+    drop_table_options,
+    set_sequence,
+    table_names,
+    table_options,
+    table_sequence,
+)
+from .columns import column_bytes, column_kind, gather, int64_overflow, pack_table
+from .constants import CURRENT_TYPES, META_FILE, OPTIONS_KEY, TABLE_PATH
 from .decorators import confirm_action, handle_db_errors, log_time
+from .expression import expression_columns, expression_type, expression_values
+from .index import (
+    INDEX_KINDS,
+    SORTED_INDEX_TYPES,
+    build_index,
+    index_cardinality,
+    index_delete,
+    index_insert,
+    index_size,
+    index_update_many,
+)
+from .join import join_column, join_rows, qualify_where, split_where
+from .metrics import count
+from .order import order_positions
+from .parallel import scan_positions
+from .predicate import where_leaves
+from .render import render
+from .storage import (
+    BACKENDS,
+    LazyTable,
+    remove_table_files,
+    save_snapshot,
+    table_backend,
+)
+from .transaction import log_change
+from .utils import keep_mask, remove_rows, row_count
+from .wal import remove_log
 
 
 # Функция создания таблицы
@@ -25,6 +61,10 @@ def create_table(metadata: dict, table_name: str, columns: list) -> dict:
     # Очистка
     table_name_clean = table_name.strip().lower()
     columns_clean = [name_value.strip().lower() for name_value in columns]
+
+    if table_name_clean == OPTIONS_KEY:
+        print(f'Ошибка: имя "{OPTIONS_KEY}" зарезервировано. Попробуйте снова.')
+        return metadata
     
     if table_name_clean not in metadata.keys():
         pattern = r'^[^:]+:[^:]+$'
@@ -57,6 +97,7 @@ def create_table(metadata: dict, table_name: str, columns: list) -> dict:
             dict_columns[name] = value
         
         metadata[table_name_clean] = dict_columns
+        table_options(metadata, table_name_clean)
       
         table_data = {}
         for column_name_type in columns_clean:
@@ -86,16 +127,15 @@ def drop_table(metadata: dict, cache, table_name: str) -> dict:
     table_name_clean = table_name.strip().lower()
 
     if table_name_clean in metadata.keys():
-        table_current_path = TABLE_PATH / (table_name_clean + '.json')
-        if os.path.exists(table_current_path):
-            os.remove(table_current_path)
+        remove_log(table_name_clean)
+        if remove_table_files(table_name_clean):
             print(f'Таблица "{table_name_clean}" успешно удалена.')
         else:
             print(f'Предупреждени: файл таблицы не найден. Удаление упоминания таблицы из файла "{META_FILE}".') # noqa: E501
             
         del metadata[table_name_clean]
-        key_delete = table_name_clean + '_' + '-' + '-'
-        cache(key_delete, '', 'drop', '')
+        drop_table_options(metadata, table_name_clean)
+        cache((table_name_clean,), '', 'drop')
         
         return metadata
     
@@ -109,11 +149,11 @@ def list_tables(metadata: dict) -> None:
    '''
    Выводит с новой строки имена всех таблиц в бд
    '''
-   if len(metadata.keys()) == 0:
+   if len(table_names(metadata)) == 0:
      print('База данных пустая.')
      return
      
-   for table_name in metadata.keys():
+   for table_name in table_names(metadata):
      print(f'- {table_name}')
    
    return
@@ -122,12 +162,13 @@ def list_tables(metadata: dict) -> None:
 # Функция вставки данных в таблицу
 @handle_db_errors
 @log_time
-def insert(metadata: dict, data: dict, cache, table_name: str, values: str) -> dict:
+def insert(metadata: dict, data: dict, cache, table_name: str, rows: list, indexes: dict = None) -> dict: # noqa: E501
     '''
     metadata - текущие метаданные БД,
     data - данные таблицы,
     table_name - имя таблицы,
-    values - значения для вставки.
+    rows - строки для вставки (кортежи значений, уже разобранные парсером),
+    indexes - индексы таблицы.
     Функция принимает текущие данные и вставляет данные в таблицу, если типы
     данных соответствуют схеме таблицы.
     '''
@@ -135,243 +176,624 @@ def insert(metadata: dict, data: dict, cache, table_name: str, values: str) -> d
     if table_name_clean not in metadata.keys():
         print(f'Ошибка: таблицы с именем {table_name_clean} не существует.')
         return data
-  
-    values_clean = values.replace('true', 'True').replace('false', 'False').replace(')', ',)') # noqa: E501
-    values_clean = ast.literal_eval(values_clean)
-    
-    if not isinstance(values_clean, tuple):
-      print('Ошибка: неправильный формат ввода значений для вставки. Правильный формат ввода: (<значение_1>, <значение_2>, ...). Попробуйте снова.') # noqa: E501
-      return data
-
-    if len(metadata[table_name_clean]) - 1 != len(values_clean):
-        if len(values_clean) > len(metadata.keys()) - 1:
-            print(f'Ошибка: слишком много элементов для вставки. Можно вставить ровно {len(metadata[table_name_clean]) - 1} значений.') # noqa: E501
-            return data
-        else:
-            print(f'Ошибка: слишком мало элементов для вставки. Можно вставить ровно {len(metadata[table_name_clean]) - 1} значений.') # noqa: E501
-            return data
-  
-    for idx, value in enumerate(values_clean):
-        value_type_name = type(value).__name__
-        if value_type_name.lower() not in CURRENT_TYPES:
-            print(f'Ошибка: недопустимый тип элемента: {value_type_name}. Такой тип не поддерживается.') # noqa: E501
-            return data
-        scheme_type = metadata[table_name_clean][list(metadata[table_name_clean].keys())[idx + 1]] # noqa: E501
-        if value_type_name != scheme_type: 
-            print(f'Ошибка: тип данных элемента {value} не соответствует схеме таблицы. Измените тип {value_type_name} на {scheme_type}.') # noqa: E501
-            return data
-      
-    max_id = max([0] if not data['id'] else data['id'])
-    data['id'].append(max_id + 1)
-  
-    for i in range(len(data.keys())):
-        if i == 0:
-            continue
-        data[list(data.keys())[i]].append(values_clean[i - 1])
-    
-    print(f'Запись с ID={max_id + 1} успешно добавлена в таблицу "{table_name_clean}"')
-    
-    key_insert = table_name_clean + '_' + '-' + '-'
-    cache(key_insert, '', 'insert', '')
+
+    first_id = insert_rows(metadata, data, cache, table_name_clean, rows, indexes)
+    if first_id is None:
+        return data
+
+    if len(rows) == 1:
+        print(f'Запись с ID={first_id} успешно добавлена в таблицу "{table_name_clean}"') # noqa: E501
+    else:
+        print(f'Записи с ID={first_id}..{first_id + len(rows) - 1} ({len(rows)} шт.) успешно добавлены в таблицу "{table_name_clean}"') # noqa: E501
     
     return data
+
+
+# Функция пакетной вставки проверенных строк
+def insert_rows(metadata: dict, data: dict, cache, table_name: str, rows: list, indexes: dict = None): # noqa: E501
+    '''
+    metadata - текущие метаданные БД,
+    data - данные таблицы,
+    table_name - очищенное имя таблицы,
+    rows - список строк (кортежей значений без id),
+    indexes - индексы таблицы.
+    Функция проверяет типы всей пачки по столбцам, дописывает строки в
+    столбцы таблицы, одной записью сохраняет их в журнал и один раз
+    сбрасывает кэш. Возвращает ID первой строки или None при ошибке.
+    '''
+    schema = metadata[table_name]
+    columns = list(schema.keys())[1:]
+
+    for row in rows:
+        if len(row) > len(columns):
+            print(f'Ошибка: слишком много элементов для вставки. Можно вставить ровно {len(columns)} значений.') # noqa: E501
+            return None
+        if len(row) < len(columns):
+            print(f'Ошибка: слишком мало элементов для вставки. Можно вставить ровно {len(columns)} значений.') # noqa: E501
+            return None
+
+    columns_values = list(zip(*rows))
+    for idx, column_values in enumerate(columns_values):
+        scheme_type = schema[columns[idx]]
+        if {value_type.__name__ for value_type in set(map(type, column_values))} <= {scheme_type}: # noqa: E501
+            continue
+        for value in column_values:
+            value_type_name = type(value).__name__
+            if value_type_name.lower() not in CURRENT_TYPES:
+                print(f'Ошибка: недопустимый тип элемента: {value_type_name}. Такой тип не поддерживается.') # noqa: E501
+                return None
+            if value_type_name != scheme_type: 
+                print(f'Ошибка: тип данных элемента {value} не соответствует схеме таблицы. Измените тип {value_type_name} на {scheme_type}.') # noqa: E501
+                return None
+    for idx, column_values in enumerate(columns_values):
+        if schema[columns[idx]] == 'int' and int64_overflow(column_values):
+            print(f'Ошибка: значение столбца {columns[idx]} выходит за диапазон int64.')
+            return None
+
+    first_id = allocate_ids(metadata, table_name, data['id'], len(rows))
+    new_ids = range(first_id, first_id + len(rows))
+    log_change(table_name, data, ['i', [[new_id, *row] for new_id, row in zip(new_ids, rows)]]) # noqa: E501
+    start = len(data['id'])
+    data['id'].extend(new_ids)
+    for idx, column_values in enumerate(columns_values):
+        data[columns[idx]].extend(column_values)
+    if start == 0:
+        # Первая пачка пустой таблицы задает представление столбцов
+        pack_table(data, schema)
+
+    if indexes is not None:
+        index_insert(indexes, data, start)
+
+    cache((table_name,), '', 'insert')
+
+    return first_id
   
 
 # Функция select таблицы
 @handle_db_errors
 @log_time
-def select(table_name: str, table_data: dict, cache, metadata: dict = None, where_clause: dict = None) -> None: # noqa: E501
+def select(table_name: str, table_data: dict, cache, metadata: dict = None, where_clause: dict = None, indexes: dict = None, limit: int = None, offset: int = 0, output: str = 'table', columns: list = None, group: str = None, order: dict = None) -> None: # noqa: E501
     '''
     table_name - имя таблицы,
     table_data - данные таблицы,
     metadata - текущие мета данные,
-    where_clause - условие where.
+    where_clause - условие where,
+    indexes - индексы таблицы,
+    limit - сколько строк вывести (None - все),
+    offset - сколько строк пропустить,
+    output - вид вывода (table, tsv, fixed или page),
+    columns - столбцы и агрегатные функции select (None - все столбцы),
+    group - столбец group by,
+    order - сортировка order by {'column', 'func', 'desc'} (None - порядок
+    таблицы).
     Функция select, выводит строчки, которые соответствуют условию where,
-    если оно задано. Если нет, то выводит все строки таблицы.
+    если оно задано. Если нет, то выводит все строки таблицы. Результат
+    хранится как список позиций строк, а сами строки собираются только
+    для выводимой части. Читаются только столбцы условия и вывода: у
+    таблиц в формате binary остальные столбцы не загружаются с диска.
+    Для агрегатных функций limit и offset относятся к строкам результата
+    (группам). Сортируются позиции строк (order.order_positions).
     '''
-    pretty_table = pt.PrettyTable()
-    pretty_table.field_names = table_data.keys()
-    
     table_name_clean = table_name.strip().lower()
-    
-    if where_clause is not None:
-        where_column = list(where_clause.keys())[0]
-        where_value = list(where_clause.values())[0]
+    aggregated = columns is not None and (group is not None or is_aggregate(columns))
 
-        if where_column in list(table_data.keys()):
-            if metadata[table_name_clean][where_column] != type(where_value).__name__:
-                print(f'Ошибка: тип данных в условии where/set: {str(type(where_value).__name__)} не совпадает с типом данных {metadata[table_name_clean][where_column]} в схеме таблицы.') # noqa: E501
-                return
-            
-            # Механизм кэширования
-            key_cache = table_name_clean + '_' + str(where_column) + str(where_value)
-            select_result = cache(key_cache, fetch_data, 'select', table_data, where_column, where_value) # noqa: E501
-            
-            pretty_table.add_rows(list(zip(*select_result.values())))
-            print(pretty_table)
+    if columns is not None or group is not None:
+        if not check_columns(table_name_clean, metadata, columns, group):
             return
-        
-        else:
-            print(f'Ошибка: столбца {where_column} нет в таблице "{table_name_clean}".')
+    if order is not None:
+        if not check_order(table_name_clean, metadata[table_name_clean], order, columns if aggregated else None): # noqa: E501
+            return
+    
+    if where_clause is not None:
+        if not check_where(table_name_clean, metadata, table_data, where_clause):
             return
+
+        # Механизм кэширования
+        key_cache = plan_key(table_name_clean, where_clause)
+        positions = cache(key_cache, fetch_positions, 'select', table_name_clean, table_data, where_clause, indexes) # noqa: E501
     
-    key_cache = table_name_clean
-    select_result = cache(key_cache, fetch_data, 'select', table_data)
-    pretty_table.add_rows(list(zip(*select_result.values())))
-    print(pretty_table)
+    else:
+        # Без условия результат - все строки, кэшировать нечего
+        positions = fetch_positions(table_name_clean, table_data)
+
+    stop = None if limit is None else offset + limit
+    if aggregated:
+        # Без where группы можно взять из хэш-индекса по столбцу group by
+        index = (indexes or {}).get(group) if where_clause is None else None
+        table_data = aggregate(table_data, metadata[table_name_clean], positions, columns, group, index) # noqa: E501
+        positions = range(len(next(iter(table_data.values()))))
+        if order is not None:
+            positions = order_positions(table_data[item_name(order)], positions, order['desc'], stop) # noqa: E501
+    else:
+        if order is not None:
+            index = (indexes or {}).get(order['column'])
+            positions = order_positions(table_data[order['column']], positions, order['desc'], stop, index) # noqa: E501
+        if columns is not None:
+            table_data = {item['column']: table_data[item['column']] for item in columns} # noqa: E501
+
+    shown = positions[offset:stop]
+    count('rows_returned', len(shown))
+    render(table_data, shown, output)
     return
 
 
-# Функция получения данных
-def fetch_data(table_data: dict, where_column: str = None, where_value=None) -> dict:
+# Функция select из двух таблиц через join
+@handle_db_errors
+@log_time
+def select_join(tables: dict, cache, metadata: dict, join: dict, where_clause: dict = None, indexes: dict = None, limit: int = None, offset: int = 0, output: str = 'table', columns: list = None, group: str = None, order: dict = None) -> None: # noqa: E501
+    '''
+    tables - данные таблиц {таблица: данные}, сначала таблица из from,
+    metadata - текущие мета данные,
+    join - {'table': вторая таблица, 'on': (столбец, столбец)},
+    where_clause - условие where,
+    indexes - индексы таблиц {таблица: индексы},
+    остальные параметры - как у select.
+    Функция select_join, выводит пары записей двух таблиц, у которых
+    совпадают столбцы условия on (hash join, см. join.py). Части where по
+    одной таблице проверяются до join, поэтому в хэш-таблицу попадают
+    только подходящие строки меньшей стороны. Без агрегатных функций и
+    order by поиск пар останавливается, как только набирается offset +
+    limit строк.
+    '''
+    table_names = list(tables)
+    schemas = {table_name: metadata[table_name] for table_name in table_names}
+    label = ' join '.join(table_names)
+    joined_schema = {f'{table_name}.{column}': column_type for table_name, schema in schemas.items() for column, column_type in schema.items()} # noqa: E501
+    joined_metadata = {label: joined_schema}
+
+    left, right = (join_column(name, schemas) for name in join['on'])
+    if left.rpartition('.')[0] == right.rpartition('.')[0]:
+        print('Ошибка: условие on должно связывать столбцы разных таблиц.')
+        return
+    if joined_schema[left] != joined_schema[right]:
+        print(f'Ошибка: в условии on тип {left} ({joined_schema[left]}) не совпадает с типом {right} ({joined_schema[right]}).') # noqa: E501
+        return
+    keys = {name.rpartition('.')[0]: name.rpartition('.')[2] for name in (left, right)} # noqa: E501
+
+    if columns is not None:
+        columns = [item if item['column'] == '*' else dict(item, column=join_column(item['column'], schemas)) for item in columns] # noqa: E501
+    if group is not None:
+        group = join_column(group, schemas)
+    if columns is not None or group is not None:
+        if not check_columns(label, joined_metadata, columns, group):
+            return
+    aggregated = columns is not None and (group is not None or is_aggregate(columns))
+    if order is not None:
+        if order['column'] != '*':
+            order = dict(order, column=join_column(order['column'], schemas))
+        if not check_order(label, joined_schema, order, columns if aggregated else None): # noqa: E501
+            return
+
+    pushed, residual = {table_name: None for table_name in table_names}, None
+    if where_clause is not None:
+        where_clause = qualify_where(where_clause, schemas)
+        if not check_where(label, joined_metadata, joined_schema, where_clause):
+            return
+        pushed, residual = split_where(where_clause, table_names)
+
+    sides = []
+    for table_name in table_names:
+        table_data, table_where = tables[table_name], pushed[table_name]
+        if table_where is None:
+            positions = fetch_positions(table_name, table_data)
+        else:
+            positions = cache(plan_key(table_name, table_where), fetch_positions, 'select', table_name, table_data, table_where, indexes[table_name]) # noqa: E501
+        index = indexes[table_name].get(keys[table_name])
+        sides.append({'table': table_name, 'data': table_data, 'column': keys[table_name], 'positions': positions, 'index': index}) # noqa: E501
+
+    stop = None if limit is None else offset + limit
+    found = join_rows(sides, residual, None if aggregated or order is not None else stop) # noqa: E501
+    if order is not None and not aggregated:
+        table_name, _, column = order['column'].rpartition('.')
+        values = list(gather(tables[table_name][column], found[table_name]))
+        ordered = order_positions(values, range(len(values)), order['desc'], stop)
+        found = {table_name: array('q', map(positions.__getitem__, ordered)) for table_name, positions in found.items()} # noqa: E501
+
+    # Значения собираются только для нужных столбцов и выводимых пар
+    if aggregated:
+        names = {item['column'] for item in columns if item['column'] != '*'} | ({group} - {None}) # noqa: E501
+        pairs = slice(None)
+    else:
+        names = [item['column'] for item in columns] if columns is not None else list(joined_schema) # noqa: E501
+        pairs = slice(offset, stop)
+    result = {}
+    for name in names:
+        table_name, _, column = name.rpartition('.')
+        result[name] = list(gather(tables[table_name][column], found[table_name][pairs])) # noqa: E501
+    positions = range(len(found[table_names[0]][pairs]))
+
+    if aggregated:
+        result = aggregate(result, joined_schema, positions, columns, group)
+        positions = range(len(next(iter(result.values()))))
+        if order is not None:
+            positions = order_positions(result[item_name(order)], positions, order['desc'], stop) # noqa: E501
+        positions = positions[offset:stop]
+    count('rows_returned', len(positions))
+    render(result, positions, output)
+
+
+# Функция получения позиций строк результата
+def fetch_positions(table_name: str, table_data: dict, where_clause: dict = None, indexes: dict = None) -> list: # noqa: E501
     '''
+    table_name - имя таблицы,
     table_data - данные таблицы,
-    where_column - столбец из условия where,
-    where_value - значение из условия where.
-    Функция получает данные из таблицы в зависимости от условия.
-    '''
-    if where_column is not None and where_value is not None:
-        indexes_to_print = find_indices(column_values=table_data[where_column], value=where_value) # noqa: E501
-        if len(indexes_to_print) == 0:
-            return {}
-
-        indexes_to_print.sort()
-        valuse_to_print = {}
-        for name in table_data.keys():
-            new_values = []
-            for ind in indexes_to_print:
-                new_values.append(table_data[name][ind])
-            valuse_to_print[name] = new_values
-            
-        return valuse_to_print
-    return table_data
+    where_clause - условие where,
+    indexes - индексы таблицы.
+    Функция возвращает позиции подходящих строк в порядке таблицы. На
+    больших таблицах условие без индекса проверяется параллельно
+    (parallel.scan_positions).
+    Без условия возвращается range по всем строкам: срез от него (limit,
+    offset) ничего не копирует.
+    '''
+    if where_clause is not None:
+        return scan_positions(table_name, table_data, where_clause, indexes)
+    return range(row_count(table_data))
 
 
 # Функция обновления данных в таблице
 @handle_db_errors
-def update(table_name: str, metadata: dict, cache, table_data: dict, set_clause: dict, where_clause: dict) -> dict: # noqa: E501
+def update(table_name: str, metadata: dict, cache, table_data: dict, set_clause: list, where_clause: dict, indexes: dict = None, limit: int = None) -> dict: # noqa: E501
     '''
     table_name - имя таблицы,
     metadata - текущие мета данные,
     table_data - данные таблицы,
-    set_clause - условие set для вставки.
-    where_clause - условие where.
-    Функция update, обновляет значение по условию where, если
-    такая запись находится.
+    set_clause - присваивания set [{'column': столбец, 'expr': выражение}],
+    where_clause - условие where,
+    indexes - индексы таблицы,
+    limit - сколько первых подходящих записей изменить (None - все).
+    Функция update, изменяет все записи, подходящие под условие where.
+    Выражения всех присваиваний считаются по старым значениям строк (set
+    a = b, b = a меняет значения местами) одним проходом по найденным
+    позициям, и только потом записываются. Журнал, индексы и кэш
+    обновляются один раз на команду.
     '''
-    where_column = list(where_clause.keys())[0]
-    where_value = list(where_clause.values())[0]
-    
-    set_column = list(set_clause.keys())[0]
-    set_value = list(set_clause.values())[0]
-    
     table_name_clean = table_name.strip().lower()
-    
-    if where_column in list(table_data.keys()) and set_column in list(table_data.keys()): # noqa: E501
-        if metadata[table_name_clean][where_column] != type(where_value).__name__ or metadata[table_name_clean][set_column] != type(set_value).__name__: # noqa: E501
-            print(f'Ошибка: тип данных в условии where/set: {type(where_value).__name__}/{type(set_value).__name__:} не совпадает с типом данных {metadata[table_name_clean][where_column]}/{metadata[table_name_clean][set_column]} в схеме таблицы.') # noqa: E501
+    schema = metadata[table_name_clean]
+
+    for assignment in set_clause:
+        set_column = assignment['column']
+        for column in (set_column, *expression_columns(assignment['expr'])):
+            if column not in table_data:
+                print(f'Ошибка: столбца {column} нет в таблице "{table_name_clean}".') # noqa: E501
+                return table_data
+        set_type = expression_type(assignment['expr'], schema)
+        if schema[set_column] != set_type:
+            print(f'Ошибка: тип данных в условии set: {set_type} не совпадает с типом данных {schema[set_column]} в схеме таблицы.') # noqa: E501
             return table_data
+    if not check_where(table_name_clean, metadata, table_data, where_clause):
+        return table_data
+
+    where_to_update = fetch_positions(table_name_clean, table_data, where_clause, indexes) # noqa: E501
+    if limit is not None:
+        where_to_update = where_to_update[:limit]
 
-        where_to_update = find_indices(column_values=table_data[where_column], value=where_value) # noqa: E501
+    if len(where_to_update) == 0:
+        print('Предупреждение: условие where не нашло ни одной записи, таблица не была изменена.') # noqa: E501
+        return table_data
 
-        if len(where_to_update) == 0:
-            print('Предупреждение: условие where не нашло ни одной записи, таблица не была изменена.') # noqa: E501
+    # Постоянное значение пишется в журнал один раз, вычисленные - по строкам
+    records = []
+    for assignment in set_clause:
+        expr = assignment['expr']
+        if 'value' in expr:
+            records.append(['u', assignment['column'], where_to_update, expr['value']])
+        else:
+            values = list(expression_values(expr, table_data, where_to_update))
+            records.append(['s', assignment['column'], where_to_update, values])
+    for record in records:
+        if schema[record[1]] == 'int' and int64_overflow([record[3]] if record[0] == 'u' else record[3]): # noqa: E501
+            print(f'Ошибка: значение столбца {record[1]} выходит за диапазон int64.')
             return table_data
+    log_change(table_name_clean, table_data, records[0] if len(records) == 1 else ['t', records]) # noqa: E501
 
-        elif len(where_to_update) > 1:
-            print(f'Предупреждение: найдено {len(where_to_update)} совпадений в таблице по условию where. Будет изменено первое по порядку значение.') # noqa: E501
-      
-        where_to_update.sort()
-        where_to_update = where_to_update[0]
-        table_data[set_column][where_to_update] = set_value
-        print(f'Запись с ID={table_data['id'][where_to_update]} в таблице "{table_name_clean}" успешно обновлена.') # noqa: E501
-        
-        key_update = table_name_clean + '_' + '-' + '-'
-        cache(key_update, '', 'update', '')
-        
-        return table_data
-        
+    for record in records:
+        column_values = table_data[record[1]]
+        old_values = None
+        if indexes and record[1] in indexes:
+            old_values = list(gather(column_values, where_to_update))
+        new_values = repeat(record[3]) if record[0] == 'u' else record[3]
+        for position, value in zip(where_to_update, new_values):
+            column_values[position] = value
+        if old_values is not None:
+            index_update_many(indexes, table_data, record[1], where_to_update, old_values) # noqa: E501
+
+    if len(where_to_update) == 1:
+        print(f'Запись с ID={table_data['id'][where_to_update[0]]} в таблице "{table_name_clean}" успешно обновлена.') # noqa: E501
     else:
-        print(f'Ошибка: столбца {where_column} или {set_column} нет в таблице "{table_name_clean}".') # noqa: E501
-        return table_data
-    
-    
+        print(f'В таблице "{table_name_clean}" обновлено записей: {len(where_to_update)}.') # noqa: E501
+
+    cache((table_name_clean,), '', 'update')
+
+    return table_data
+
+
 # Функция удаления записей из таблицы
-@confirm_action('удаление данных из таблицы')
 @handle_db_errors
-def delete(table_data: dict, table_name: str, cache, metadata: dict, where_clause: dict) -> dict: # noqa: E501
+def delete(table_data: dict, table_name: str, cache, metadata: dict, where_clause: dict, indexes: dict = None) -> dict: # noqa: E501
     '''
     table_name - имя таблицы,
     table_data - данные таблицы,
     metadata - текущие мета данные,
-    where_clause - условие where.
+    where_clause - условие where,
+    indexes - индексы таблицы.
     Функция delete, удаляет запись, которая соответствует условию where.
+    Перед удалением у пользователя запрашивается подтверждение с числом
+    найденных записей.
     '''
-    
-    where_column = list(where_clause.keys())[0]
-    where_value = list(where_clause.values())[0]
-    
     table_name_clean = table_name.strip().lower()
     
-    if where_column in list(table_data.keys()):
-        if metadata[table_name_clean][where_column] != type(where_value).__name__:
-            print(f'Тип данных в условии where: {type(where_value).__name__} не совпадает с типом данных {metadata[table_name_clean][where_column]} в схеме таблицы.') # noqa: E501
-            return table_data
-
-        where_to_delete = find_indices(column_values=table_data[where_column], value=where_value) # noqa: E501
+    if not check_where(table_name_clean, metadata, table_data, where_clause):
+        return table_data
 
-        if len(where_to_delete) == 0:
-            print('Условие where не нашло ни одной записи, таблица не была изменена.')
-            return table_data
+    where_to_delete = fetch_positions(table_name_clean, table_data, where_clause, indexes) # noqa: E501
 
-        elif len(where_to_delete) > 1:
-            print(f'Найдено {len(where_to_delete)} совпадений в таблице по условию where. Будут удалены все эти записи.') # noqa: E501
-        where_to_delete.sort(reverse=True)
-      
-        for ind in where_to_delete:
-            print(f'Запись с ID={table_data['id'][ind]} в таблице "{table_name_clean}" успешно удалена.') # noqa: E501
-            for name in table_data.keys():
-                del table_data[name][ind]
-            
-            key_delete = table_name_clean + '_' + '-' + '-'
-            cache(key_delete, '', 'delete', '')
-            
-        return table_data
-        
-    else:
-        print(f'Ошибка: столбца {where_column} нет в таблице "{table_name_clean}".')
+    if len(where_to_delete) == 0:
+        print('Условие where не нашло ни одной записи, таблица не была изменена.')
         return table_data
+
+    elif len(where_to_delete) > 1:
+        print(f'Найдено {len(where_to_delete)} совпадений в таблице по условию where. Будут удалены все эти записи.') # noqa: E501
+
+    return delete_rows(table_data=table_data, table_name=table_name_clean, cache=cache, positions=where_to_delete, indexes=indexes) # noqa: E501
     
     
+# Функция удаления строк по позициям
+@confirm_action(lambda table_name, positions, **_: f'удаление {len(positions)} записей из таблицы {table_name}') # noqa: E501
+@handle_db_errors
+def delete_rows(table_data: dict, table_name: str, cache, positions: list, indexes: dict = None) -> dict: # noqa: E501
+    '''
+    table_data - данные таблицы,
+    table_name - очищенное имя таблицы,
+    positions - отсортированные по возрастанию позиции удаляемых строк,
+    indexes - индексы таблицы.
+    Функция за один проход по каждому столбцу оставляет только уцелевшие
+    строки, один раз сдвигает позиции в индексах и один раз сбрасывает кэш.
+    '''
+    if len(positions) == 1:
+        print(f'Запись с ID={table_data['id'][positions[0]]} в таблице "{table_name}" успешно удалена.') # noqa: E501
+    else:
+        print(f'Из таблицы "{table_name}" успешно удалено записей: {len(positions)}.') # noqa: E501
+
+    log_change(table_name, table_data, ['d', positions])
+    mask = keep_mask(len(table_data['id']), positions)
+    remove_rows(table_data, mask)
+    if indexes is not None:
+        index_delete(indexes, mask)
+
+    cache((table_name,), '', 'delete')
+    return table_data
+
+
 # Функция для выведения схемы таблицы
 @handle_db_errors
-def info(table_name: str, metadata: dict, table_data: dict) -> None:
+def info(table_name: str, metadata: dict, table_data: dict, indexes: dict = None) -> None: # noqa: E501
     '''
     table_name - название таблицы,
     metadata - мате данные,
-    table_data - данные из таблицы.
+    table_data - данные из таблицы,
+    indexes - индексы таблицы.
     Функция выводит основую информацию о таблице.
     '''
     print(f'Таблица: {table_name}')
     print(f'Столбцы: {", ".join([list(metadata[table_name].keys())[i] + ":" + list(metadata[table_name].values())[i] for i in range (len(list(metadata[table_name].keys())))])}') # noqa: E501
-    print(f'Количество записей: {len(table_data[list(table_data.keys())[0]])}')
+    print(f'Количество записей: {row_count(table_data)}')
+    print(f'Последовательность id: {table_sequence(metadata, table_name, table_data["id"])["sequence"]}') # noqa: E501
+    print(f'Формат хранения: {table_backend(table_name)}')
+    if isinstance(table_data, LazyTable):
+        print(f'Загружено в память столбцов: {len(table_data) - len(table_data.pending)} из {len(table_data)}') # noqa: E501
+    for name in table_data.keys():
+        # dict.get не загружает ленивые столбцы
+        column = dict.get(table_data, name)
+        if column is None:
+            print(f'Столбец: {name}, не загружен')
+        else:
+            print(f'Столбец: {name}, {column_kind(column)}, память: {column_bytes(column)} байт') # noqa: E501
+    for column, index in (indexes or {}).items():
+        print(f'Индекс: {column} ({index["kind"]}), значений: {index_cardinality(index)}, память: {index_size(index)} байт') # noqa: E501
     return
     
     
-# Вспомогательная функция для поиска значений
-@handle_db_errors
-def find_indices(column_values: list, value) -> list:
+# Вспомогательная функция проверки условия where
+def check_where(table_name: str, metadata: dict, table_data: dict, where_clause: dict) -> bool: # noqa: E501
     '''
-    column_values - список значений столбца,
-    value - значение для поиска.
-    Вспомогательная функция для получения всех индексов элементов,
-    которые равны заданному
+    table_name - очищенное имя таблицы,
+    metadata - текущие мета данные,
+    table_data - данные таблицы,
+    where_clause - условие where.
+    Функция проверяет, что все столбцы условия есть в таблице, а типы
+    значений совпадают со схемой. При ошибке выводит сообщение.
     '''
-    indices = []
-    for i, elem in enumerate(column_values):
-        if elem == value:
-            indices.append(i)
-      
-    return indices
+    for leaf in where_leaves(where_clause):
+        where_column = leaf['column']
+        if where_column not in table_data:
+            print(f'Ошибка: столбца {where_column} нет в таблице "{table_name}".')
+            return False
+        where_type = where_value_type(leaf)
+        if metadata[table_name][where_column] != where_type:
+            print(f'Ошибка: тип данных в условии where: {where_type} не совпадает с типом данных {metadata[table_name][where_column]} в схеме таблицы.') # noqa: E501
+            return False
+    return True
+
+
+# Вспомогательная функция проверки order by
+def check_order(table_name: str, schema: dict, order: dict, columns: list = None) -> bool: # noqa: E501
+    '''
+    table_name - имя таблицы (или таблиц join),
+    schema - схема {столбец: тип},
+    order - сортировка order by,
+    columns - столбцы агрегатного запроса (None - запрос без агрегатов).
+    В агрегатном запросе сортировать можно только по столбцам результата.
+    '''
+    if columns is not None:
+        names = [item_name(item) for item in columns]
+        if item_name(order) not in names:
+            print(f'Ошибка: результат агрегатного запроса можно сортировать только по его столбцам: {", ".join(names)}.') # noqa: E501
+            return False
+        return True
+    if order.get('func') is not None:
+        print('Ошибка: агрегатная функция в order by допустима только в агрегатном запросе.') # noqa: E501
+        return False
+    if order['column'] not in schema:
+        print(f'Ошибка: столбца {order["column"]} нет в таблице "{table_name}".')
+        return False
+    return True
+
+
+# Вспомогательная функция проверки столбцов select
+def check_columns(table_name: str, metadata: dict, columns: list, group: str = None) -> bool: # noqa: E501
+    '''
+    table_name - очищенное имя таблицы,
+    metadata - текущие мета данные,
+    columns - столбцы и агрегатные функции select,
+    group - столбец group by.
+    Функция проверяет, что столбцы есть в таблице. В агрегатном запросе
+    sum и avg считаются по столбцам int, а столбец без функции - это
+    столбец group by.
+    '''
+    schema = metadata[table_name]
+    if columns is None:
+        print('Ошибка: для group by нужно указать столбцы, например: select <столбец>, count(*) from ... group by <столбец>.') # noqa: E501
+        return False
+    if group is not None and group not in schema:
+        print(f'Ошибка: столбца {group} нет в таблице "{table_name}".')
+        return False
+
+    aggregated = group is not None or is_aggregate(columns)
+    for item in columns:
+        func, column = item.get('func'), item['column']
+        if column == '*':
+            continue
+        if column not in schema:
+            print(f'Ошибка: столбца {column} нет в таблице "{table_name}".')
+            return False
+        if aggregated and func is None and column != group:
+            print(f'Ошибка: столбец {column} должен быть в group by или внутри агрегатной функции.') # noqa: E501
+            return False
+        if func in NUMERIC_AGGREGATES and schema[column] != 'int':
+            print(f'Ошибка: функция {func} считается только по столбцам int, а {column} - {schema[column]}.') # noqa: E501
+            return False
+    return True
+
+
+# Вспомогательная функция получения типа значения условия where
+def where_value_type(where_clause: dict) -> str:
+    '''
+    where_clause - сравнение из условия where.
+    Функция возвращает имя типа значения сравнения. Для between границы
+    должны быть одного типа, иначе возвращается пара типов через '/'.
+    '''
+    if where_clause['op'] == 'between':
+        low, high = where_clause['value']
+        if type(low) is not type(high):
+            return f'{type(low).__name__}/{type(high).__name__}'
+        return type(low).__name__
+    return type(where_clause['value']).__name__
     
     
+# Функция создания индекса
+@handle_db_errors
+def create_index(metadata: dict, table_name: str, column: str, table_data: dict, indexes: dict, kind: str = 'hash') -> dict: # noqa: E501
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    column - столбец для индекса,
+    table_data - данные таблицы,
+    indexes - индексы таблицы,
+    kind - вид индекса: hash (только =) или sorted (= < > <= >= between).
+    Функция строит индекс по столбцу и записывает его в мета данные.
+    Индекс по столбцу можно заменить индексом другого вида.
+    '''
+    table_name_clean = table_name.strip().lower()
+    if column not in metadata[table_name_clean]:
+        print(f'Ошибка: столбца {column} нет в таблице "{table_name_clean}".')
+        return metadata
+
+    if kind not in INDEX_KINDS:
+        print(f'Ошибка: неизвестный вид индекса {kind}. Доступные: {", ".join(INDEX_KINDS)}.') # noqa: E501
+        return metadata
+
+    if kind == 'sorted' and metadata[table_name_clean][column] not in SORTED_INDEX_TYPES: # noqa: E501
+        print(f'Ошибка: отсортированный индекс поддерживается только для типов {", ".join(SORTED_INDEX_TYPES)}.') # noqa: E501
+        return metadata
+
+    options = table_options(metadata, table_name_clean)
+    if options['indexes'].get(column) == kind:
+        print(f'Ошибка: индекс по столбцу {column} уже существует.')
+        return metadata
+
+    options['indexes'][column] = kind
+    indexes[column] = build_index(table_data[column], kind)
+    print(f'Индекс по столбцу {column} таблицы "{table_name_clean}" успешно создан.')
+    return metadata
+
+
+# Функция удаления индекса
+@handle_db_errors
+def drop_index(metadata: dict, table_name: str, column: str, indexes: dict) -> dict:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    column - столбец индекса,
+    indexes - индексы таблицы.
+    Функция удаляет индекс по столбцу. Индекс по id удалить нельзя.
+    '''
+    table_name_clean = table_name.strip().lower()
+    options = table_options(metadata, table_name_clean)
+    if column == 'id':
+        print('Ошибка: индекс по столбцу id создается автоматически и не удаляется.')
+        return metadata
+    if column not in options['indexes']:
+        print(f'Ошибка: индекса по столбцу {column} нет.')
+        return metadata
+
+    del options['indexes'][column]
+    indexes.pop(column, None)
+    print(f'Индекс по столбцу {column} таблицы "{table_name_clean}" успешно удален.')
+    return metadata
+
+
+# Функция сброса последовательности id
+@handle_db_errors
+def reseed(metadata: dict, table_name: str, table_data: dict, value: int = None) -> dict: # noqa: E501
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    table_data - данные таблицы,
+    value - новое значение последовательности (следующий id будет value + 1).
+    Без значения последовательность сбрасывается до максимального id в таблице.
+    Опустить ее ниже максимального id нельзя, иначе id начнут повторяться.
+    '''
+    table_name_clean = table_name.strip().lower()
+    max_id = max(table_data['id'], default=0)
+    if value is None:
+        value = max_id
+    if value < max_id:
+        print(f'Ошибка: значение последовательности не может быть меньше максимального id ({max_id}).') # noqa: E501
+        return metadata
+
+    set_sequence(metadata, table_name_clean, value)
+    print(f'Последовательность id таблицы "{table_name_clean}" установлена в {value}. Следующий id: {value + 1}.') # noqa: E501
+    return metadata
+
+
+# Функция перевода таблицы в другой формат хранения
+@handle_db_errors
+def migrate_table(table_name: str, table_data: dict, backend: str) -> bool:
+    '''
+    table_name - имя таблицы,
+    table_data - актуальные данные таблицы (журнал уже свернут в снимок),
+    backend - новый формат хранения (json или binary).
+    Функция записывает таблицу в новом формате и удаляет файл старого.
+    '''
+    table_name_clean = table_name.strip().lower()
+    if backend not in BACKENDS:
+        print(f'Ошибка: неизвестный формат хранения {backend}. Доступные: {", ".join(BACKENDS)}.') # noqa: E501
+        return False
+
+    if table_backend(table_name_clean) == backend:
+        print(f'Таблица "{table_name_clean}" уже хранится в формате {backend}.')
+        return False
+
+    save_snapshot(table_name_clean, table_data, backend)
+    print(f'Таблица "{table_name_clean}" переведена в формат {backend}.')
+    return True
@@ -1,6 +1,23 @@
 # src/primitive_db/decorators.py
 import time
 
+from .metrics import METRICS, observe
+
+# Настройки запуска. Пакетный режим (--script или ввод из канала) и режим
+# сервера меняют их до выполнения первой команды. interactive - можно ли
+# спрашивать пользователя (например, листать страницы результата).
+# workers - число процессов параллельного скана (None - по числу ядер,
+# 0 или 1 - без параллельного скана). answers - поток, из которого в пакетном
+# режиме читаются ответы на подтверждения (None - ввод с клавиатуры).
+RUN_OPTIONS = {
+    'assume_yes': False,
+    'log_time': True,
+    'wal': True,
+    'interactive': True,
+    'workers': None,
+    'answers': None,
+}
+
 
 # Декоратор для поимки исключений
 def handle_db_errors(func):
@@ -19,10 +36,21 @@ def handle_db_errors(func):
 
 
 # Декоратор для подтверждения действия пользователя
-def confirm_action(action_name: str):
+# action_name - строка или функция, которая по аргументам вызова
+# возвращает описание действия (например, с числом затрагиваемых записей)
+def confirm_action(action_name):
     def decorator(func):
         def wrapper(*args, **kwargs):
-            answer = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ')
+            if RUN_OPTIONS['assume_yes']:
+                return func(*args, **kwargs)
+            name = action_name(*args, **kwargs) if callable(action_name) else action_name # noqa: E501
+            prompt = f'Вы уверены, что хотите выполнить "{name}"? [y/n]: '
+            if RUN_OPTIONS['answers'] is None:
+                answer = input(prompt)
+            else:
+                # Ответ - следующая строка пакета; конец ввода значит "нет"
+                print(prompt, end='', flush=True)
+                answer = RUN_OPTIONS['answers'].readline()
             if answer.strip().lower() in ('y', 'yes', 'д', 'да'):
                 return func(*args, **kwargs)
             print('Операция отменена.')
@@ -34,6 +62,8 @@ def confirm_action(action_name: str):
 # Декоратор для подсчета времени выполнения функции
 def log_time(func):
     def wrapper(*args, **kwargs):
+        if not RUN_OPTIONS['log_time']:
+            return func(*args, **kwargs)
         start_time = time.monotonic()
         result = func(*args, **kwargs)
         end_time = time.monotonic()
@@ -41,3 +71,19 @@ def log_time(func):
         print(f"Функция {func.__name__} выполнилась за {elapsed:.6f} секунд.")
         return result
     return wrapper
+
+
+# Декоратор для замера времени фазы выполнения команды в реестр метрик
+# phase - имя фазы (parse, load, where, render, save, ...)
+def timed(phase):
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            if not METRICS['enabled']:
+                return func(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe('phase', phase, time.perf_counter() - start_time)
+        return wrapper
+    return decorator
@@ -1,182 +1,529 @@
 # src/primitive_db/engine.py
-import shlex as sh
+import sys
+import time
+from contextlib import ExitStack
 
-from .constants import META_FILEPATH
+from .buffer_pool import (
+  checkpoint,
+  commit_tables,
+  create_buffer_pool,
+  discard_table,
+  get_indexes,
+  get_table,
+  mark_dirty,
+  maybe_checkpoint,
+  refresh_table,
+  rollback_tables,
+  vacuum,
+)
+from .bulk import import_table
+from .cache import create_cacher, print_cache_stats
+from .catalog import (
+  load_catalog,
+  refresh_catalog,
+  release_sequences,
+  save_catalog,
+)
 from .core import (
+  create_index,
   create_table,
   delete,
+  drop_index,
   drop_table,
   info,
   insert,
   list_tables,
+  migrate_table,
+  reseed,
   select,
+  select_join,
   update,
 )
-from .parser import parser_clause
+from .decorators import RUN_OPTIONS
+from .locks import catalog_lock, table_lock
+from .metrics import (
+  METRICS,
+  dump_metrics,
+  enable_metrics,
+  maybe_dump_metrics,
+  observe,
+  print_metrics,
+  reset_metrics,
+)
+from .parallel import shutdown_parallel
+from .parser import bind_plan, create_planner
+from .transaction import (
+  TRANSACTION_FORBIDDEN,
+  TRANSACTION_STATE,
+  begin_transaction,
+  commit_transaction,
+  release_transaction,
+  rollback_transaction,
+  transaction_owner,
+)
 from .utils import (
-  create_cacher,
-  load_metadata,
-  load_table_data,
   print_help,
-  save_metadata,
-  save_table_data,
   user_input,
 )
+from .wal import recover_groups
+
+# Блокировки команд: (блокировка таблицы команды - shared или exclusive,
+# нужна ли исключительная блокировка мета данных). Остальные команды
+# блокировок не берут: таблицы, которые они сбрасывают на диск, блокируются
+# в buffer_pool.flush_table.
+COMMAND_LOCKS = {
+    'create_table': ('exclusive', True),
+    'drop_table': ('exclusive', True),
+    'insert': ('exclusive', False),
+    'import': ('exclusive', False),
+    'select': ('shared', False),
+    'update': ('exclusive', False),
+    'delete': ('exclusive', False),
+    'info': ('shared', False),
+    'reseed': ('shared', True),
+    'create_index': ('shared', True),
+    'drop_index': ('shared', True),
+    'vacuum': ('exclusive', False),
+    'migrate': ('exclusive', False),
+}
+
+
+def run(script: str = None, assume_yes: bool = False, metrics_file: str = None, metrics_interval: float = None): # noqa: E501
+    '''
+    script - файл с командами (None - команды с клавиатуры или из канала),
+    assume_yes - отвечать "да" на все подтверждения,
+    metrics_file - файл для выгрузки метрик (.prom - формат Prometheus,
+    иначе JSON); если задан, сбор метрик включается сразу,
+    metrics_interval - период выгрузки метрик в секундах.
+    В пакетном режиме (файл или ввод не с терминала) не выводятся
+    приглашения и время выполнения функций, а журнал изменений не ведется:
+    измененные таблицы записываются один раз в конце или командой checkpoint.
+    '''
+    batch = script is not None or not sys.stdin.isatty()
+    RUN_OPTIONS['assume_yes'] = assume_yes
+    if metrics_file is not None:
+        enable_metrics(dump_path=metrics_file, dump_interval=metrics_interval)
+    if batch:
+        RUN_OPTIONS['log_time'] = False
+        RUN_OPTIONS['wal'] = False
+    else:
+        print('***')
+        print_help()
+    session = create_session(batch)
+
+    start_time = time.monotonic()
+    try:
+        if script is not None:
+            with open(script, encoding='utf-8') as script_file:
+                RUN_OPTIONS['answers'] = script_file
+                executed = run_loop(session, script_commands(script_file))
+        elif batch:
+            RUN_OPTIONS['answers'] = sys.stdin
+            executed = run_loop(session, script_commands(sys.stdin))
+        else:
+            executed = run_loop(session, interactive_commands())
+    finally:
+        RUN_OPTIONS['answers'] = None
+        close_session(session)
+
+    if batch:
+        print(f'Выполнено команд: {executed} за {time.monotonic() - start_time:.3f} секунд.') # noqa: E501
+
+
+# Функция создания сессии работы с базой
+def create_session(batch: bool = False) -> dict:
+    '''
+    batch - пакетный режим (контрольные точки не срабатывают сами по себе).
+    Функция загружает мета данные и создает все, что живет между командами:
+    буферный пул таблиц, кэш запросов, кэш планов, подготовленные команды и
+    открытую транзакцию. Перед этим дописываются транзакции, запись которых
+    прервал сбой.
+    '''
+    recover_groups()
+    if batch:
+        pool = create_buffer_pool(flush_every=float('inf'), flush_interval=float('inf')) # noqa: E501
+    else:
+        pool = create_buffer_pool()
+    metadata = load_catalog()
+    return {
+        'pool': pool,
+        'cache': create_cacher(),
+        'metadata': metadata,
+        'planner': create_planner(),
+        'prepared': {},
+        'transaction': None,
+    }
+
+
+# Функция завершения сессии
+def close_session(session: dict) -> None:
+    if abort_transaction(session):
+        print('Незавершенная транзакция отменена.')
+    checkpoint(session['pool'])
+    release_sequences()
+    shutdown_parallel()
+    dump_metrics(cache_stats(session))
+
 
+# Функция отката открытой транзакции сессии
+def abort_transaction(session: dict) -> bool:
+    '''
+    session - сессия из create_session.
+    Функция возвращает изменения открытой транзакции в таблицах в памяти,
+    сбрасывает их индексы и результаты в кэше и снимает блокировки.
+    Возвращает False, если транзакции нет.
+    '''
+    transaction = session['transaction']
+    if transaction is None:
+        return False
+    session['transaction'] = None
+    try:
+        table_names = rollback_transaction(transaction, session['pool']['tables'])
+        rollback_tables(session['pool'], table_names)
+        for table_name in table_names:
+            session['cache']((table_name,), '', 'drop')
+    finally:
+        release_transaction(transaction)
+    return True
 
-def run():
-    print('***')
-    print_help()
-    # Создаем кэш
-    select_cache = create_cacher()
-    
+
+# Функция получения статистики кэша запросов сессии
+def cache_stats(session: dict) -> dict:
+    return session['cache'](('',), '', 'stats')
+
+
+# Функция получения команд с клавиатуры
+def interactive_commands():
     while True:
         print('\n')
-        current_metadata = load_metadata(filepath=META_FILEPATH)
         user_cmd = user_input()
-        lexer = sh.shlex(user_cmd, posix=False)
-        lexer.whitespace_split = True
-        args = list(lexer)
-
-        match args[0].lower():
-
-            case 'create_table':
-                if len(args) < 3:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-                current_metadata = create_table(metadata=current_metadata, table_name=args[1], columns=args[2:]) # noqa: E501
-                if not current_metadata:
-                    continue
-                save_metadata(filepath=META_FILEPATH, data=current_metadata)
-      
-            case 'drop_table':
-                if len(args) < 2:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-          
-                current_metadata = drop_table(metadata=current_metadata, cache=select_cache, table_name=args[1]) # noqa: E501
-                if current_metadata == '-1':
-                    continue
-                save_metadata(filepath=META_FILEPATH, data=current_metadata)
-        
-            case 'list_tables':
-                list_tables(metadata=current_metadata)
-        
-            case 'insert':
-                if len(args) < 5:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-          
-                if args[1].lower() == 'into' and args[3].lower() == 'values':
-                    table_name = args[2]
-                    table_name_clean = table_name.strip().lower()
-                    current_table_data = load_table_data(table_name=table_name_clean)
-                    if not current_table_data:
-                        print("Ошибка: функция load_table_data не смогла получить данные таблицы.") # noqa: E501
-                        continue
-            
-                    current_table_data = insert(metadata=current_metadata, data=current_table_data, cache=select_cache, table_name=table_name_clean, values=' '.join(args[4:])) # noqa: E501
-                    save_table_data(table_name=table_name_clean, data=current_table_data) # noqa: E501
-          
-                else:
-                    print('Ошибка: неправильный формат ввода ключевых слов.')
-
-            case 'select':
-                if len(args) < 3:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-      
-                if args[1].lower() == 'from':
-                    table_name = args[2]
-                    table_name_clean = table_name.strip().lower()
-                    current_table_data = load_table_data(table_name=table_name_clean) # noqa: E501
-
-                    if not current_table_data:
-                        print('Ошибка: функция load_table_data не смогла получить данные таблицы.') # noqa: E501
-                        continue
-        
-                    if args[3:]:
-                        where_clause = parser_clause(clause=args[3:])
-                        if not where_clause:
-                            continue
-                        select(table_name=table_name_clean, table_data=current_table_data, cache=select_cache, metadata=current_metadata, where_clause=where_clause) # noqa: E501
-        
-                    else:
-                        select(table_name=table_name_clean, table_data=current_table_data, cache=select_cache) # noqa: E501
-      
-                else:
-                    print('Ошибка: неправильный формат ввода ключевых слов.') # noqa: E501
-
-            case 'update':
-                if len(args) != 10:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-                if args[2].lower() == 'set' and args[6].lower() == 'where' and args[4] == '=' and args[8] == '=': # noqa: E501
-                    table_name = args[1]
-                    table_name_clean = table_name.strip().lower()
-                    current_table_data = load_table_data(table_name=table_name_clean)
-          
-                    if not current_table_data:
-                        print('Ошибка: функция load_table_data не смогла получить данные таблицы.') # noqa: E501
-                        continue
-          
-                    set_clause = parser_clause(clause=args[2:6])
-                    if not set_clause:
-                        continue
-            
-                    where_clause = parser_clause(clause=args[6:])
-                    if not where_clause:
-                        continue
-                    updated_table_data = update(table_name=table_name_clean, metadata=current_metadata, cache=select_cache, table_data=current_table_data, set_clause=set_clause, where_clause=where_clause) # noqa: E501
-                    save_table_data(table_name=table_name_clean, data=updated_table_data) # noqa: E501
-                else:
-                    print('Ошибка: неправильный формат команды.')
-          
-            case 'delete':
-                if len(args) != 7:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-                if args[1].lower() == 'from' and args[3].lower() == 'where' and args[5] == '=': # noqa: E501
-                    table_name = args[2]
-                    table_name_clean = table_name.strip().lower()
-                    current_table_data = load_table_data(table_name=table_name_clean)
-
-                    if not current_table_data:
-                        print('Ошибка: функция load_table_data не смогла получить данные таблицы.') # noqa: E501
-                        continue
-            
-                    where_clause = parser_clause(clause=args[3:])
-                    if not where_clause:
-                        continue
-                        
-                    updated_table_data = delete(table_data=current_table_data, table_name=table_name_clean, cache=select_cache, metadata=current_metadata, where_clause=where_clause) # noqa: E501
-                    if updated_table_data == '-1':
-                        continue
-                    save_table_data(table_name=table_name_clean, data=updated_table_data) # noqa: E501
-                else:
-                    print('Ошибка: неправильный формат команды.')
-      
-            case 'info':
-                if len(args) != 2:
-                    print('Ошибка: неправильный формат ввода команды.')
-                    continue
-                table_name = args[1]
-                table_name_clean = table_name.strip().lower()
-                current_table_data = load_table_data(table_name=table_name_clean)
-          
-                if not current_table_data:
-                    print('Ошибка: функция load_table_data не смогла получить данные таблицы.') # noqa: E501
-                    continue
-                info(table_name=table_name_clean, metadata=current_metadata, table_data=current_table_data) # noqa: E501
-      
-            case 'exit':
-                print('Программа остановлена!')
-                break
-      
-            case 'help':
-                print_help()
-        
-            case _:
-                print(f'Ошибка: функции {args[0]} нет в программе. Попробуйте снова.')
+        # Конец ввода (Ctrl+D)
+        if user_cmd is None:
+            return
+        yield user_cmd
+
+
+# Функция получения команд из файла или канала
+def script_commands(stream):
+    '''
+    stream - открытый файл или sys.stdin.
+    Функция отдает команды по одной на строку. Пустые строки и комментарии
+    (-- или #) пропускаются, точка с запятой в конце строки отбрасывается.
+    Строки читаются через readline, а run передает этот же поток
+    подтверждениям (RUN_OPTIONS['answers']), поэтому без --yes ответ берется
+    следующей строкой файла или канала.
+    '''
+    for line in iter(stream.readline, ''):
+        line = line.strip()
+        if line.endswith(';'):
+            line = line[:-1].rstrip()
+        if not line or line.startswith(('--', '#')):
+            continue
+        yield line
+
+
+def run_loop(session: dict, commands) -> int:
+    '''
+    session - сессия из create_session,
+    commands - источник команд (строк).
+    Функция выполняет команды до exit или конца ввода и возвращает их число.
+    Текст команды разбирается в план один раз: повторы берутся из кэша планов.
+    Если метрики включены, время каждой команды (вместе с разбором)
+    попадает в гистограмму по имени команды.
+    '''
+    executed = 0
+    for user_cmd in commands:
+        maybe_checkpoint(session['pool'])
+        maybe_dump_metrics(lambda: cache_stats(session))
+        start_time = time.perf_counter() if METRICS['enabled'] else None
+        plan = session['planner'](user_cmd)
+        if plan is None:
+            continue
+        executed += 1
+        if plan['command'] == 'exit':
+            print('Программа остановлена!')
+            break
+        execute_plan(session, plan)
+        if start_time is not None:
+            observe('command', plan['command'], time.perf_counter() - start_time)
+
+    return executed
+
+
+# Функция получения таблицы для команды
+def command_table(session: dict, table_name: str):
+    table_data = get_table(session['pool'], table_name)
+    if not table_data:
+        print('Ошибка: функция load_table_data не смогла получить данные таблицы.') # noqa: E501
+    return table_data
+
+
+# Функция выполнения плана команды
+def execute_plan(session: dict, plan: dict) -> None:
+    '''
+    session - сессия из create_session,
+    plan - план команды из parser.parse_command.
+    Команда выполняется под блокировками из COMMAND_LOCKS: читатели одной
+    таблицы не мешают друг другу, писатель блокирует только свою таблицу.
+    Блокировка таблицы берется раньше блокировки мета данных (в этом же
+    порядке их берет insert, резервируя id). Под блокировками мета данные и
+    таблица в памяти сверяются с файлами и при необходимости обновляются.
+    Таблицу, измененную незавершенной транзакцией другого соединения
+    сервера, команда не трогает. Select с join блокирует обе таблицы в
+    порядке имен.
+    '''
+    table_mode, catalog_exclusive = COMMAND_LOCKS.get(plan['command'], (None, False)) # noqa: E501
+    table_names = []
+    if table_mode is not None:
+        table_names = [plan['table']]
+        if plan.get('join') is not None:
+            table_names = sorted({plan['table'], plan['join']['table']})
+    transaction = session['transaction']
+    if transaction is not None and plan['command'] in TRANSACTION_FORBIDDEN:
+        print(f'Ошибка: команда {plan["command"]} недоступна внутри транзакции. Выполните commit или rollback.') # noqa: E501
+        return
+    for table_name in table_names:
+        if transaction_owner(table_name) not in (None, transaction):
+            print(f'Ошибка: таблица "{table_name}" изменяется в незавершенной транзакции другого соединения.') # noqa: E501
+            return
+    previous = TRANSACTION_STATE['current']
+    TRANSACTION_STATE['current'] = transaction
+    try:
+        with ExitStack() as locks:
+            for table_name in table_names:
+                locks.enter_context(table_lock(table_name, exclusive=table_mode == 'exclusive')) # noqa: E501
+            if catalog_exclusive:
+                locks.enter_context(catalog_lock(exclusive=True))
+            sync_session(session, table_names)
+            run_command(session, plan)
+    except TimeoutError as error:
+        print(f'Ошибка: {error}')
+    finally:
+        TRANSACTION_STATE['current'] = previous
+
+
+# Функция сверки сессии с файлами на диске
+def sync_session(session: dict, table_names: list = ()) -> None:
+    '''
+    session - сессия из create_session,
+    table_names - таблицы команды (их блокировки уже захвачены).
+    Если мета данные изменил другой процесс, индексы в пуле перестраиваются,
+    а удаленные таблицы забываются. Если изменилась таблица команды, ее
+    результаты в кэше запросов сбрасываются.
+    '''
+    pool = session['pool']
+    if refresh_catalog(session['metadata']):
+        pool['indexes'].clear()
+        for name in list(pool['tables']):
+            if name not in session['metadata']:
+                discard_table(pool, name)
+                session['cache']((name,), '', 'drop')
+    for table_name in table_names:
+        if refresh_table(pool, table_name):
+            session['cache']((table_name,), '', 'drop')
+
+
+# Функция выполнения команды
+def run_command(session: dict, plan: dict) -> None:
+    '''
+    session - сессия из create_session,
+    plan - план команды из parser.parse_command.
+    '''
+    pool = session['pool']
+    select_cache = session['cache']
+    current_metadata = session['metadata']
+    table_name_clean = plan.get('table')
+
+    match plan['command']:
+
+        case 'create_table':
+            if not create_table(metadata=current_metadata, table_name=table_name_clean, columns=plan['columns']): # noqa: E501
+                return
+            save_catalog(current_metadata)
+
+        case 'drop_table':
+            new_metadata = drop_table(metadata=current_metadata, cache=select_cache, table_name=table_name_clean) # noqa: E501
+            if not new_metadata or new_metadata == '-1':
+                return
+            discard_table(pool, table_name_clean)
+            save_catalog(current_metadata)
+
+        case 'list_tables':
+            list_tables(metadata=current_metadata)
+
+        case 'insert':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            insert(metadata=current_metadata, data=current_table_data, cache=select_cache, table_name=table_name_clean, rows=plan['rows'], indexes=indexes) # noqa: E501
+            mark_dirty(pool, table_name_clean)
+
+        case 'import':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            import_table(metadata=current_metadata, data=current_table_data, cache=select_cache, table_name=table_name_clean, filepath=plan['path'], indexes=indexes) # noqa: E501
+            mark_dirty(pool, table_name_clean)
+
+        case 'select' if plan['join'] is not None:
+            join_table = plan['join']['table']
+            if join_table == table_name_clean:
+                print('Ошибка: join таблицы с самой собой не поддерживается.')
+                return
+            tables = {}
+            for name in (table_name_clean, join_table):
+                tables[name] = command_table(session, name)
+                if not tables[name]:
+                    return
+            indexes = {name: get_indexes(pool, current_metadata, name) for name in tables} # noqa: E501
+            select_join(tables=tables, cache=select_cache, metadata=current_metadata, join=plan['join'], where_clause=plan['where'], indexes=indexes, limit=plan['limit'], offset=plan['offset'], output=plan['format'], columns=plan['columns'], group=plan['group'], order=plan['order']) # noqa: E501
+
+        case 'select':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = None
+            if plan['where'] is not None or plan['group'] is not None or plan['order'] is not None: # noqa: E501
+                indexes = get_indexes(pool, current_metadata, table_name_clean)
+            select(table_name=table_name_clean, table_data=current_table_data, cache=select_cache, metadata=current_metadata, where_clause=plan['where'], indexes=indexes, limit=plan['limit'], offset=plan['offset'], output=plan['format'], columns=plan['columns'], group=plan['group'], order=plan['order']) # noqa: E501
+
+        case 'update':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            update(table_name=table_name_clean, metadata=current_metadata, cache=select_cache, table_data=current_table_data, set_clause=plan['set'], where_clause=plan['where'], indexes=indexes, limit=plan['limit']) # noqa: E501
+            mark_dirty(pool, table_name_clean)
+
+        case 'delete':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            updated_table_data = delete(table_data=current_table_data, table_name=table_name_clean, cache=select_cache, metadata=current_metadata, where_clause=plan['where'], indexes=indexes) # noqa: E501
+            if updated_table_data == '-1':
+                return
+            mark_dirty(pool, table_name_clean)
+
+        case 'info':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            info(table_name=table_name_clean, metadata=current_metadata, table_data=current_table_data, indexes=indexes) # noqa: E501
+
+        case 'reseed':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            reseed(metadata=current_metadata, table_name=table_name_clean, table_data=current_table_data, value=plan['value']) # noqa: E501
+            save_catalog(current_metadata)
+
+        case 'create_index' | 'drop_index':
+            current_table_data = command_table(session, table_name_clean)
+            if not current_table_data:
+                return
+            indexes = get_indexes(pool, current_metadata, table_name_clean)
+            if plan['command'] == 'create_index':
+                create_index(metadata=current_metadata, table_name=table_name_clean, column=plan['column'], table_data=current_table_data, indexes=indexes, kind=plan['kind']) # noqa: E501
+            else:
+                drop_index(metadata=current_metadata, table_name=table_name_clean, column=plan['column'], indexes=indexes) # noqa: E501
+            save_catalog(current_metadata)
+
+        case 'vacuum':
+            if table_name_clean not in current_metadata:
+                print(f'Ошибка: таблица "{table_name_clean}" не существует.')
+                return
+            if vacuum(pool, table_name_clean):
+                print(f'Журнал таблицы "{table_name_clean}" свернут в снимок.')
+
+        case 'migrate':
+            if table_name_clean not in current_metadata:
+                print(f'Ошибка: таблица "{table_name_clean}" не существует.')
+                return
+            # Журнал привязан к снимку, поэтому сначала сворачиваем его
+            if not vacuum(pool, table_name_clean):
+                return
+            current_table_data = get_table(pool, table_name_clean)
+            if migrate_table(table_name_clean, current_table_data, plan['backend']):
+                discard_table(pool, table_name_clean)
+
+        case 'cache':
+            if plan['action'] == 'stats':
+                print_cache_stats(select_cache)
+            elif plan['action'] == 'clear':
+                select_cache(('',), '', 'clear')
+                print('Кэш запросов очищен.')
+            else:
+                select_cache(('',), '', 'verbose', plan['value'])
+                print(f'Сообщения кэша: {"on" if plan["value"] else "off"}.')
+
+        case 'stats':
+            if plan['action'] == 'show':
+                print_metrics(cache_stats(session))
+            elif plan['action'] == 'reset':
+                reset_metrics()
+                print('Метрики сброшены.')
+            else:
+                enable_metrics(plan['action'] == 'on')
+                print(f'Сбор метрик: {plan["action"]}.')
+
+        case 'checkpoint':
+            checkpoint(pool)
+            print('Изменения записаны на диск.')
+
+        case 'begin':
+            if session['transaction'] is not None:
+                print('Ошибка: транзакция уже начата.')
+                return
+            session['transaction'] = begin_transaction()
+            print('Транзакция начата.')
+
+        case 'commit':
+            transaction = session['transaction']
+            if transaction is None:
+                print('Ошибка: транзакция не начата.')
+                return
+            session['transaction'] = None
+            try:
+                table_names = commit_transaction(transaction)
+                commit_tables(pool, table_names)
+            finally:
+                release_transaction(transaction)
+            print(f'Транзакция зафиксирована, изменено таблиц: {len(table_names)}.')
+
+        case 'rollback':
+            if abort_transaction(session):
+                print('Транзакция отменена.')
+            else:
+                print('Ошибка: транзакция не начата.')
+
+        case 'prepare':
+            session['prepared'][plan['name']] = plan
+            print(f'Команда {plan["name"]} подготовлена, параметров: {plan["params"]}.')
+
+        case 'execute':
+            prepared = session['prepared'].get(plan['name'])
+            if prepared is None:
+                print(f'Ошибка: подготовленной команды {plan["name"]} нет.')
+                return
+            if len(plan['values']) != prepared['params']:
+                print(f'Ошибка: команда {plan["name"]} ожидает параметров: {prepared["params"]}, передано: {len(plan["values"])}.') # noqa: E501
+                return
+            try:
+                bound = bind_plan(prepared['plan'], plan['values'])
+            except ValueError as error:
+                print(f'Ошибка валидации: {error}')
+                return
+            execute_plan(session, bound)
 
+        case 'deallocate':
+            if session['prepared'].pop(plan['name'], None) is None:
+                print(f'Ошибка: подготовленной команды {plan["name"]} нет.')
+                return
+            print(f'Команда {plan["name"]} удалена.')
 
+        case 'help':
+            print_help()
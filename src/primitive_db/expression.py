@@ -0,0 +1,61 @@
+# src/primitive_db/expression.py
+import operator
+from itertools import repeat
+
+from .columns import gather
+
+# Выражение в set команды update - дерево словарей:
+#   {'value': значение} - литерал,
+#   {'column': столбец} - значение столбца в той же строке,
+#   {'op': '+' | '-' | '*', 'args': [левое, правое]} - арифметика над int
+#   (+ над str склеивает строки).
+# Все выражения считаются по значениям строк до изменения.
+EXPRESSION_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+}
+
+
+# Функция обхода столбцов выражения
+def expression_columns(expression: dict):
+    if 'column' in expression:
+        yield expression['column']
+    for arg in expression.get('args', []):
+        yield from expression_columns(arg)
+
+
+# Функция получения типа выражения
+def expression_type(expression: dict, schema: dict) -> str:
+    '''
+    expression - выражение set,
+    schema - схема таблицы {столбец: тип}.
+    Функция возвращает имя типа результата или выбрасывает ValueError, если
+    оператор не применим к типам операндов (bool не участвует в арифметике).
+    '''
+    if 'value' in expression:
+        return type(expression['value']).__name__
+    if 'column' in expression:
+        return schema[expression['column']]
+    op = expression['op']
+    left, right = (expression_type(arg, schema) for arg in expression['args'])
+    if left == right == 'int' or (op == '+' and left == right == 'str'):
+        return left
+    raise ValueError(f'оператор {op} не применим к типам {left} и {right}.')
+
+
+# Функция вычисления выражения на строках
+def expression_values(expression: dict, table_data: dict, positions: list):
+    '''
+    expression - выражение set,
+    table_data - данные таблицы,
+    positions - позиции изменяемых строк.
+    Функция лениво отдает значение выражения для каждой позиции. Проход по
+    столбцам идет на стороне C (map), без разбора выражения на каждой строке.
+    '''
+    if 'value' in expression:
+        return repeat(expression['value'], len(positions))
+    if 'column' in expression:
+        return gather(table_data[expression['column']], positions)
+    left, right = (expression_values(arg, table_data, positions) for arg in expression['args']) # noqa: E501
+    return map(EXPRESSION_OPERATORS[expression['op']], left, right)
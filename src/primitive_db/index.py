@@ -0,0 +1,239 @@
+# src/primitive_db/index.py
+import sys
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, compress
+
+from .catalog import table_options
+from .columns import value_getter
+from .decorators import timed
+
+# Индексы бывают двух видов:
+#   {'kind': 'hash', 'map': {значение: [позиции]}} - для условий =,
+#   {'kind': 'sorted', 'keys': [...], 'positions': [...]} - отсортированные
+#   по значению параллельные списки, обслуживают = < > <= >= и between.
+INDEX_KINDS = ['hash', 'sorted']
+SORTED_INDEX_TYPES = ['int', 'str']
+# До какого размера пачка вставляется в отсортированный индекс построчно
+SMALL_BATCH = 64
+
+
+# Функция построения индекса по столбцу
+def build_index(column_values: list, kind: str = 'hash') -> dict:
+    '''
+    column_values - список значений столбца,
+    kind - вид индекса (hash или sorted).
+    Функция строит индекс по столбцу за один проход (hash)
+    или за одну сортировку позиций (sorted).
+    '''
+    if kind == 'sorted':
+        get_value = value_getter(column_values)
+        positions = sorted(range(len(column_values)), key=get_value)
+        keys = list(map(get_value, positions))
+        return {'kind': 'sorted', 'keys': keys, 'positions': positions}
+
+    index = {}
+    for i, value in enumerate(column_values):
+        positions = index.get(value)
+        if positions is None:
+            index[value] = [i]
+        else:
+            positions.append(i)
+    return {'kind': 'hash', 'map': index}
+
+
+# Функция построения всех индексов таблицы
+@timed('index')
+def build_table_indexes(metadata: dict, table_name: str, table_data: dict) -> dict:
+    '''
+    metadata - текущие мета данные,
+    table_name - имя таблицы,
+    table_data - данные таблицы.
+    Функция строит индексы по всем столбцам, перечисленным в метаданных.
+    '''
+    indexes = {}
+    for column, kind in table_options(metadata, table_name)['indexes'].items():
+        if column in table_data:
+            indexes[column] = build_index(table_data[column], kind)
+    return indexes
+
+
+# Функция проверки, обслуживает ли индекс оператор
+def index_supports(index: dict, op: str) -> bool:
+    return index['kind'] == 'sorted' or op == '='
+
+
+# Функция поиска позиций по индексу
+def index_lookup(index: dict, op: str, value):
+    '''
+    index - индекс столбца,
+    op - оператор условия where,
+    value - значение условия (для between - пара границ).
+    Функция возвращает позиции подходящих строк (в произвольном порядке)
+    или None, если индекс не умеет обслуживать такой оператор.
+    '''
+    if not index_supports(index, op):
+        return None
+    if index['kind'] == 'hash':
+        return list(index['map'].get(value, []))
+
+    keys = index['keys']
+    match op:
+        case '=':
+            lo, hi = bisect_left(keys, value), bisect_right(keys, value)
+        case '<':
+            lo, hi = 0, bisect_left(keys, value)
+        case '<=':
+            lo, hi = 0, bisect_right(keys, value)
+        case '>':
+            lo, hi = bisect_right(keys, value), len(keys)
+        case '>=':
+            lo, hi = bisect_left(keys, value), len(keys)
+        case 'between':
+            lo, hi = bisect_left(keys, value[0]), bisect_right(keys, value[1])
+        case _:
+            return None
+    return index['positions'][lo:hi]
+
+
+# Функция обновления индексов после вставки строк
+def index_insert(indexes: dict, table_data: dict, start: int) -> None:
+    '''
+    indexes - индексы таблицы,
+    table_data - данные таблицы,
+    start - позиция первой вставленной строки (строки дописываются в конец).
+    Небольшая пачка вставляется в отсортированный индекс построчно бинарным
+    поиском. Для большой пачки новые позиции дописываются в конец и список
+    сортируется по значениям: Timsort видит два готовых отсортированных
+    участка и сливает их за линейное время на стороне C. Сортировка
+    устойчивая, поэтому при равных значениях меньшие позиции остаются впереди.
+    '''
+    for column, index in indexes.items():
+        column_values = table_data[column]
+        if index['kind'] == 'hash':
+            index_map = index['map']
+            for position in range(start, len(column_values)):
+                index_map.setdefault(column_values[position], []).append(position)
+        elif len(column_values) - start <= SMALL_BATCH:
+            for position in range(start, len(column_values)):
+                value = column_values[position]
+                i = bisect_right(index['keys'], value)
+                index['keys'].insert(i, value)
+                index['positions'].insert(i, position)
+        else:
+            get_value = value_getter(column_values)
+            positions = index['positions']
+            positions.extend(sorted(range(start, len(column_values)), key=get_value))
+            positions.sort(key=get_value)
+            index['keys'] = list(map(get_value, positions))
+
+
+# Функция обновления индекса после изменения значения
+def index_update(indexes: dict, column: str, position: int, old_value, new_value) -> None: # noqa: E501
+    '''
+    indexes - индексы таблицы,
+    column - измененный столбец,
+    position - позиция строки,
+    old_value, new_value - старое и новое значение.
+    '''
+    index = indexes.get(column)
+    if index is None or old_value == new_value:
+        return
+
+    if index['kind'] == 'hash':
+        index_map = index['map']
+        positions = index_map[old_value]
+        del positions[bisect_left(positions, position)]
+        if not positions:
+            del index_map[old_value]
+        insort(index_map.setdefault(new_value, []), position)
+        return
+
+    keys, positions = index['keys'], index['positions']
+    lo, hi = bisect_left(keys, old_value), bisect_right(keys, old_value)
+    i = bisect_left(positions, position, lo, hi)
+    del keys[i]
+    del positions[i]
+    lo, hi = bisect_left(keys, new_value), bisect_right(keys, new_value)
+    i = bisect_left(positions, position, lo, hi)
+    keys.insert(i, new_value)
+    positions.insert(i, position)
+
+
+# Функция обновления индекса после изменения значений многих строк
+def index_update_many(indexes: dict, table_data: dict, column: str, positions: list, old_values: list) -> None: # noqa: E501
+    '''
+    indexes - индексы таблицы,
+    table_data - данные таблицы (уже с новыми значениями),
+    column - измененный столбец,
+    positions - позиции измененных строк,
+    old_values - старые значения в том же порядке.
+    Небольшая пачка обновляется построчно бинарным поиском. Большая пачка
+    в отсортированном индексе дешевле одной пересортировки (каждая вставка в
+    середину списка сдвигает его хвост), а hash индекс строится заново, если
+    изменилась заметная доля строк.
+    '''
+    index = indexes.get(column)
+    if index is None:
+        return
+    column_values = table_data[column]
+    if len(positions) > SMALL_BATCH and (index['kind'] == 'sorted' or len(positions) * 4 > len(column_values)): # noqa: E501
+        indexes[column] = build_index(column_values, index['kind'])
+        return
+    for position, old_value in zip(positions, old_values):
+        index_update(indexes, column, position, old_value, column_values[position])
+
+
+# Функция обновления индексов после удаления строк
+def index_delete(indexes: dict, mask: bytearray) -> None:
+    '''
+    indexes - индексы таблицы,
+    mask - маска уцелевших строк по старым позициям (1 - строка осталась).
+    Функция убирает удаленные позиции и сдвигает оставшиеся. Новая позиция
+    строки - число уцелевших строк до нее, оно считается одной префиксной
+    суммой по маске.
+    '''
+    new_positions = list(accumulate(mask))
+    for index in indexes.values():
+        if index['kind'] == 'hash':
+            index_map = index['map']
+            for value in list(index_map.keys()):
+                positions = [
+                    new_positions[pos] - 1 for pos in index_map[value] if mask[pos]
+                ]
+                if positions:
+                    index_map[value] = positions
+                else:
+                    del index_map[value]
+            continue
+
+        kept = list(map(mask.__getitem__, index['positions']))
+        index['keys'] = list(compress(index['keys'], kept))
+        index['positions'] = [
+            new_positions[pos] - 1 for pos in compress(index['positions'], kept)
+        ]
+
+
+# Функция оценки памяти индекса
+def index_size(index: dict) -> int:
+    '''
+    index - индекс столбца.
+    Функция возвращает примерный размер индекса в байтах.
+    '''
+    if index['kind'] == 'sorted':
+        total = sys.getsizeof(index['keys']) + sys.getsizeof(index['positions'])
+        total += sum(sys.getsizeof(key) for key in index['keys'])
+        total += sum(sys.getsizeof(pos) for pos in index['positions'])
+        return total
+
+    total = sys.getsizeof(index['map'])
+    for value, positions in index['map'].items():
+        total += sys.getsizeof(value) + sys.getsizeof(positions)
+        total += sum(sys.getsizeof(pos) for pos in positions)
+    return total
+
+
+# Функция получения числа различных значений в индексе
+def index_cardinality(index: dict) -> int:
+    if index['kind'] == 'hash':
+        return len(index['map'])
+    return len(set(index['keys']))
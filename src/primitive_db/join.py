@@ -0,0 +1,176 @@
+# src/primitive_db/join.py
+from array import array
+from functools import partial
+from itertools import compress, islice, repeat
+
+from .columns import gather
+from .constants import JOIN_CHUNK_ROWS
+from .decorators import timed
+from .index import index_lookup
+from .metrics import count
+from .predicate import LOGICAL_OPERATORS, evaluate, mask_positions, where_leaves
+
+# Join двух таблиц: select ... from a join b on a.x = b.y [where ...].
+# Столбцы результата называются <таблица>.<столбец>; в команде имя таблицы
+# можно не писать, если столбец есть только в одной из таблиц.
+# Выполняется hash join: меньшая сторона (build) превращается в хэш-таблицу
+# {значение: [позиции]} (или используется готовый индекс по столбцу on), а
+# строки большей стороны (probe) проходят по ней пачками по JOIN_CHUNK_ROWS.
+# Результат - пара массивов позиций строк {таблица: array('q')}, значения
+# столбцов собираются только для выводимой части.
+# Сторона join - словарь:
+#   table - имя таблицы, data - данные таблицы, column - столбец условия on,
+#   positions - позиции строк после своей части where, index - индекс по
+#   столбцу on или None.
+
+
+# Функция получения полного имени столбца join
+def join_column(name: str, schemas: dict) -> str:
+    '''
+    name - имя столбца из команды (<таблица>.<столбец> или <столбец>),
+    schemas - схемы таблиц join {таблица: {столбец: тип}}.
+    Функция возвращает имя <таблица>.<столбец> или выбрасывает ValueError.
+    '''
+    table_name, dot, column = name.rpartition('.')
+    if dot:
+        if column not in schemas.get(table_name, {}):
+            raise ValueError(f'столбца {name} нет в таблицах {" и ".join(schemas)}.') # noqa: E501
+        return name
+    owners = [table_name for table_name, schema in schemas.items() if name in schema]
+    if not owners:
+        raise ValueError(f'столбца {name} нет в таблицах {" и ".join(schemas)}.')
+    if len(owners) > 1:
+        raise ValueError(f'столбец {name} есть в обеих таблицах, укажите таблицу: {owners[0]}.{name}.') # noqa: E501
+    return f'{owners[0]}.{name}'
+
+
+# Функция перевода условия where на полные имена столбцов
+def qualify_where(where_clause: dict, schemas: dict) -> dict:
+    if where_clause['op'] in LOGICAL_OPERATORS:
+        return {'op': where_clause['op'], 'args': [qualify_where(arg, schemas) for arg in where_clause['args']]} # noqa: E501
+    return dict(where_clause, column=join_column(where_clause['column'], schemas))
+
+
+# Функция снятия имени таблицы со столбцов условия
+def strip_where(where_clause: dict) -> dict:
+    if where_clause['op'] in LOGICAL_OPERATORS:
+        return {'op': where_clause['op'], 'args': [strip_where(arg) for arg in where_clause['args']]} # noqa: E501
+    return dict(where_clause, column=where_clause['column'].rpartition('.')[2])
+
+
+# Функция соединения частей условия через and
+def combine_where(parts: list):
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else {'op': 'and', 'args': parts}
+
+
+# Функция разделения условия where по таблицам
+def split_where(where_clause: dict, table_names: list) -> tuple:
+    '''
+    where_clause - условие where с полными именами столбцов,
+    table_names - таблицы join.
+    Функция возвращает ({таблица: условие по ее столбцам или None},
+    остаток условия или None). Части верхнего and, которые касаются одной
+    таблицы, проверяются до join на самой таблице (с индексами и кэшем
+    select), и в join попадают только подходящие строки. Остаток
+    проверяется на парах строк.
+    '''
+    parts = where_clause['args'] if where_clause['op'] == 'and' else [where_clause]
+    pushed = {table_name: [] for table_name in table_names}
+    residual = []
+    for part in parts:
+        owners = {leaf['column'].rpartition('.')[0] for leaf in where_leaves(part)}
+        if len(owners) == 1:
+            pushed[owners.pop()].append(strip_where(part))
+        else:
+            residual.append(part)
+    return {table_name: combine_where(table_parts) for table_name, table_parts in pushed.items()}, combine_where(residual) # noqa: E501
+
+
+# Функция получения поиска по стороне build
+def build_lookup(side: dict):
+    '''
+    side - сторона build.
+    Функция возвращает функцию значение -> позиции строк (по возрастанию)
+    или None. Готовый индекс используется, только если своя часть where не
+    отсеяла строки таблицы, иначе хэш-таблица строится по оставшимся строкам.
+    '''
+    index = side['index']
+    if index is not None and isinstance(side['positions'], range):
+        if index['kind'] == 'hash':
+            return index['map'].get
+        return partial(index_lookup, index, '=')
+
+    column = side['data'][side['column']]
+    table = {}
+    for value, position in zip(gather(column, side['positions']), side['positions']):
+        positions = table.get(value)
+        if positions is None:
+            table[value] = [position]
+        else:
+            positions.append(position)
+    return table.get
+
+
+# Функция проверки остатка условия на парах строк
+def residual_positions(where_clause: dict, sides: list, pairs: dict) -> list:
+    '''
+    where_clause - остаток условия с полными именами столбцов,
+    sides - стороны join,
+    pairs - пачка пар {таблица: array позиций}.
+    Функция возвращает номера подходящих пар в пачке. Значения собираются
+    только для столбцов условия и только для строк пачки.
+    '''
+    tables = {side['table']: side['data'] for side in sides}
+    chunk = {}
+    for leaf in where_leaves(where_clause):
+        name = leaf['column']
+        if name not in chunk:
+            table_name, _, column = name.rpartition('.')
+            chunk[name] = list(gather(tables[table_name][column], pairs[table_name]))
+    rows = len(next(iter(pairs.values())))
+    result = evaluate(where_clause, chunk, {}, rows, positions=True)
+    if isinstance(result, int):
+        result = mask_positions(result, rows)
+    return result
+
+
+# Функция выполнения hash join
+@timed('join')
+def join_rows(sides: list, residual: dict = None, need: int = None) -> dict:
+    '''
+    sides - две стороны join,
+    residual - остаток условия where, который проверяется на парах строк,
+    need - сколько пар достаточно найти (None - все).
+    Функция возвращает пары позиций {таблица: array('q')} в порядке строк
+    стороны probe. Память - хэш-таблица меньшей стороны и найденные пары:
+    probe читается пачками, и при заданном need поиск останавливается, как
+    только пар хватает. Для need первая пачка не больше need строк и
+    каждая следующая вдвое больше (до JOIN_CHUNK_ROWS).
+    '''
+    build, probe = sorted(sides, key=lambda side: len(side['positions']))
+    lookup = build_lookup(build)
+    probe_values = probe['data'][probe['column']]
+    found = {side['table']: array('q') for side in sides}
+    probe_positions = iter(probe['positions'])
+    size = JOIN_CHUNK_ROWS if need is None else min(JOIN_CHUNK_ROWS, max(need, 1))
+    while need is None or len(found[probe['table']]) < need:
+        chunk = list(islice(probe_positions, size))
+        if not chunk:
+            break
+        size = min(JOIN_CHUNK_ROWS, size * 2)
+        count('rows_scanned', len(chunk))
+        pairs = {build['table']: array('q'), probe['table']: array('q')}
+        # Поиск по хэш-таблице идет на стороне C, Python-цикл - только по
+        # строкам, у которых нашлись пары
+        found_matches = list(map(lookup, gather(probe_values, chunk)))
+        for position, matches in compress(zip(chunk, found_matches), found_matches):
+            pairs[build['table']].extend(matches)
+            pairs[probe['table']].extend(repeat(position, len(matches)))
+        if residual is not None and pairs[probe['table']]:
+            keep = residual_positions(residual, sides, pairs)
+            pairs = {table_name: array('q', map(positions.__getitem__, keep)) for table_name, positions in pairs.items()} # noqa: E501
+        for table_name, positions in pairs.items():
+            found[table_name].extend(positions)
+    return found
@@ -0,0 +1,132 @@
+# src/primitive_db/locks.py
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .constants import LOCK_POLL_INTERVAL, LOCK_TIMEOUT, META_FILEPATH, TABLE_PATH
+
+# Блокировки между процессами - рекомендательные блокировки flock на файлах
+# <таблица>.lock в каталоге таблиц и db_meta.json.lock рядом с мета данными.
+# Разделяемую (shared) блокировку могут держать сразу несколько читателей,
+# исключительную (exclusive) - только один писатель.
+# flock принадлежит открытому файлу, поэтому повторный захват той же
+# блокировки в одном процессе через новый файл ждал бы сам себя. Захваченные
+# блокировки хранятся здесь со счетчиком вложенности:
+#   {путь: {'fd': дескриптор, 'exclusive': bool, 'depth': n}}.
+# На системах без fcntl (Windows) блокировки не действуют.
+HELD_LOCKS = {}
+
+
+# Функция получения пути файла блокировки таблицы
+def table_lock_path(table_name: str):
+    return TABLE_PATH / (table_name + '.lock')
+
+
+# Функция получения пути файла блокировки мета данных
+def catalog_lock_path():
+    return META_FILEPATH.with_name(META_FILEPATH.name + '.lock')
+
+
+# Функция захвата блокировки
+def acquire_lock(path, exclusive: bool = False, timeout: float = LOCK_TIMEOUT) -> None: # noqa: E501
+    '''
+    path - файл блокировки,
+    exclusive - исключительная блокировка (иначе разделяемая),
+    timeout - сколько секунд ждать.
+    Уже захваченная этим процессом блокировка не захватывается заново, а
+    разделяемая при необходимости повышается до исключительной. Если
+    блокировку держит другой процесс дольше timeout секунд, выбрасывается
+    TimeoutError (так взаимная блокировка двух процессов не вешает их).
+    '''
+    if fcntl is None:
+        return
+    key = str(path)
+    held = HELD_LOCKS.get(key)
+    if held is not None and (held['exclusive'] or not exclusive):
+        held['depth'] += 1
+        return
+
+    fd = held['fd'] if held is not None else os.open(key, os.O_RDWR | os.O_CREAT, 0o644) # noqa: E501
+    mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                if held is None:
+                    os.close(fd)
+                raise TimeoutError(f'файл {os.path.basename(key)} занят другим процессом дольше {timeout:g} секунд.') from None # noqa: E501
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    if held is None:
+        HELD_LOCKS[key] = {'fd': fd, 'exclusive': exclusive, 'depth': 1}
+    else:
+        held['exclusive'] = True
+        held['depth'] += 1
+
+
+# Функция освобождения блокировки
+def release_lock(path) -> None:
+    '''
+    path - файл блокировки.
+    Блокировка снимается, когда освобожден последний вложенный захват.
+    '''
+    if fcntl is None:
+        return
+    key = str(path)
+    held = HELD_LOCKS.get(key)
+    if held is None:
+        return
+    held['depth'] -= 1
+    if held['depth'] == 0:
+        del HELD_LOCKS[key]
+        fcntl.flock(held['fd'], fcntl.LOCK_UN)
+        os.close(held['fd'])
+
+
+# Функция проверки, держит ли процесс исключительную блокировку
+def holds_exclusive(path) -> bool:
+    held = HELD_LOCKS.get(str(path))
+    return held is not None and held['exclusive']
+
+
+# Контекстный менеджер блокировки файла
+@contextmanager
+def file_lock(path, exclusive: bool = False):
+    acquire_lock(path, exclusive)
+    try:
+        yield
+    finally:
+        release_lock(path)
+
+
+# Контекстный менеджер блокировки таблицы
+def table_lock(table_name: str, exclusive: bool = False):
+    return file_lock(table_lock_path(table_name), exclusive)
+
+
+# Контекстный менеджер блокировки мета данных
+def catalog_lock(exclusive: bool = False):
+    return file_lock(catalog_lock_path(), exclusive)
+
+
+# Функция получения версии файла
+def file_version(path) -> tuple:
+    '''
+    path - путь до файла.
+    Функция возвращает (inode, время изменения в нс, размер) или None, если
+    файла нет. Файлы данных подменяются через os.replace, поэтому запись
+    всегда меняет inode, а дописывание журнала - его размер.
+    '''
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
@@ -1,10 +1,40 @@
 #!/usr/bin/env python3
+import argparse
+import sys
+
+from .client import run_client
+from .constants import SERVER_HOST, SERVER_PORT
+from .decorators import RUN_OPTIONS
 from .engine import run
+from .server import serve
 
 
 def main():
-    print('\nДоброе пожаловать в примитивную базу данных!\n')
-    run()
+    parser = argparse.ArgumentParser(prog='database', description='Примитивная база данных.') # noqa: E501
+    parser.add_argument('mode', nargs='?', choices=['serve', 'client'], help='serve - запустить сервер, client - подключиться к серверу') # noqa: E501
+    parser.add_argument('--host', default=SERVER_HOST, help=f'адрес сервера (по умолчанию {SERVER_HOST})') # noqa: E501
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help=f'порт сервера (по умолчанию {SERVER_PORT})') # noqa: E501
+    parser.add_argument('--socket', metavar='PATH', help='Unix сокет вместо TCP') # noqa: E501
+    parser.add_argument('--script', metavar='FILE', help='выполнить команды из файла (по одной на строку) и выйти') # noqa: E501
+    parser.add_argument('--yes', action='store_true', help='не спрашивать подтверждение для drop_table и delete') # noqa: E501
+    parser.add_argument('--metrics-file', metavar='FILE', help='включить метрики и выгружать их в файл (.prom - формат Prometheus, иначе JSON)') # noqa: E501
+    parser.add_argument('--metrics-interval', metavar='SEC', type=float, help='период выгрузки метрик в секундах (по умолчанию 60)') # noqa: E501
+    parser.add_argument('--workers', metavar='N', type=int, help='число процессов параллельного скана больших таблиц (по умолчанию по числу ядер, 0 - без него)') # noqa: E501
+    options = parser.parse_args()
+
+    if options.workers is not None:
+        RUN_OPTIONS['workers'] = options.workers
+
+    if options.mode == 'serve':
+        serve(host=options.host, port=options.port, socket_path=options.socket, metrics_file=options.metrics_file, metrics_interval=options.metrics_interval) # noqa: E501
+        return
+    if options.mode == 'client':
+        run_client(host=options.host, port=options.port, socket_path=options.socket)
+        return
+
+    if options.script is None and sys.stdin.isatty():
+        print('\nДоброе пожаловать в примитивную базу данных!\n')
+    run(script=options.script, assume_yes=options.yes, metrics_file=options.metrics_file, metrics_interval=options.metrics_interval) # noqa: E501
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,189 @@
+# src/primitive_db/metrics.py
+import json as js
+import os
+import time
+from bisect import bisect_left
+
+from .constants import METRICS_BUCKETS, METRICS_DUMP_INTERVAL
+
+# Реестр метрик процесса. Пока он выключен, замеры сводятся к одной
+# проверке флага enabled.
+#   histograms - {(метрика, метка): {'buckets': [...], 'sum', 'count', 'max'}},
+#     метрика command - время команды, phase - время фазы (parse, load, ...),
+#     buckets - число наблюдений по границам METRICS_BUCKETS (секунды) и +Inf,
+#   counters - {имя: значение}: rows_scanned, rows_returned, bytes_read,
+#     bytes_written.
+METRICS = {
+    'enabled': False,
+    'histograms': {},
+    'counters': {},
+    'dump_path': None,
+    'dump_interval': METRICS_DUMP_INTERVAL,
+    'last_dump': 0.0,
+}
+COUNTERS = ['rows_scanned', 'rows_returned', 'bytes_read', 'bytes_written']
+METRIC_TITLES = {'command': 'Команды', 'phase': 'Фазы'}
+
+
+# Функция включения/выключения метрик
+def enable_metrics(enabled: bool = True, dump_path: str = None, dump_interval: float = None) -> None: # noqa: E501
+    '''
+    enabled - собирать ли метрики,
+    dump_path - файл для периодической выгрузки (.prom - формат Prometheus,
+    иначе JSON),
+    dump_interval - период выгрузки в секундах.
+    '''
+    METRICS['enabled'] = enabled
+    if dump_path is not None:
+        METRICS['dump_path'] = dump_path
+    if dump_interval is not None:
+        METRICS['dump_interval'] = dump_interval
+    METRICS['last_dump'] = time.monotonic()
+
+
+# Функция сброса собранных метрик
+def reset_metrics() -> None:
+    METRICS['histograms'].clear()
+    METRICS['counters'].clear()
+
+
+# Функция записи наблюдения в гистограмму
+def observe(metric: str, label: str, seconds: float) -> None:
+    '''
+    metric - имя гистограммы (command или phase),
+    label - команда или фаза,
+    seconds - длительность.
+    '''
+    if not METRICS['enabled']:
+        return
+    histogram = METRICS['histograms'].get((metric, label))
+    if histogram is None:
+        histogram = {'buckets': [0] * (len(METRICS_BUCKETS) + 1), 'sum': 0.0, 'count': 0, 'max': 0.0} # noqa: E501
+        METRICS['histograms'][(metric, label)] = histogram
+    histogram['buckets'][bisect_left(METRICS_BUCKETS, seconds)] += 1
+    histogram['sum'] += seconds
+    histogram['count'] += 1
+    histogram['max'] = max(histogram['max'], seconds)
+
+
+# Функция увеличения счетчика
+def count(name: str, value: int = 1) -> None:
+    if METRICS['enabled']:
+        METRICS['counters'][name] = METRICS['counters'].get(name, 0) + value
+
+
+# Функция оценки перцентиля по гистограмме
+def histogram_quantile(histogram: dict, quantile: float) -> float:
+    '''
+    histogram - гистограмма из реестра,
+    quantile - доля (0.5 - медиана).
+    Функция возвращает верхнюю границу корзины, в которую попал перцентиль
+    (для последней корзины - максимум).
+    '''
+    rank = quantile * histogram['count']
+    seen = 0
+    for bound, bucket in zip(METRICS_BUCKETS, histogram['buckets']):
+        seen += bucket
+        if seen >= rank:
+            return min(bound, histogram['max'])
+    return histogram['max']
+
+
+# Функция вывода метрик
+def print_metrics(cache_stats: dict = None) -> None:
+    '''
+    cache_stats - статистика кэша запросов (cache(..., 'stats')).
+    '''
+    print(f'Метрики: {"включены" if METRICS["enabled"] else "выключены (stats on)"}') # noqa: E501
+    for metric, title in METRIC_TITLES.items():
+        rows = sorted((label, histogram) for (name, label), histogram in METRICS['histograms'].items() if name == metric) # noqa: E501
+        if not rows:
+            continue
+        print(f'{title}:')
+        for label, histogram in rows:
+            avg = histogram['sum'] / histogram['count'] * 1000
+            p50 = histogram_quantile(histogram, 0.5) * 1000
+            p99 = histogram_quantile(histogram, 0.99) * 1000
+            print(f'  {label}: вызовов {histogram["count"]}, всего {histogram["sum"] * 1000:.3f} мс, среднее {avg:.3f} мс, p50 <= {p50:.3f} мс, p99 <= {p99:.3f} мс, макс {histogram["max"] * 1000:.3f} мс') # noqa: E501
+    print('Счетчики:')
+    for name in COUNTERS:
+        print(f'  {name}: {METRICS["counters"].get(name, 0)}')
+    if cache_stats is not None:
+        requests = cache_stats['hits'] + cache_stats['misses']
+        ratio = cache_stats['hits'] / requests * 100 if requests else 0.0
+        print(f'Кэш запросов: {ratio:.1f}% попаданий ({cache_stats["hits"]} из {requests})') # noqa: E501
+
+
+# Функция получения метрик в виде JSON
+def metrics_json(cache_stats: dict = None) -> str:
+    bounds = [*map(str, METRICS_BUCKETS), '+Inf']
+    histograms = [
+        {
+            'metric': metric, 'label': label, 'count': histogram['count'],
+            'sum_seconds': histogram['sum'], 'max_seconds': histogram['max'],
+            'buckets': dict(zip(bounds, histogram['buckets'])),
+        }
+        for (metric, label), histogram in sorted(METRICS['histograms'].items())
+    ]
+    counters = {name: METRICS['counters'].get(name, 0) for name in COUNTERS}
+    return js.dumps({'time': time.time(), 'histograms': histograms, 'counters': counters, 'cache': cache_stats}, indent=2) # noqa: E501
+
+
+# Функция получения метрик в текстовом формате Prometheus
+def metrics_prometheus(cache_stats: dict = None) -> str:
+    '''
+    cache_stats - статистика кэша запросов.
+    Корзины гистограмм в формате Prometheus накопительные.
+    '''
+    lines = []
+    for metric, label_name in (('command', 'command'), ('phase', 'phase')):
+        name = f'primitive_db_{metric}_seconds'
+        lines.append(f'# TYPE {name} histogram')
+        for (histogram_metric, label), histogram in sorted(METRICS['histograms'].items()): # noqa: E501
+            if histogram_metric != metric:
+                continue
+            cumulative = 0
+            for bound, bucket in zip([*map(str, METRICS_BUCKETS), '+Inf'], histogram['buckets']): # noqa: E501
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}') # noqa: E501
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {histogram["count"]}') # noqa: E501
+    for counter in COUNTERS:
+        lines.append(f'# TYPE primitive_db_{counter}_total counter')
+        lines.append(f'primitive_db_{counter}_total {METRICS["counters"].get(counter, 0)}') # noqa: E501
+    if cache_stats is not None:
+        for key in ('hits', 'misses', 'evictions', 'invalidations'):
+            lines.append(f'# TYPE primitive_db_cache_{key}_total counter')
+            lines.append(f'primitive_db_cache_{key}_total {cache_stats[key]}')
+        requests = cache_stats['hits'] + cache_stats['misses']
+        lines.append('# TYPE primitive_db_cache_hit_ratio gauge')
+        lines.append(f'primitive_db_cache_hit_ratio {cache_stats["hits"] / requests if requests else 0.0}') # noqa: E501
+    return '\n'.join(lines) + '\n'
+
+
+# Функция выгрузки метрик в файл
+def dump_metrics(cache_stats: dict = None) -> None:
+    '''
+    cache_stats - статистика кэша запросов.
+    Файл перезаписывается целиком через временный файл.
+    '''
+    path = METRICS['dump_path']
+    if path is None:
+        return
+    content = metrics_prometheus(cache_stats) if str(path).endswith('.prom') else metrics_json(cache_stats) # noqa: E501
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as dump_file:
+        dump_file.write(content)
+    os.replace(f'{path}.tmp', path)
+    METRICS['last_dump'] = time.monotonic()
+
+
+# Функция проверки таймера выгрузки метрик
+def maybe_dump_metrics(cache_stats_func) -> None:
+    '''
+    cache_stats_func - функция без аргументов, возвращающая статистику кэша
+    (вызывается, только если пора выгружать).
+    '''
+    if not METRICS['enabled'] or METRICS['dump_path'] is None:
+        return
+    if time.monotonic() - METRICS['last_dump'] >= METRICS['dump_interval']:
+        dump_metrics(cache_stats_func())
@@ -0,0 +1,53 @@
+# src/primitive_db/order.py
+import heapq
+from itertools import islice
+
+from .columns import value_getter
+from .decorators import timed
+
+# Сортируются не строки, а позиции строк: ключ позиции - значение столбца
+# сортировки (columns.value_getter), поэтому таблица не собирается в кортежи.
+# По возрастанию строки с равными значениями идут в порядке таблицы, а по
+# убыванию порядок ровно обратный возрастанию - так же, как при обходе
+# отсортированного индекса с конца.
+
+
+# Функция упорядочивания позиций строк по столбцу
+@timed('order')
+def order_positions(column: list, positions, descending: bool = False, count: int = None, index: dict = None) -> list: # noqa: E501
+    '''
+    column - значения столбца сортировки,
+    positions - позиции строк выборки по возрастанию (range - вся таблица),
+    descending - сортировать по убыванию,
+    count - сколько первых строк результата нужно (offset + limit, None -
+    все),
+    index - индекс по столбцу сортировки или None.
+    Отсортированный индекс уже хранит позиции в порядке значений, и он
+    проходится напрямую: для всей таблицы всегда, а для выборки where - если
+    подходящие строки встречаются достаточно часто, чтобы count нашлись
+    быстрее, чем при отборе из выборки (строки выборки отмечаются в маске).
+    Иначе с count берутся count первых через кучу (heapq, O(n log k)):
+    значения читаются из столбца по позиции, и сверх выборки хранятся только
+    k позиций. Без count позиции сортируются целиком по копии значений.
+    '''
+    rows = len(column)
+    if index is not None and index['kind'] == 'sorted' and (isinstance(positions, range) or (count is not None and count * rows < len(positions) ** 2)): # noqa: E501
+        walk = reversed(index['positions']) if descending else iter(index['positions'])
+        if not isinstance(positions, range):
+            mask = bytearray(rows)
+            for position in positions:
+                mask[position] = 1
+            walk = filter(mask.__getitem__, walk)
+        return list(walk if count is None else islice(walk, count))
+
+    if count is not None and count < len(positions):
+        # Куча берет значения прямо из столбца по позиции: копия значений
+        # (value_getter) окупается только при полной сортировке
+        key = column.__getitem__
+        if descending:
+            return heapq.nlargest(count, reversed(positions), key=key)
+        return heapq.nsmallest(count, positions, key=key)
+    result = sorted(positions, key=value_getter(column, positions))
+    if descending:
+        result.reverse()
+    return result
@@ -0,0 +1,207 @@
+# src/primitive_db/parallel.py
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+
+from .constants import PARALLEL_CHUNK_ROWS, PARALLEL_MIN_ROWS
+from .decorators import RUN_OPTIONS, timed
+from .metrics import count
+from .predicate import (
+    evaluate,
+    mask_positions,
+    uses_index,
+    where_leaves,
+    where_positions,
+)
+from .storage import LazyTable, decode_rows, encode_column, raw_column
+from .utils import row_count
+
+# Параллельный скан: строки таблицы делятся на куски, и условие where
+# проверяется на каждом куске в отдельном процессе. Столбцы не передаются
+# процессам через pickle: столбцы условия один раз выгружаются в файлы
+# бинарного формата (storage.encode_column) во временном каталоге (в /dev/shm,
+# если он есть), а каждый процесс отображает файл в память и декодирует
+# только свои строки. Процессы возвращают найденные позиции массивом int64,
+# и куски склеиваются по порядку.
+# Состояние в этом процессе:
+#   executor - пул процессов (создается при первом параллельном скане),
+#   workers - число процессов в нем,
+#   directory - каталог выгруженных столбцов,
+#   exports - {таблица: {'data': id таблицы в пуле, 'columns': {столбец:
+#   (путь, описание столбца, число строк)}}}.
+# Выгрузка таблицы действительна, пока таблица не изменилась: buffer_pool
+# забывает ее (forget_table) при каждой записи, перечитывании и вытеснении.
+PARALLEL_STATE = {'executor': None, 'workers': 0, 'directory': None, 'exports': {}}
+
+
+# Функция получения числа процессов скана
+def scan_workers() -> int:
+    workers = RUN_OPTIONS['workers']
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+# Функция получения пула процессов
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    '''
+    workers - число процессов.
+    Процессы запускаются через forkserver (или spawn): fork процесса с
+    потоками (режим сервера) небезопасен.
+    '''
+    executor = PARALLEL_STATE['executor']
+    if executor is None or PARALLEL_STATE['workers'] != workers:
+        shutdown_executor()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn') # noqa: E501
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        PARALLEL_STATE['executor'] = executor
+        PARALLEL_STATE['workers'] = workers
+    return executor
+
+
+# Функция остановки пула процессов
+def shutdown_executor() -> None:
+    executor = PARALLEL_STATE['executor']
+    if executor is not None:
+        PARALLEL_STATE['executor'] = None
+        executor.shutdown(cancel_futures=True)
+
+
+# Функция выгрузки столбца в файл для процессов скана
+def export_column(table_name: str, table_data: dict, column: str) -> tuple:
+    '''
+    table_name - имя таблицы,
+    table_data - данные таблицы,
+    column - имя столбца.
+    Функция возвращает (путь, описание столбца, число строк). Еще не
+    загруженный столбец бинарной таблицы копируется из снимка как есть,
+    без декодирования.
+    '''
+    entry = PARALLEL_STATE['exports'].get(table_name)
+    if entry is None or entry['data'] != id(table_data):
+        forget_table(table_name)
+        entry = {'data': id(table_data), 'columns': {}}
+        PARALLEL_STATE['exports'][table_name] = entry
+    if column in entry['columns']:
+        return entry['columns'][column]
+
+    if isinstance(table_data, LazyTable) and column in table_data.pending:
+        description, section = raw_column(table_data, column)
+        rows = table_data.rows
+    else:
+        values = table_data[column]
+        description, section = encode_column(values)
+        rows = len(values)
+    if PARALLEL_STATE['directory'] is None:
+        shared = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        PARALLEL_STATE['directory'] = tempfile.mkdtemp(prefix='primitive_db_', dir=shared) # noqa: E501
+    path = os.path.join(PARALLEL_STATE['directory'], f'{uuid.uuid4().hex}.col')
+    with open(path, 'wb') as column_file:
+        column_file.write(section)
+    entry['columns'][column] = (path, description, rows)
+    return entry['columns'][column]
+
+
+# Функция удаления выгруженных столбцов таблицы
+def forget_table(table_name: str) -> None:
+    '''
+    table_name - имя таблицы.
+    Вызывается при любом изменении таблицы в пуле: следующий параллельный
+    скан выгрузит столбцы заново.
+    '''
+    entry = PARALLEL_STATE['exports'].pop(table_name, None)
+    if entry is None:
+        return
+    for path, _, _ in entry['columns'].values():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Функция остановки параллельного скана
+def shutdown_parallel() -> None:
+    '''
+    Функция останавливает процессы и удаляет каталог выгруженных столбцов.
+    '''
+    shutdown_executor()
+    PARALLEL_STATE['exports'].clear()
+    if PARALLEL_STATE['directory'] is not None:
+        shutil.rmtree(PARALLEL_STATE['directory'], ignore_errors=True)
+        PARALLEL_STATE['directory'] = None
+
+
+# Функция проверки условия на куске строк (выполняется в процессе скана)
+def scan_chunk(columns: dict, where_clause: dict, first: int, last: int) -> array:
+    '''
+    columns - {столбец: (путь, описание столбца, число строк)},
+    where_clause - условие where,
+    first, last - границы строк куска [first, last).
+    Функция возвращает позиции подходящих строк куска в нумерации таблицы.
+    '''
+    chunk = {}
+    for name, (path, description, rows) in columns.items():
+        with open(path, 'rb') as column_file:
+            mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            chunk[name] = decode_rows(mapped, 0, rows, description, first, last)
+        finally:
+            mapped.close()
+    result = evaluate(where_clause, chunk, {}, last - first, positions=True)
+    if isinstance(result, int):
+        result = mask_positions(result, last - first)
+    return array('q', map(first.__add__, result))
+
+
+# Функция параллельного скана
+@timed('where')
+def parallel_positions(table_name: str, table_data: dict, where_clause: dict, rows: int, workers: int) -> list: # noqa: E501
+    '''
+    table_name - имя таблицы,
+    table_data - данные таблицы,
+    where_clause - условие where,
+    rows - число строк таблицы,
+    workers - число процессов.
+    Куски кратны 8 строкам, чтобы битовая карта bool делилась по байтам.
+    '''
+    leaves = list(where_leaves(where_clause))
+    names = {leaf['column'] for leaf in leaves}
+    columns = {name: export_column(table_name, table_data, name) for name in names}
+    size = max(PARALLEL_CHUNK_ROWS, -(-rows // workers))
+    size += -size % 8
+    bounds = [(first, min(rows, first + size)) for first in range(0, rows, size)]
+    executor = get_executor(workers)
+    futures = [executor.submit(scan_chunk, columns, where_clause, first, last) for first, last in bounds] # noqa: E501
+    count('rows_scanned', rows * len(leaves))
+    return list(chain.from_iterable(future.result() for future in futures))
+
+
+# Функция получения позиций строк по условию (параллельно, если выгодно)
+def scan_positions(table_name: str, table_data: dict, where_clause: dict, indexes: dict = None) -> list: # noqa: E501
+    '''
+    table_name - имя таблицы,
+    table_data - данные таблицы,
+    where_clause - условие where,
+    indexes - индексы таблицы.
+    Параллельно проверяются только условия, которым не помогает индекс, на
+    таблицах от PARALLEL_MIN_ROWS строк: на маленьких таблицах запуск
+    процессов и выгрузка столбцов дороже самого скана. Если процессы
+    недоступны, условие проверяется обычным сканом.
+    '''
+    rows = row_count(table_data)
+    workers = min(scan_workers(), -(-rows // PARALLEL_CHUNK_ROWS))
+    if workers > 1 and rows >= PARALLEL_MIN_ROWS and not uses_index(where_clause, indexes or {}): # noqa: E501
+        try:
+            return parallel_positions(table_name, table_data, where_clause, rows, workers) # noqa: E501
+        except (OSError, BrokenProcessPool):
+            shutdown_executor()
+            forget_table(table_name)
+    return where_positions(table_data, where_clause, indexes)
@@ -1,37 +1,565 @@
 # src/primitive_db/parser.py
-import ast
+import re
+from collections import OrderedDict
 
-from .constants import CURRENT_TYPES
-from .decorators import handle_db_errors
+from .aggregate import AGGREGATES
+from .constants import PLAN_CACHE_ENTRIES, WHERE_OPERATORS
+from .decorators import handle_db_errors, timed
+from .render import OUTPUT_FORMATS
 
+# Токены команды: строки в кавычках (с экранированием через \), операторы,
+# скобки, запятые, параметр ?, операторы + и * и слова. Знак перед числом
+# (-1, +1) остается частью числа. Отдельная кавычка - незакрытая строка.
+TOKEN_RE = re.compile(r'''"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|<=|>=|[(),=<>?*]|\+(?![^\s(),=<>?+*"'])|\+?[^\s(),=<>?+*"']+|["']''') # noqa: E501
+ESCAPE_RE = re.compile(r'\\(.)')
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+BOOL_LITERALS = {'true': True, 'false': False}
+# Ключевые слова в конце select
+SELECT_OPTIONS = ['limit', 'offset', 'format']
+# Направления сортировки order by
+SORT_DIRECTIONS = ['asc', 'desc']
+# Арифметические операторы выражений set по приоритету
+SUM_OPERATORS = ['+', '-']
+PRODUCT_OPERATORS = ['*']
+# Команды, которые состоят из одного слова
+SIMPLE_COMMANDS = ['list_tables', 'checkpoint', 'begin', 'commit', 'rollback', 'exit', 'help'] # noqa: E501
 
-# Функция парсера для парсинга set и where
+
+# Метка параметра ? в подготовленной команде
+class Placeholder:
+    '''
+    number - номер параметра по порядку в тексте команды,
+    count - параметр задает limit/offset и должен быть целым числом >= 0.
+    '''
+    def __init__(self, number: int):
+        self.number = number
+        self.count = False
+
+
+# Функция разбиения команды на токены
+def tokenize(command: str) -> list:
+    '''
+    command - строка команды.
+    Функция режет строку одним регулярным выражением. Строки в кавычках
+    остаются токенами с кавычками, чтобы их можно было отличить от слов.
+    '''
+    return TOKEN_RE.findall(command)
+
+
+# Функция разбора значения
+def parse_literal(token: str, params: list = None):
+    '''
+    token - токен значения,
+    params - список меток ? (None - параметры запрещены).
+    Функция понимает целые числа, true/false (в любом регистре) и строки
+    в кавычках без ast.literal_eval.
+    '''
+    first = token[0]
+    if first == '"' or first == "'":
+        if len(token) < 2 or token[-1] != first:
+            raise ValueError('незакрытая кавычка в строке.')
+        text = token[1:-1]
+        if '\\' in text:
+            text = ESCAPE_RE.sub(lambda match: ESCAPES.get(match[1], match[1]), text)
+        return text
+    if token == '?':
+        if params is None:
+            raise ValueError('параметр ? можно использовать только в prepare.')
+        params.append(Placeholder(len(params)))
+        return params[-1]
+    value = BOOL_LITERALS.get(token.lower())
+    if value is not None:
+        return value
+    try:
+        return int(token)
+    except ValueError:
+        raise ValueError(f'значение {token} не является int, bool или строкой в кавычках.') from None # noqa: E501
+
+
+# Функция проверки ключевого слова
+def expect(tokens: list, pos: int, word: str) -> int:
+    '''
+    tokens - токены команды,
+    pos - позиция ожидаемого слова,
+    word - ожидаемое слово.
+    Функция возвращает позицию следующего токена.
+    '''
+    if pos >= len(tokens) or tokens[pos].lower() != word:
+        found = tokens[pos] if pos < len(tokens) else 'конец команды'
+        raise ValueError(f'ожидалось "{word}", а получено "{found}".')
+    return pos + 1
+
+
+# Функция получения имени (таблицы, столбца) из токена
+def parse_name(tokens: list, pos: int, what: str = 'имя таблицы') -> str:
+    if pos >= len(tokens) or tokens[pos][0] in '"\'(),=<>?':
+        raise ValueError(f'ожидалось {what}.')
+    return tokens[pos].strip().lower()
+
+
+# Функция разбора условия where
+def parse_where(tokens: list, params: list = None) -> dict:
+    '''
+    tokens - токены условия без слова where,
+    params - список меток ? (None - параметры запрещены).
+    Условие - сравнения <столбец> <оператор> <значение> и
+    <столбец> between <значение1> and <значение2>, соединенные and, or, not
+    и скобками (not сильнее and, and сильнее or). Функция возвращает дерево:
+    сравнение - {'column', 'op', 'value'} (для between значение - пара
+    границ), остальное - {'op': 'and' | 'or' | 'not', 'args': [условия]}.
+    '''
+    if not tokens:
+        raise ValueError('пустое условие where.')
+    where_clause, pos = parse_disjunction(tokens, 0, params)
+    if pos < len(tokens):
+        raise ValueError(f'лишний токен "{tokens[pos]}" в условии where.')
+    return where_clause
+
+
+# Функция разбора условий, соединенных or
+def parse_disjunction(tokens: list, pos: int, params: list = None) -> tuple:
+    '''
+    tokens - токены условия,
+    pos - позиция начала,
+    params - список меток ?.
+    Функции разбора условия возвращают (условие, позиция после него).
+    '''
+    args = []
+    while True:
+        arg, pos = parse_conjunction(tokens, pos, params)
+        args.append(arg)
+        if pos >= len(tokens) or tokens[pos].lower() != 'or':
+            break
+        pos += 1
+    return (args[0] if len(args) == 1 else {'op': 'or', 'args': args}), pos
+
+
+# Функция разбора условий, соединенных and
+def parse_conjunction(tokens: list, pos: int, params: list = None) -> tuple:
+    args = []
+    while True:
+        arg, pos = parse_factor(tokens, pos, params)
+        args.append(arg)
+        if pos >= len(tokens) or tokens[pos].lower() != 'and':
+            break
+        pos += 1
+    return (args[0] if len(args) == 1 else {'op': 'and', 'args': args}), pos
+
+
+# Функция разбора not, скобок и сравнения
+def parse_factor(tokens: list, pos: int, params: list = None) -> tuple:
+    if pos >= len(tokens):
+        raise ValueError('условие where оборвано.')
+    if tokens[pos].lower() == 'not':
+        arg, pos = parse_factor(tokens, pos + 1, params)
+        return {'op': 'not', 'args': [arg]}, pos
+    if tokens[pos] == '(':
+        where_clause, pos = parse_disjunction(tokens, pos + 1, params)
+        return where_clause, expect(tokens, pos, ')')
+
+    column = parse_name(tokens, pos, 'имя столбца')
+    if pos + 2 >= len(tokens):
+        raise ValueError('неправильный формат условия where. Правильный формат: where <столбец> <оператор> <значение>.') # noqa: E501
+    op = tokens[pos + 1].lower()
+    if op == 'between':
+        if pos + 4 >= len(tokens) or tokens[pos + 3].lower() != 'and':
+            raise ValueError('неправильный формат условия between. Правильный формат: where <столбец> between <значение1> and <значение2>.') # noqa: E501
+        low = parse_literal(tokens[pos + 2], params)
+        high = parse_literal(tokens[pos + 4], params)
+        return {'column': column, 'op': 'between', 'value': (low, high)}, pos + 5
+
+    # Операторы <= и >= приходят одним токеном, а = после < или > - нет
+    if op not in WHERE_OPERATORS:
+        raise ValueError(f'неизвестный оператор "{tokens[pos + 1]}" в условии where. Доступные: {", ".join(WHERE_OPERATORS)}, between.') # noqa: E501
+    return {'column': column, 'op': op, 'value': parse_literal(tokens[pos + 2], params)}, pos + 3 # noqa: E501
+
+
+# Функция разбора присваиваний set
+def parse_assignments(tokens: list, params: list = None) -> list:
+    '''
+    tokens - токены между set и where,
+    params - список меток ? (None - параметры запрещены).
+    Функция разбирает <столбец> = <выражение>, ... в список
+    [{'column', 'expr'}, ...]. Выражение - значения, столбцы, +, -, * и
+    скобки (* сильнее + и -); дерево описано в expression.py.
+    '''
+    assignments = []
+    pos = 0
+    while True:
+        column = parse_name(tokens, pos, 'имя столбца')
+        pos = expect(tokens, pos + 1, '=')
+        expr, pos = parse_sum(tokens, pos, params)
+        if any(assignment['column'] == column for assignment in assignments):
+            raise ValueError(f'столбец {column} указан в set несколько раз.')
+        assignments.append({'column': column, 'expr': expr})
+        if pos >= len(tokens):
+            return assignments
+        pos = expect(tokens, pos, ',')
+
+
+# Функция разбора суммы и разности
+def parse_sum(tokens: list, pos: int, params: list = None) -> tuple:
+    '''
+    tokens - токены выражения,
+    pos - позиция начала,
+    params - список меток ?.
+    Функции разбора выражения возвращают (выражение, позиция после него).
+    Число со знаком после операнда (hits -1, hits +1) считается вычитанием
+    или сложением.
+    '''
+    expr, pos = parse_product(tokens, pos, params)
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token in SUM_OPERATORS:
+            right, pos = parse_product(tokens, pos + 1, params)
+            expr = {'op': token, 'args': [expr, right]}
+        elif token[0] in SUM_OPERATORS and token[1:].isdigit():
+            expr = {'op': token[0], 'args': [expr, {'value': int(token[1:])}]}
+            pos += 1
+        else:
+            break
+    return expr, pos
+
+
+# Функция разбора произведения
+def parse_product(tokens: list, pos: int, params: list = None) -> tuple:
+    expr, pos = parse_operand(tokens, pos, params)
+    while pos < len(tokens) and tokens[pos] in PRODUCT_OPERATORS:
+        op = tokens[pos]
+        right, pos = parse_operand(tokens, pos + 1, params)
+        expr = {'op': op, 'args': [expr, right]}
+    return expr, pos
+
+
+# Функция разбора операнда выражения
+def parse_operand(tokens: list, pos: int, params: list = None) -> tuple:
+    if pos >= len(tokens):
+        raise ValueError('выражение set оборвано.')
+    token = tokens[pos]
+    if token == '(':
+        expr, pos = parse_sum(tokens, pos + 1, params)
+        return expr, expect(tokens, pos, ')')
+    if token[0] in '"\'?' or token.lower() in BOOL_LITERALS or token.lstrip('+-').isdigit(): # noqa: E501
+        return {'value': parse_literal(token, params)}, pos + 1
+    return {'column': parse_name(tokens, pos, 'значение или имя столбца')}, pos + 1
+
+
+# Функция разбора значений insert
+def parse_rows(tokens: list, pos: int, params: list = None) -> list:
+    '''
+    tokens - токены команды,
+    pos - позиция первой скобки,
+    params - список меток ? (None - параметры запрещены).
+    Функция разбирает (...), (...), ... в список кортежей значений.
+    '''
+    rows = []
+    end = len(tokens)
+    while pos < end:
+        if tokens[pos] != '(':
+            raise ValueError('неправильный формат ввода значений для вставки. Правильный формат ввода: (<значение_1>, <значение_2>, ...).') # noqa: E501
+        pos += 1
+        row = []
+        while pos < end and tokens[pos] != ')':
+            row.append(parse_literal(tokens[pos], params))
+            pos += 1
+            if pos < end and tokens[pos] == ',':
+                pos += 1
+            elif pos < end and tokens[pos] != ')':
+                raise ValueError('значения для вставки должны разделяться запятыми.')
+        if pos >= end:
+            raise ValueError('не хватает закрывающей скобки в значениях для вставки.') # noqa: E501
+        rows.append(tuple(row))
+        pos += 1
+        if pos < end:
+            pos = expect(tokens, pos, ',')
+    if not rows:
+        raise ValueError('нет значений для вставки.')
+    return rows
+
+
+# Функция разбора списка столбцов select
+def parse_items(tokens: list) -> list:
+    '''
+    tokens - токены между select и from.
+    Функция разбирает список через запятую: <столбец> или
+    <функция>(<столбец>), для count - еще и count(*).
+    '''
+    items = []
+    pos = 0
+    while pos < len(tokens):
+        name = parse_name(tokens, pos, 'имя столбца или агрегатная функция')
+        if pos + 1 < len(tokens) and tokens[pos + 1] == '(':
+            if name not in AGGREGATES:
+                raise ValueError(f'неизвестная агрегатная функция {name}. Доступные: {", ".join(AGGREGATES)}.') # noqa: E501
+            if pos + 3 >= len(tokens) or tokens[pos + 3] != ')':
+                raise ValueError(f'неправильный формат {name}. Правильный формат: {name}(<столбец>).') # noqa: E501
+            column = tokens[pos + 2] if tokens[pos + 2] == '*' else parse_name(tokens, pos + 2, 'имя столбца') # noqa: E501
+            if column == '*' and name != 'count':
+                raise ValueError(f'{name}(*) не поддерживается, укажите столбец.')
+            items.append({'func': name, 'column': column})
+            pos += 4
+        else:
+            items.append({'column': name})
+            pos += 1
+        if pos < len(tokens):
+            pos = expect(tokens, pos, ',')
+    if not items:
+        raise ValueError('пустой список столбцов select.')
+    return items
+
+
+# Функция разбора select
+def parse_select(tokens: list, params: list = None) -> dict:
+    '''
+    tokens - токены команды,
+    params - список меток ? (None - параметры запрещены).
+    select [<столбцы>] from <таблица> [join <таблица> on <столбец> =
+    <столбец>] [where ...] [group by <столбец>] [order by <столбец>
+    [asc|desc]] [limit <n>] [offset <n>] [format <вид>]
+    В агрегатном запросе order by указывает столбец результата: столбец
+    group by или агрегатную функцию, например order by count(*) desc.
+    '''
+    from_pos = next((pos for pos, token in enumerate(tokens) if token.lower() == 'from'), len(tokens)) # noqa: E501
+    pos = expect(tokens, from_pos, 'from')
+    plan = {
+        'command': 'select', 'table': parse_name(tokens, pos), 'where': None,
+        'columns': None, 'join': None,
+        'group': None, 'order': None, 'limit': None, 'offset': 0, 'format': 'table',
+    }
+    if tokens[1:from_pos] != ['*'] and from_pos > 1:
+        plan['columns'] = parse_items(tokens[1:from_pos])
+    pos += 1
+    if pos < len(tokens) and tokens[pos].lower() == 'join':
+        join_table = parse_name(tokens, pos + 1)
+        pos = expect(tokens, pos + 2, 'on')
+        left = parse_name(tokens, pos, 'имя столбца')
+        pos = expect(tokens, pos + 1, '=')
+        plan['join'] = {'table': join_table, 'on': (left, parse_name(tokens, pos, 'имя столбца'))} # noqa: E501
+        pos += 1
+    end = len(tokens)
+    # Настройки вывода идут парами в конце команды
+    while end - pos >= 2 and tokens[end - 2].lower() in SELECT_OPTIONS:
+        end -= 2
+    options = end
+    order_pos = next((index for index in range(end - 3, pos - 1, -1) if tokens[index].lower() == 'order' and tokens[index + 1].lower() == 'by'), None) # noqa: E501
+    if order_pos is not None:
+        spec = tokens[order_pos + 2:end]
+        descending = False
+        if len(spec) > 1 and spec[-1].lower() in SORT_DIRECTIONS:
+            descending = spec.pop().lower() == 'desc'
+        items = parse_items(spec)
+        if len(items) != 1:
+            raise ValueError('в order by указывается один столбец.')
+        plan['order'] = dict(items[0], desc=descending)
+        end = order_pos
+    if end - pos >= 3 and tokens[end - 3].lower() == 'group':
+        expect(tokens, end - 2, 'by')
+        plan['group'] = parse_name(tokens, end - 1, 'имя столбца')
+        end -= 3
+
+    if pos < end:
+        pos = expect(tokens, pos, 'where')
+        plan['where'] = parse_where(tokens[pos:end], params)
+
+    for pos in range(options, len(tokens), 2):
+        keyword, value = tokens[pos].lower(), tokens[pos + 1]
+        if keyword == 'format':
+            if value.lower() not in OUTPUT_FORMATS:
+                raise ValueError(f'вид вывода должен быть одним из: {", ".join(OUTPUT_FORMATS)}.') # noqa: E501
+            plan['format'] = value.lower()
+            continue
+        number = parse_literal(value, params)
+        if isinstance(number, Placeholder):
+            number.count = True
+        elif type(number) is not int or number < 0:
+            raise ValueError(f'значение {keyword} должно быть неотрицательным целым числом.') # noqa: E501
+        plan[keyword] = number
+    return plan
+
+
+# Функция разбора команды в план
 @handle_db_errors
-def parser_clause(clause: str) -> dict:
-    '''
-    clause - условие where или set
-    '''
-    if len(clause) != 4:
-        print('Неправильный формат условия where или set.')
-        return {}
-  
-    if clause[0] == 'set' and clause[2] == '=':
-        value_to_return = ast.literal_eval(clause[3])
-        if str(type(value_to_return).__name__) in CURRENT_TYPES:
-            return {clause[1]: value_to_return}
-    
-        print(f'Тип данных {type(value_to_return).__name__} не поддерживается. Попробуйте снова.') # noqa: E501
-        return {}
-
-    if clause[0] == 'where' and clause[2] == '=':
-        value_to_return = ast.literal_eval(clause[3])
-        if str(type(value_to_return).__name__) in CURRENT_TYPES:
-            return {clause[1]: value_to_return}
-    
-        print(f'Тип данных {type(value_to_return).__name__} не поддерживается.')
-        return {}
-  
-    print('Неподдерживаемое ключевое значение.')
-    return {}
-    
-    
+@timed('parse')
+def parse_command(command: str, params: list = None) -> dict:
+    '''
+    command - строка команды,
+    params - список меток ? (None - параметры запрещены).
+    Функция разбирает команду в план - словарь с ключом command и уже
+    разобранными аргументами. При ошибке выводит сообщение и возвращает None.
+    '''
+    tokens = tokenize(command)
+    if not tokens:
+        return None
+    name = tokens[0].lower()
+    count = len(tokens)
+
+    match name:
+        case _ if name in SIMPLE_COMMANDS:
+            if count != 1:
+                raise ValueError(f'у команды {name} нет аргументов.')
+            return {'command': name}
+
+        case 'create_table':
+            if count < 3:
+                raise ValueError('неправильный формат ввода команды.')
+            return {'command': name, 'table': parse_name(tokens, 1), 'columns': tokens[2:]} # noqa: E501
+
+        case 'drop_table' | 'info' | 'vacuum':
+            if count != 2:
+                raise ValueError('неправильный формат ввода команды.')
+            return {'command': name, 'table': parse_name(tokens, 1)}
+
+        case 'insert':
+            pos = expect(tokens, 1, 'into')
+            table_name = parse_name(tokens, pos)
+            pos = expect(tokens, pos + 1, 'values')
+            return {'command': name, 'table': table_name, 'rows': parse_rows(tokens, pos, params)} # noqa: E501
+
+        case 'import':
+            if count != 4:
+                raise ValueError('неправильный формат ввода команды.')
+            expect(tokens, 2, 'from')
+            return {'command': name, 'table': parse_name(tokens, 1), 'path': tokens[3].strip('"\'')} # noqa: E501
+
+        case 'select':
+            return parse_select(tokens, params)
+
+        case 'update':
+            # update <таблица> set <столбец> = <выражение>[, ...]
+            # where <условие> [limit <n>]
+            table_name = parse_name(tokens, 1)
+            pos = expect(tokens, 2, 'set')
+            where_pos = next((index for index in range(pos, count) if tokens[index].lower() == 'where'), count) # noqa: E501
+            if where_pos == pos or where_pos == count:
+                raise ValueError('неправильный формат команды. Правильный формат: update <таблица> set <столбец> = <выражение>[, ...] where <условие> [limit <n>]') # noqa: E501
+            plan = {'command': name, 'table': table_name, 'set': parse_assignments(tokens[pos:where_pos], params), 'limit': None} # noqa: E501
+            end = count
+            if end - where_pos > 3 and tokens[end - 2].lower() == 'limit':
+                end -= 2
+            plan['where'] = parse_where(tokens[where_pos + 1:end], params)
+            if end < count:
+                limit = parse_literal(tokens[end + 1], params)
+                if isinstance(limit, Placeholder):
+                    limit.count = True
+                elif type(limit) is not int or limit < 0:
+                    raise ValueError('значение limit должно быть неотрицательным целым числом.') # noqa: E501
+                plan['limit'] = limit
+            return plan
+
+        case 'delete':
+            pos = expect(tokens, 1, 'from')
+            table_name = parse_name(tokens, pos)
+            pos = expect(tokens, pos + 1, 'where')
+            return {'command': name, 'table': table_name, 'where': parse_where(tokens[pos:], params)} # noqa: E501
+
+        case 'reseed':
+            if count not in (2, 3):
+                raise ValueError('неправильный формат ввода команды.')
+            if count == 3 and not tokens[2].isdigit():
+                raise ValueError('значение последовательности должно быть целым неотрицательным числом.') # noqa: E501
+            value = int(tokens[2]) if count == 3 else None
+            return {'command': name, 'table': parse_name(tokens, 1), 'value': value}
+
+        case 'create_index' | 'drop_index':
+            if count not in (3, 4):
+                raise ValueError('неправильный формат ввода команды.')
+            kind = tokens[3].lower() if count == 4 else 'hash'
+            return {'command': name, 'table': parse_name(tokens, 1), 'column': parse_name(tokens, 2, 'имя столбца'), 'kind': kind} # noqa: E501
+
+        case 'migrate':
+            if count != 4:
+                raise ValueError('неправильный формат ввода команды.')
+            expect(tokens, 2, 'to')
+            return {'command': name, 'table': parse_name(tokens, 1), 'backend': tokens[3].lower()} # noqa: E501
+
+        case 'cache':
+            action = tokens[1].lower() if count > 1 else ''
+            if count == 2 and action in ('stats', 'clear'):
+                return {'command': name, 'action': action}
+            if count == 3 and action == 'verbose' and tokens[2].lower() in ('on', 'off'): # noqa: E501
+                return {'command': name, 'action': action, 'value': tokens[2].lower() == 'on'} # noqa: E501
+            raise ValueError('неправильный формат ввода команды.')
+
+        case 'stats':
+            action = tokens[1].lower() if count > 1 else 'show'
+            if count <= 2 and action in ('show', 'on', 'off', 'reset'):
+                return {'command': name, 'action': action}
+            raise ValueError('неправильный формат ввода команды.')
+
+        case 'prepare':
+            # prepare <имя> as <команда с параметрами ?>
+            if count < 4:
+                raise ValueError('неправильный формат команды. Правильный формат: prepare <имя> as <команда>.') # noqa: E501
+            expect(tokens, 2, 'as')
+            statement_params = []
+            body = command.split(None, 3)[3]
+            statement = parse_command(body, statement_params)
+            if statement is None:
+                return None
+            if statement['command'] in ('prepare', 'execute', 'deallocate', 'exit'):
+                raise ValueError('подготовить можно только обычную команду.')
+            return {'command': name, 'name': parse_name(tokens, 1, 'имя команды'), 'plan': statement, 'params': len(statement_params)} # noqa: E501
+
+        case 'execute':
+            if count < 2:
+                raise ValueError('неправильный формат команды. Правильный формат: execute <имя> [<значение1>, <значение2>, ...].') # noqa: E501
+            values = tuple(parse_literal(token) for token in tokens[2:] if token != ',') # noqa: E501
+            return {'command': name, 'name': parse_name(tokens, 1, 'имя команды'), 'values': values} # noqa: E501
+
+        case 'deallocate':
+            if count != 2:
+                raise ValueError('неправильный формат ввода команды.')
+            return {'command': name, 'name': parse_name(tokens, 1, 'имя команды')}
+
+    print(f'Ошибка: функции {tokens[0]} нет в программе. Попробуйте снова.')
+    return None
+
+
+# Функция подстановки значений в подготовленный план
+def bind_plan(plan, values: tuple):
+    '''
+    plan - план подготовленной команды (или его часть),
+    values - значения параметров по порядку.
+    Функция возвращает копию плана, в которой метки ? заменены значениями.
+    Копируются только словари, списки и кортежи - значения не трогаются.
+    '''
+    if isinstance(plan, Placeholder):
+        value = values[plan.number]
+        if plan.count and (type(value) is not int or value < 0):
+            raise ValueError(f'значение limit/offset должно быть неотрицательным целым числом, а не {value}.') # noqa: E501
+        return value
+    if isinstance(plan, dict):
+        return {key: bind_plan(value, values) for key, value in plan.items()}
+    if isinstance(plan, list):
+        return [bind_plan(value, values) for value in plan]
+    if isinstance(plan, tuple):
+        return tuple(bind_plan(value, values) for value in plan)
+    return plan
+
+
+# Функция создания кэша планов
+def create_planner(max_entries: int = PLAN_CACHE_ENTRIES):
+    '''
+    max_entries - сколько планов хранить.
+    Функция создает разборщик команд с LRU кэшем планов: ключ - текст
+    команды без лишних пробелов. Повторная команда не разбирается заново.
+    Планы из кэша общие, поэтому изменять их нельзя.
+    '''
+    plans = OrderedDict()
+
+    def get_plan(command: str):
+        key = command.strip()
+        if '"' not in key and "'" not in key:
+            key = ' '.join(key.split())
+        plan = plans.get(key)
+        if plan is not None:
+            plans.move_to_end(key)
+            return plan
+        plan = parse_command(key)
+        if plan is not None:
+            plans[key] = plan
+            if len(plans) > max_entries:
+                plans.popitem(last=False)
+        return plan
+
+    return get_plan
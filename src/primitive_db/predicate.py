@@ -0,0 +1,187 @@
+# src/primitive_db/predicate.py
+import operator
+from functools import reduce
+from itertools import compress, filterfalse, repeat
+
+from .columns import equal_flags, equal_operands, gather
+from .decorators import timed
+from .index import index_lookup, index_supports
+from .metrics import count
+from .utils import row_count
+
+# Условие where - дерево словарей:
+#   {'column': столбец, 'op': оператор, 'value': значение} - сравнение,
+#   {'op': 'and' | 'or', 'args': [условия]}, {'op': 'not', 'args': [условие]}.
+# Результат части условия - либо отсортированный список позиций строк (его
+# дает индекс или проверка уже отобранных строк), либо маска: целое число,
+# в котором каждой строке соответствует один байт 0 или 1. Маски
+# складываются по and/or/not операциями & | ^ над всем столбцом сразу.
+LOGICAL_OPERATORS = ['and', 'or', 'not']
+# Операторы сравнения условия where
+OPERATORS = {
+    '=': operator.eq,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+
+# Функция обхода сравнений условия
+def where_leaves(where_clause: dict):
+    '''
+    where_clause - условие where.
+    Функция по порядку отдает все сравнения (листья) дерева условия.
+    '''
+    if where_clause['op'] in LOGICAL_OPERATORS:
+        for arg in where_clause['args']:
+            yield from where_leaves(arg)
+    else:
+        yield where_clause
+
+
+# Функция проверки, обслуживается ли условие индексами
+def uses_index(where_clause: dict, indexes: dict) -> bool:
+    '''
+    where_clause - условие where,
+    indexes - индексы таблицы.
+    Для and достаточно одного условия по индексу (остальные проверяются
+    только на найденных строках), для or индекс нужен каждой ветке.
+    '''
+    match where_clause['op']:
+        case 'and':
+            return any(uses_index(arg, indexes) for arg in where_clause['args'])
+        case 'or':
+            return all(uses_index(arg, indexes) for arg in where_clause['args'])
+        case 'not':
+            return False
+    index = indexes.get(where_clause['column'])
+    return index is not None and index_supports(index, where_clause['op'])
+
+
+# Функция проверки сравнения на списке значений
+def compare(values: list, op: str, value):
+    '''
+    values - значения столбца (или только проверяемых строк),
+    op - оператор сравнения,
+    value - значение условия (для between - пара границ).
+    Функция лениво отдает результат сравнения для каждого значения, проход
+    идет на стороне C (map).
+    '''
+    if op == 'between':
+        low, high = value
+        return map(
+            operator.and_,
+            map(operator.le, repeat(low), values),
+            map(operator.le, values, repeat(high)),
+        )
+    return map(OPERATORS[op], values, repeat(value))
+
+
+# Функция перевода маски в позиции строк
+def mask_positions(mask: int, rows: int) -> list:
+    return list(compress(range(rows), mask.to_bytes(rows, 'little')))
+
+
+# Функция перевода результата в маску
+def as_mask(result, rows: int) -> int:
+    '''
+    result - маска или список позиций,
+    rows - число строк таблицы.
+    '''
+    if isinstance(result, int):
+        return result
+    flags = bytearray(rows)
+    for position in result:
+        flags[position] = 1
+    return int.from_bytes(flags, 'little')
+
+
+# Функция вычисления условия
+def evaluate(where_clause: dict, table_data: dict, indexes: dict, rows: int, candidates: list = None, positions: bool = False): # noqa: E501
+    '''
+    where_clause - условие where,
+    table_data - данные таблицы,
+    indexes - индексы таблицы,
+    rows - число строк таблицы,
+    candidates - уже отобранные позиции (None - все строки),
+    positions - нужен список позиций, а не маска.
+    Если candidates заданы, результат - их подсписок. Иначе сравнение по
+    индексу дает список позиций, а без индекса столбец проходится целиком
+    и получается маска.
+    '''
+    match where_clause['op']:
+        case 'and':
+            # Сначала условия по индексам. Остальные условия проверяются
+            # только на строках, отобранных предыдущими
+            args = sorted(where_clause['args'], key=lambda arg: not uses_index(arg, indexes)) # noqa: E501
+            result = candidates
+            for arg in args:
+                if result is None:
+                    result = evaluate(arg, table_data, indexes, rows, positions=True)
+                    if isinstance(result, int):
+                        result = mask_positions(result, rows)
+                elif not result:
+                    break
+                else:
+                    result = evaluate(arg, table_data, indexes, rows, result)
+            return result
+
+        case 'or':
+            parts = [evaluate(arg, table_data, indexes, rows, candidates) for arg in where_clause['args']] # noqa: E501
+            if all(isinstance(part, list) for part in parts):
+                return sorted(set().union(*parts))
+            return reduce(operator.or_, (as_mask(part, rows) for part in parts))
+
+        case 'not':
+            part = evaluate(where_clause['args'][0], table_data, indexes, rows, candidates) # noqa: E501
+            if candidates is not None:
+                return list(filterfalse(set(part).__contains__, candidates))
+            return as_mask(part, rows) ^ int.from_bytes(b'\x01' * rows, 'little')
+
+    column_values = table_data[where_clause['column']]
+    op, value = where_clause['op'], where_clause['value']
+    if candidates is not None:
+        count('rows_scanned', len(candidates))
+        # Если отобрана заметная часть строк, маска равенства по кодам или
+        # битам строится на весь столбец сразу
+        flags = equal_flags(column_values, value) if op == '=' and len(candidates) * 8 >= rows else None # noqa: E501
+        if flags is not None:
+            return list(compress(candidates, map(flags.__getitem__, candidates)))
+        if op == '=':
+            column_values, value = equal_operands(column_values, value)
+        values = list(gather(column_values, candidates))
+        return list(compress(candidates, compare(values, op, value)))
+
+    index = indexes.get(where_clause['column'])
+    if index is not None:
+        found = index_lookup(index, op, value)
+        if found is not None:
+            count('rows_scanned', len(found))
+            return sorted(found)
+    count('rows_scanned', rows)
+    # Равенство по DictColumn и BitColumn проверяется по кодам и битам
+    flags = equal_flags(column_values, value) if op == '=' else None
+    if flags is not None:
+        if positions:
+            return list(compress(range(rows), flags))
+        return int.from_bytes(flags, 'little')
+    if positions:
+        return list(compress(range(rows), compare(column_values, op, value)))
+    return int.from_bytes(bytes(compare(column_values, op, value)), 'little')
+
+
+# Функция получения позиций строк по условию
+@timed('where')
+def where_positions(table_data: dict, where_clause: dict, indexes: dict = None) -> list: # noqa: E501
+    '''
+    table_data - данные таблицы,
+    where_clause - условие where,
+    indexes - индексы таблицы.
+    Функция возвращает отсортированные позиции строк, подходящих под условие.
+    '''
+    rows = row_count(table_data)
+    result = evaluate(where_clause, table_data, indexes or {}, rows, positions=True)
+    if isinstance(result, int):
+        return mask_positions(result, rows)
+    return result
@@ -0,0 +1,156 @@
+# src/primitive_db/render.py
+import sys
+from itertools import repeat
+
+import prettytable as pt
+
+from .columns import gather
+from .constants import PAGE_ROWS, STREAM_CHUNK_ROWS
+from .decorators import RUN_OPTIONS, timed
+
+# Виды вывода результата select
+OUTPUT_FORMATS = ['table', 'tsv', 'fixed', 'page']
+# Символы, которые в TSV заменяются escape-последовательностями
+TSV_ESCAPES = str.maketrans({'\t': '\\t', '\n': '\\n', '\\': '\\\\'})
+
+
+# Функция получения строк таблицы по позициям
+def iter_rows(table_data: dict, positions):
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк (список или range).
+    Функция лениво отдает строки кортежами, ничего не копируя заранее.
+    '''
+    return zip(*(gather(column, positions) for column in table_data.values()))
+
+
+# Функция перевода значений столбца в текст
+def column_strings(column: list, positions):
+    '''
+    column - значения столбца,
+    positions - позиции строк.
+    Функция лениво переводит значения в строки (на стороне C) и экранирует
+    табуляции и переводы строк в строковых значениях.
+    '''
+    values = map(str, gather(column, positions))
+    if column and isinstance(column[0], str):
+        return map(str.translate, values, repeat(TSV_ESCAPES))
+    return values
+
+
+# Функция перевода пачки строк в текст по столбцам
+def format_columns(table_data: dict, positions) -> list:
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк пачки.
+    '''
+    return [list(column_strings(column, positions)) for column in table_data.values()]
+
+
+# Функция вывода результата обычной таблицей
+def print_table(table_data: dict, positions) -> None:
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк для вывода.
+    '''
+    pretty_table = pt.PrettyTable()
+    pretty_table.field_names = table_data.keys()
+    pretty_table.add_rows(list(iter_rows(table_data, positions)))
+    print(pretty_table)
+
+
+# Функция потокового вывода в TSV
+def stream_tsv(table_data: dict, positions, out=None, chunk_rows: int = STREAM_CHUNK_ROWS) -> None: # noqa: E501
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк для вывода,
+    out - куда писать (по умолчанию stdout),
+    chunk_rows - сколько строк форматировать за раз.
+    Функция пишет строки пачками по мере их получения: в памяти
+    находится только текущая пачка.
+    '''
+    out = out or sys.stdout
+    out.write('\t'.join(table_data.keys()) + '\n')
+    for start in range(0, len(positions), chunk_rows):
+        columns = format_columns(table_data, positions[start:start + chunk_rows])
+        out.write(''.join(map('{}\n'.format, map('\t'.join, zip(*columns)))))
+    out.flush()
+
+
+# Функция потокового вывода колонками фиксированной ширины
+def stream_fixed(table_data: dict, positions, out=None, chunk_rows: int = STREAM_CHUNK_ROWS) -> None: # noqa: E501
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк для вывода,
+    out - куда писать (по умолчанию stdout),
+    chunk_rows - сколько строк форматировать за раз.
+    Ширина столбцов считается отдельным проходом по значениям без их
+    сохранения, затем строки пишутся пачками, как в stream_tsv.
+    '''
+    out = out or sys.stdout
+    names = list(table_data.keys())
+    widths = [
+        max(len(name), max(map(len, column_strings(column, positions)), default=0))
+        for name, column in zip(names, table_data.values())
+    ]
+    out.write('  '.join(map(str.ljust, names, widths)).rstrip() + '\n')
+    out.write('  '.join(map('-'.__mul__, widths)) + '\n')
+    for start in range(0, len(positions), chunk_rows):
+        columns = format_columns(table_data, positions[start:start + chunk_rows])
+        padded = [list(map(str.ljust, values, repeat(width))) for values, width in zip(columns, widths)] # noqa: E501
+        out.write(''.join(line.rstrip() + '\n' for line in map('  '.join, zip(*padded)))) # noqa: E501
+    out.flush()
+
+
+# Функция постраничного просмотра результата
+def page_view(table_data: dict, positions, page_rows: int = PAGE_ROWS) -> None:
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк для вывода,
+    page_rows - строк на странице.
+    Функция показывает результат по одной странице: Enter или n - следующая,
+    p - предыдущая, число - переход на страницу, q - выход. Строки
+    собираются только для текущей страницы. Если спрашивать некого (сервер),
+    выводится только первая страница.
+    '''
+    pages = max(1, -(-len(positions) // page_rows))
+    page = 0
+    while True:
+        print_table(table_data, positions[page * page_rows:(page + 1) * page_rows])
+        print(f'Страница {page + 1} из {pages}, записей: {len(positions)}')
+        if pages == 1 or not RUN_OPTIONS['interactive']:
+            return
+        try:
+            answer = input('[Enter/n] дальше, [p] назад, [номер] страница, [q] выход: ') # noqa: E501
+        except EOFError:
+            return
+        answer = answer.strip().lower()
+        if answer == 'q':
+            return
+        if answer.isdigit():
+            page = min(max(int(answer), 1), pages) - 1
+        elif answer == 'p':
+            page = max(page - 1, 0)
+        elif page + 1 < pages:
+            page += 1
+        else:
+            return
+
+
+# Функция вывода результата select в выбранном виде
+@timed('render')
+def render(table_data: dict, positions, output: str = 'table') -> None:
+    '''
+    table_data - данные таблицы,
+    positions - позиции строк результата,
+    output - вид вывода из OUTPUT_FORMATS.
+    '''
+    match output:
+        case 'tsv':
+            stream_tsv(table_data, positions)
+        case 'fixed':
+            stream_fixed(table_data, positions)
+        case 'page':
+            page_view(table_data, positions)
+        case _:
+            print_table(table_data, positions)
@@ -0,0 +1,145 @@
+# src/primitive_db/server.py
+import asyncio
+import io
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from .constants import SERVER_HOST, SERVER_MAX_LINE, SERVER_PORT
+from .decorators import RUN_OPTIONS
+from .engine import abort_transaction, close_session, create_session, run_loop
+from .metrics import enable_metrics
+
+# Протокол: клиент отправляет команды по одной на строку (UTF-8) и может
+# не дожидаться ответов (конвейер). На каждую команду сервер в том же
+# порядке отвечает строкой с длиной вывода в байтах и самим выводом:
+#   b'<n>\n' + n байт текста, который команда напечатала бы в консоли.
+# Команда exit (или quit) закрывает соединение, сервер продолжает работу.
+CLOSE_COMMANDS = ['exit', 'quit']
+
+
+# Функция кодирования ответа
+def encode_response(output: str) -> bytes:
+    payload = output.encode('utf-8')
+    return str(len(payload)).encode('ascii') + b'\n' + payload
+
+
+# Функция выполнения одной команды с перехватом вывода
+def execute_command(session: dict, command: str) -> str:
+    '''
+    session - сессия соединения,
+    command - текст команды.
+    Функция выполняется в единственном рабочем потоке сервера, поэтому
+    команды всех клиентов идут по одной над общей копией таблиц в памяти,
+    а цикл событий в это время продолжает принимать и отправлять данные.
+    '''
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            run_loop(session, [command])
+        except Exception as error:
+            print(f'Произошла непредвиденная ошибка: {error}')
+    return output.getvalue()
+
+
+# Функция обслуживания одного соединения
+async def handle_client(session: dict, executor, clients: set, reader, writer) -> None: # noqa: E501
+    '''
+    session - общая сессия сервера,
+    executor - рабочий поток для команд,
+    clients - открытые соединения (чтобы закрыть их при остановке),
+    reader, writer - потоки соединения.
+    У каждого соединения свои подготовленные команды и транзакция, остальное
+    (таблицы, индексы, кэши) общее. Незавершенная транзакция отменяется при
+    закрытии соединения.
+    '''
+    loop = asyncio.get_running_loop()
+    client_session = dict(session, prepared={}, transaction=None)
+    clients.add(writer)
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                writer.write(encode_response(f'Ошибка: команда длиннее {SERVER_MAX_LINE} байт.\n')) # noqa: E501
+                break
+            if not line:
+                break
+            command = line.decode('utf-8', errors='replace').strip()
+            if command.lower() in CLOSE_COMMANDS:
+                writer.write(encode_response('Соединение закрыто.\n'))
+                break
+            if not command:
+                writer.write(encode_response(''))
+                continue
+            output = await loop.run_in_executor(executor, execute_command, client_session, command) # noqa: E501
+            writer.write(encode_response(output))
+            # Пока клиент не читает ответы, новые команды не принимаются
+            await writer.drain()
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        clients.discard(writer)
+        writer.close()
+        if client_session['transaction'] is not None:
+            await loop.run_in_executor(executor, abort_transaction, client_session)
+
+
+# Функция работы сервера
+async def serve_forever(host: str, port: int, socket_path: str = None) -> None:
+    '''
+    host, port - адрес TCP сервера,
+    socket_path - путь Unix сокета (вместо TCP).
+    Сервер работает до SIGINT/SIGTERM, после чего записывает все изменения
+    на диск так же, как при выходе из консоли.
+    '''
+    session = create_session()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='primitive_db')
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except NotImplementedError:
+            pass
+
+    clients = set()
+
+    def on_client(reader, writer):
+        return handle_client(session, executor, clients, reader, writer)
+
+    if socket_path is not None:
+        server = await asyncio.start_unix_server(on_client, path=socket_path, limit=SERVER_MAX_LINE) # noqa: E501
+        address = socket_path
+    else:
+        server = await asyncio.start_server(on_client, host, port, limit=SERVER_MAX_LINE) # noqa: E501
+        address = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+    print(f'Сервер слушает {address}', file=sys.stderr)
+
+    await stop.wait()
+    server.close()
+    for writer in list(clients):
+        writer.close()
+    await server.wait_closed()
+    print('Сервер остановлен, изменения записываются на диск.', file=sys.stderr)
+    await loop.run_in_executor(executor, close_session, session)
+    executor.shutdown()
+
+
+# Функция запуска сервера
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, socket_path: str = None, metrics_file: str = None, metrics_interval: float = None) -> None: # noqa: E501
+    '''
+    host, port - адрес TCP сервера (порт 0 - любой свободный),
+    socket_path - путь Unix сокета,
+    metrics_file, metrics_interval - выгрузка метрик (см. engine.run).
+    Клиенты не могут отвечать на подтверждения и листать страницы, поэтому
+    подтверждения считаются принятыми, а format page выводит первую страницу.
+    '''
+    RUN_OPTIONS['assume_yes'] = True
+    RUN_OPTIONS['log_time'] = False
+    RUN_OPTIONS['interactive'] = False
+    if metrics_file is not None:
+        enable_metrics(dump_path=metrics_file, dump_interval=metrics_interval)
+    asyncio.run(serve_forever(host, port, socket_path))
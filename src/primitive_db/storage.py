@@ -0,0 +1,371 @@
+# src/primitive_db/storage.py
+import json as js
+import mmap
+import operator
+import os
+import sys
+import uuid
+import zlib
+from array import array
+from itertools import accumulate, chain, islice, repeat
+
+from .columns import (
+    UNPACK_BITS,
+    BitColumn,
+    DictColumn,
+    pack_bits,
+    pack_column,
+    pack_table,
+    plain_values,
+)
+from .constants import TABLE_PATH
+from .decorators import timed
+from .metrics import METRICS, count
+
+# Бинарный столбцовый формат (файл <таблица>.bin):
+#   8 байт MAGIC, 8 байт длина заголовка (little-endian), JSON заголовок
+#   {"rows": n, "token": ..., "columns": [{"name", "type", "offset", ...}]},
+#   затем секции столбцов (offset - от конца заголовка):
+#   int  - n чисел int64 little-endian,
+#   bool - битовая карта, (n + 7) // 8 байт, младший бит - первая строка,
+#   str  - n + 1 смещений int64 в блоб и UTF-8 блоб строк, каждая из которых
+#          завершается байтом NUL (строка i - blob[off[i]:off[i + 1] - 1]).
+MAGIC = b'PDBCOL1\n'
+
+
+# Класс таблицы, столбцы которой читаются из файла при первом обращении
+class LazyTable(dict):
+    '''
+    Словарь столбцов бинарной таблицы. Имена столбцов известны сразу, а
+    значения столбца декодируются из отображенного в память файла при первом
+    обращении к нему. Когда загружены все столбцы, отображение закрывается.
+    '''
+    def __init__(self, mapped: mmap.mmap, header: dict, base: int):
+        super().__init__((column['name'], None) for column in header['columns'])
+        self.mapped = mapped
+        self.rows = header['rows']
+        self.base = base
+        self.pending = {column['name']: column for column in header['columns']}
+
+    def __getitem__(self, name):
+        if name in self.pending:
+            values = decode_column(self.mapped, self.base, self.rows, self.pending.pop(name)) # noqa: E501
+            dict.__setitem__(self, name, values)
+            if not self.pending:
+                self.mapped.close()
+                self.mapped = None
+        return dict.__getitem__(self, name)
+
+    def __setitem__(self, name, values):
+        self.pending.pop(name, None)
+        dict.__setitem__(self, name, values)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+# Функция декодирования столбца из бинарного файла
+def decode_column(mapped: mmap.mmap, base: int, rows: int, column: dict):
+    '''
+    mapped - отображенный в память файл таблицы,
+    base - начало секций столбцов,
+    rows - число строк,
+    column - описание столбца из заголовка.
+    Функция возвращает столбец в компактном представлении (columns.py):
+    int и bool берутся из файла без распаковки в объекты Python. Пустой
+    столбец (пишется как int) возвращается списком: тип ему задаст первая
+    вставка.
+    '''
+    if not rows:
+        return []
+    start = base + column['offset']
+    match column['type']:
+        case 'int':
+            count('bytes_read', 8 * rows)
+            return read_int64(mapped[start:start + 8 * rows])
+        case 'bool':
+            bitmap = mapped[start:start + (rows + 7) // 8]
+            count('bytes_read', len(bitmap))
+            return BitColumn.from_bitmap(bitmap, rows)
+    values = decode_rows(mapped, start, rows, column, 0, rows)
+    return pack_column(values, column['type'])
+
+
+# Функция декодирования части строк столбца
+def decode_rows(mapped, start: int, rows: int, column: dict, first: int, last: int) -> list: # noqa: E501
+    '''
+    mapped - отображенный в память файл (или байты) с секцией столбца,
+    start - начало секции столбца,
+    rows - число строк в секции,
+    column - описание столбца (type и для str - split),
+    first, last - границы строк [first, last).
+    Читаются только байты нужных строк, поэтому процессы параллельного
+    скана декодируют каждый свою часть одного файла.
+    '''
+    match column['type']:
+        case 'int':
+            count('bytes_read', 8 * (last - first))
+            return read_int64(mapped[start + 8 * first:start + 8 * last]).tolist()
+        case 'bool':
+            bitmap = mapped[start + first // 8:start + (last + 7) // 8]
+            count('bytes_read', len(bitmap))
+            bits = chain.from_iterable(map(UNPACK_BITS.__getitem__, bitmap))
+            return list(islice(bits, first % 8, first % 8 + last - first))
+        case _:
+            offsets = read_int64(mapped[start + 8 * first:start + 8 * (last + 1)])
+            blob_start = start + 8 * (rows + 1)
+            blob = mapped[blob_start + offsets[0]:blob_start + offsets[-1]]
+            count('bytes_read', 8 * len(offsets) + len(blob))
+            if first == last:
+                return []
+            if column.get('split'):
+                # Внутри строк нет NUL, поэтому столбец режется одним split
+                return blob[:-1].decode('utf-8').split('\x00')
+            base = offsets[0]
+            slices = map(slice, map(operator.sub, offsets[:-1], repeat(base)), map(operator.sub, offsets[1:], repeat(base + 1))) # noqa: E501
+            return list(map(bytes.decode, map(blob.__getitem__, slices)))
+
+
+# Функция чтения массива int64 из байтов
+def read_int64(content: bytes) -> array:
+    values = array('q', content)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+# Функция кодирования массива int64 в байты
+def write_int64(values) -> bytes:
+    values = array('q', values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+# Функция кодирования столбца в байты
+def encode_column(values: list) -> tuple:
+    '''
+    values - значения столбца.
+    Функция возвращает (описание столбца, секция в байтах). Тип столбца
+    берется по первому значению (пустой столбец пишется как int).
+    Компактные столбцы пишутся без распаковки: битовая карта BitColumn и
+    array int64 - как есть, а строки DictColumn кодируются по одному разу.
+    '''
+    if isinstance(values, BitColumn):
+        return {'type': 'bool'}, bytes(values.bits)
+    if isinstance(values, array):
+        return {'type': 'int'}, write_int64(values)
+    if isinstance(values, DictColumn):
+        encoded = list(map(str.encode, values.values))
+        sizes = list(map(operator.add, map(len, encoded), repeat(1)))
+        blob = b'\x00'.join(map(encoded.__getitem__, values.codes)) + b'\x00'
+        split = b'\x00' not in b''.join(encoded)
+        offsets = write_int64(accumulate(map(sizes.__getitem__, values.codes), initial=0)) # noqa: E501
+        return {'type': 'str', 'split': split}, offsets + blob
+    if values and type(values[0]) is bool:
+        return {'type': 'bool'}, bytes(pack_bits(values))
+    if values and isinstance(values[0], str):
+        encoded = list(map(str.encode, values))
+        blob = b'\x00'.join(encoded) + b'\x00'
+        split = blob.count(b'\x00') == len(values)
+        sizes = map(operator.add, map(len, encoded), repeat(1))
+        offsets = write_int64(accumulate(sizes, initial=0))
+        return {'type': 'str', 'split': split}, offsets + blob
+    return {'type': 'int'}, write_int64(values)
+
+
+# Функция получения сырой секции еще не загруженного столбца
+def raw_column(table_data: LazyTable, name: str) -> tuple:
+    '''
+    table_data - ленивая таблица,
+    name - имя не загруженного столбца.
+    Столбец не изменялся, поэтому его секция копируется из старого файла
+    без декодирования.
+    '''
+    column = table_data.pending[name]
+    start = table_data.base + column['offset']
+    rows = table_data.rows
+    match column['type']:
+        case 'int':
+            end = start + 8 * rows
+        case 'bool':
+            end = start + (rows + 7) // 8
+        case _:
+            blob_start = start + 8 * (rows + 1)
+            end = blob_start + read_int64(table_data.mapped[blob_start - 8:blob_start])[0] # noqa: E501
+    description = {key: value for key, value in column.items() if key not in ('name', 'offset')} # noqa: E501
+    return description, table_data.mapped[start:end]
+
+
+# Функция загрузки таблицы из JSON
+def load_json(filepath) -> dict:
+    with open(filepath, 'rb') as tabledata_json:
+        content = tabledata_json.read()
+    count('bytes_read', len(content))
+    return pack_table(js.loads(content))
+
+
+# Функция сохранения таблицы в JSON
+def save_json(filepath, data: dict) -> None:
+    write_atomic(filepath, js.dumps({name: plain_values(column) for name, column in data.items()})) # noqa: E501
+
+
+# Функция открытия бинарной таблицы
+def load_binary(filepath) -> LazyTable:
+    '''
+    filepath - путь до .bin файла.
+    Функция отображает файл в память и читает только заголовок.
+    '''
+    with open(filepath, 'rb') as table_file:
+        mapped = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:8] != MAGIC:
+        mapped.close()
+        raise ValueError(f'файл {filepath} не является бинарной таблицей.')
+    header_size = int.from_bytes(mapped[8:16], 'little')
+    header = js.loads(mapped[16:16 + header_size])
+    count('bytes_read', 16 + header_size)
+    return LazyTable(mapped, header, 16 + header_size)
+
+
+# Функция сохранения бинарной таблицы
+def save_binary(filepath, data: dict) -> None:
+    '''
+    filepath - путь до .bin файла,
+    data - данные таблицы.
+    Не загруженные столбцы ленивой таблицы переписываются как есть.
+    '''
+    pending = data.pending if isinstance(data, LazyTable) else {}
+    names = list(data.keys())
+    rows = data.rows if isinstance(data, LazyTable) else 0
+    columns, sections, offset = [], [], 0
+    for name in names:
+        if name in pending:
+            description, section = raw_column(data, name)
+        else:
+            values = data[name]
+            rows = len(values)
+            description, section = encode_column(values)
+        columns.append({'name': name, 'offset': offset, **description})
+        sections.append(section)
+        offset += len(section)
+
+    header = js.dumps({'rows': rows, 'token': uuid.uuid4().hex, 'columns': columns}).encode('utf-8') # noqa: E501
+    write_atomic(filepath, [MAGIC, len(header).to_bytes(8, 'little'), header, *sections]) # noqa: E501
+
+
+# Функция получения отпечатка JSON снимка
+def json_stamp(filepath) -> list:
+    with open(filepath, 'rb') as snapshot_file:
+        content = snapshot_file.read()
+    return [len(content), zlib.crc32(content)]
+
+
+# Функция получения отпечатка бинарного снимка
+def binary_stamp(filepath) -> list:
+    '''
+    filepath - путь до .bin файла.
+    Каждая запись бинарного файла получает новый token в заголовке, поэтому
+    для отпечатка не нужно читать файл целиком.
+    '''
+    with open(filepath, 'rb') as snapshot_file:
+        head = snapshot_file.read(16)
+        header = js.loads(snapshot_file.read(int.from_bytes(head[8:], 'little')))
+    return [os.path.getsize(filepath), header['token']]
+
+
+# Форматы хранения таблиц: расширение файла, загрузка, сохранение и отпечаток
+BACKENDS = {
+    'json': {'suffix': '.json', 'load': load_json, 'save': save_json, 'stamp': json_stamp}, # noqa: E501
+    'binary': {'suffix': '.bin', 'load': load_binary, 'save': save_binary, 'stamp': binary_stamp}, # noqa: E501
+}
+DEFAULT_BACKEND = 'json'
+
+
+# Функция определения формата хранения таблицы
+def table_backend(table_name: str) -> str:
+    '''
+    table_name - имя таблицы.
+    Формат определяется по тому, какой файл таблицы лежит на диске.
+    '''
+    for name, backend in BACKENDS.items():
+        if name != DEFAULT_BACKEND and os.path.exists(TABLE_PATH / (table_name + backend['suffix'])): # noqa: E501
+            return name
+    return DEFAULT_BACKEND
+
+
+# Функция получения пути файла таблицы
+def table_file(table_name: str, backend: str = None):
+    backend = backend or table_backend(table_name)
+    return TABLE_PATH / (table_name + BACKENDS[backend]['suffix'])
+
+
+# Функция загрузки снимка таблицы
+@timed('load')
+def load_snapshot(table_name: str) -> dict:
+    return BACKENDS[table_backend(table_name)]['load'](table_file(table_name))
+
+
+# Функция сохранения снимка таблицы
+@timed('save')
+def save_snapshot(table_name: str, data: dict, backend: str = None) -> None:
+    '''
+    table_name - имя таблицы,
+    data - данные таблицы,
+    backend - формат (по умолчанию текущий формат таблицы).
+    После записи файлы таблицы в других форматах удаляются.
+    '''
+    backend = backend or table_backend(table_name)
+    BACKENDS[backend]['save'](table_file(table_name, backend), data)
+    for name in BACKENDS:
+        if name != backend and os.path.exists(table_file(table_name, name)):
+            os.remove(table_file(table_name, name))
+
+
+# Функция получения отпечатка снимка таблицы
+def snapshot_stamp(table_name: str) -> list:
+    backend = table_backend(table_name)
+    return BACKENDS[backend]['stamp'](table_file(table_name, backend))
+
+
+# Функция удаления файлов таблицы
+def remove_table_files(table_name: str) -> bool:
+    '''
+    table_name - имя таблицы.
+    Функция удаляет файлы таблицы во всех форматах и возвращает True,
+    если хотя бы один файл был найден.
+    '''
+    found = False
+    for name in BACKENDS:
+        path = table_file(table_name, name)
+        if os.path.exists(path):
+            os.remove(path)
+            found = True
+    return found
+
+
+# Функция атомарной записи файла
+def write_atomic(filepath, content) -> None:
+    '''
+    filepath - путь до файла,
+    content - содержимое файла: строка или список кусков в байтах.
+    Функция пишет содержимое во временный файл рядом и подменяет им исходный.
+    '''
+    tmp_path = str(filepath) + '.tmp'
+    if isinstance(content, str):
+        tmp_file = open(tmp_path, 'w', encoding='utf-8')
+        content = [content]
+    else:
+        tmp_file = open(tmp_path, 'wb')
+    with tmp_file:
+        tmp_file.writelines(content)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    if METRICS['enabled']:
+        count('bytes_written', os.path.getsize(tmp_path))
+    os.replace(tmp_path, filepath)
@@ -0,0 +1,160 @@
+# src/primitive_db/transaction.py
+from itertools import islice
+
+from .columns import gather, replace_values
+from .decorators import RUN_OPTIONS
+from .locks import acquire_lock, release_lock, table_lock_path
+from .utils import row_count
+from .wal import append_group, append_record
+
+# Транзакция - словарь:
+#   records - {таблица: [записи журнала]}, отложенные до commit,
+#   undo - журнал отмены [(таблица, запись отмены), ...] в порядке изменений.
+# Изменения транзакции сразу применяются к таблицам в памяти (их видят
+# следующие команды той же сессии), а в журналы на диске попадают только
+# при commit - одной строкой на таблицу (wal.append_group). Измененные
+# таблицы держатся под исключительной блокировкой до commit или rollback,
+# а буферный пул не пишет и не вытесняет их.
+# Записи отмены:
+#   ["t", число строк] - отрезать строки, дописанные вставкой,
+#   ["u", столбец, [позиции], [старые значения]] - вернуть значения,
+#   ["r", [позиции], {столбец: [значения]}] - вернуть удаленные строки,
+#   ["g", [записи отмены]] - отменить группу записей в обратном порядке.
+# Состояние транзакций процесса: open - открытые транзакции (у сервера по
+# одной на соединение), current - транзакция выполняемой сейчас команды
+# (ее выставляет engine.execute_plan).
+TRANSACTION_STATE = {'open': [], 'current': None}
+# Команды, недоступные внутри транзакции: их изменения нельзя отменить
+TRANSACTION_FORBIDDEN = [
+    'create_table', 'drop_table', 'create_index', 'drop_index', 'reseed',
+    'vacuum', 'migrate', 'checkpoint',
+]
+
+
+# Функция начала транзакции
+def begin_transaction() -> dict:
+    transaction = {'records': {}, 'undo': []}
+    TRANSACTION_STATE['open'].append(transaction)
+    return transaction
+
+
+# Функция поиска транзакции, изменившей таблицу
+def transaction_owner(table_name: str) -> dict:
+    for transaction in TRANSACTION_STATE['open']:
+        if table_name in transaction['records']:
+            return transaction
+    return None
+
+
+# Функция проверки, изменена ли таблица открытой транзакцией
+def in_transaction(table_name: str) -> bool:
+    return transaction_owner(table_name) is not None
+
+
+# Функция записи изменения таблицы
+def log_change(table_name: str, table_data: dict, record: list) -> None:
+    '''
+    table_name - имя таблицы,
+    table_data - данные таблицы до изменения,
+    record - запись журнала (см. wal.py).
+    Вызывается до изменения данных. Вне транзакции запись сразу дописывается
+    в журнал. В транзакции запоминается запись отмены, а запись журнала
+    откладывается до commit.
+    '''
+    transaction = TRANSACTION_STATE['current']
+    if transaction is None:
+        append_record(table_name, record)
+        return
+    if table_name not in transaction['records']:
+        # Блокировка команды уже захвачена, здесь она только продлевается
+        # до конца транзакции
+        acquire_lock(table_lock_path(table_name), exclusive=True)
+        transaction['records'][table_name] = []
+    transaction['undo'].append((table_name, undo_record(table_data, record)))
+    if RUN_OPTIONS['wal']:
+        transaction['records'][table_name].append(record)
+
+
+# Функция получения записи отмены
+def undo_record(table_data: dict, record: list) -> list:
+    '''
+    table_data - данные таблицы до изменения,
+    record - запись журнала.
+    '''
+    match record[0]:
+        case 'i':
+            return ['t', row_count(table_data)]
+        case 'u' | 's':
+            column = table_data[record[1]]
+            return ['u', record[1], record[2], list(gather(column, record[2]))]
+        case 'd':
+            rows = {name: list(gather(column, record[1])) for name, column in table_data.items()} # noqa: E501
+            return ['r', record[1], rows]
+        case 't':
+            # Записи группы (update нескольких столбцов) меняют разные
+            # столбцы, поэтому их старые значения берутся до всей группы
+            return ['g', [undo_record(table_data, group_record) for group_record in record[1]]] # noqa: E501
+    raise ValueError(f'неизвестная запись журнала {record[0]}.')
+
+
+# Функция применения записи отмены
+def apply_undo(table_data: dict, undo: list) -> None:
+    match undo[0]:
+        case 't':
+            for column in table_data.values():
+                del column[undo[1]:]
+        case 'u':
+            column = table_data[undo[1]]
+            for position, value in zip(undo[2], undo[3]):
+                column[position] = value
+        case 'r':
+            for name, column in table_data.items():
+                # Позиции - номера строк до удаления, по возрастанию
+                restored = []
+                remaining = iter(column)
+                for position, value in zip(undo[1], undo[2][name]):
+                    restored.extend(islice(remaining, position - len(restored)))
+                    restored.append(value)
+                restored.extend(remaining)
+                replace_values(column, restored)
+        case 'g':
+            for group_undo in reversed(undo[1]):
+                apply_undo(table_data, group_undo)
+
+
+# Функция фиксации транзакции
+def commit_transaction(transaction: dict) -> list:
+    '''
+    transaction - транзакция из begin_transaction.
+    Функция дописывает отложенные записи в журналы и возвращает имена
+    измененных таблиц. Блокировки снимает release_transaction. Если запись
+    прервалась, транзакция все равно закрывается: недописанную группу
+    дописывает wal.recover_groups при следующем запуске.
+    '''
+    try:
+        append_group(transaction['records'])
+    finally:
+        TRANSACTION_STATE['open'].remove(transaction)
+    return list(transaction['records'])
+
+
+# Функция отката транзакции
+def rollback_transaction(transaction: dict, tables: dict) -> list:
+    '''
+    transaction - транзакция из begin_transaction,
+    tables - таблицы в памяти {имя: данные} (буферный пул).
+    Функция применяет записи отмены в обратном порядке и возвращает имена
+    измененных таблиц. Индексы и кэши этих таблиц вызывающий сбрасывает.
+    '''
+    try:
+        for table_name, undo in reversed(transaction['undo']):
+            apply_undo(tables[table_name], undo)
+    finally:
+        TRANSACTION_STATE['open'].remove(transaction)
+    return list(transaction['records'])
+
+
+# Функция снятия блокировок транзакции
+def release_transaction(transaction: dict) -> None:
+    for table_name in transaction['records']:
+        release_lock(table_lock_path(table_name))
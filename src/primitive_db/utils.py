@@ -1,10 +1,16 @@
 # src/primitive_db/utils.py
 import json as js
+import sys
 
 import prompt as pr
 
-from .constants import COMMANDS, TABLE_PATH
+from .columns import column_bytes, compress_column
+from .constants import COMMANDS
 from .decorators import handle_db_errors
+from .storage import load_snapshot, save_snapshot, write_atomic
+
+# Сколько элементов столбца просматривать для оценки размера таблицы
+SIZE_SAMPLE = 64
 
 
 # Функция запроса ввода
@@ -36,30 +42,28 @@ def save_metadata(filepath: str, data: dict) -> None:
     '''
     filepath - путь до .json файла,
     data - текущие мета данные.
-    Функция выгружает текущие мета данные из программы и записывает их
-    в файл для мета данных
+    Функция выгружает текущие мета данные из программы и атомарно записывает
+    их в файл для мета данных. Возвращает True при успехе.
     '''
     saved_metadata = js.dumps(data)
-    with open(filepath, 'w', encoding='utf-8') as metadata_json:
-        metadata_json.write(saved_metadata)
-    return
+    write_atomic(filepath, saved_metadata)
+    return True
 
 
-# Функция загрузки данных таблицы из .json файла таблицы
+# Функция загрузки данных таблицы
 @handle_db_errors
 def load_table_data(table_name: str) -> dict:
     '''
     table_name - имя таблицы.
     Функция принимает на вход имя таблицы, и если такая таблица существует,
-    то загружает данные таблицы в программу.
+    то загружает данные таблицы в программу. Формат файла (json или binary)
+    определяется модулем storage.
     '''
     clean_table_name = table_name.strip().lower()
-    with open(TABLE_PATH / (clean_table_name + '.json'), encoding='utf-8') as tabledata_json: # noqa: E501
-        loaded_tabledata = js.load(tabledata_json)
-    return loaded_tabledata
+    return load_snapshot(clean_table_name)
     
 
-# Функция сохранения данных таблицы в .json файл
+# Функция сохранения данных таблицы
 @handle_db_errors
 def save_table_data(table_name: str, data: dict) -> None:
     '''
@@ -67,13 +71,79 @@ def save_table_data(table_name: str, data: dict) -> None:
     data - загружаемые данные таблицы.
     Функция принимаем имя таблицы и загружаемые данные, и если таблица
     существует (существует ее файл), то загружает в него актуальные данные.
+    Запись идет во временный файл, который затем атомарно подменяет старый,
+    поэтому сбой посреди записи не портит таблицу. Возвращает True при успехе.
     '''
     clean_table_name = table_name.strip().lower()
-    
-    saved_tabledata = js.dumps(data)
-    with open(TABLE_PATH / (clean_table_name + '.json'), 'w', encoding='utf-8') as tabledata_json: # noqa: E501
-        tabledata_json.write(saved_tabledata)
-    return
+    save_snapshot(clean_table_name, data)
+    return True
+
+
+# Функция построения маски уцелевших строк
+def keep_mask(row_count: int, positions: list) -> bytearray:
+    '''
+    row_count - число строк в таблице,
+    positions - позиции удаляемых строк.
+    Функция возвращает маску, где 1 - строка остается, 0 - удаляется.
+    '''
+    mask = bytearray(b'\x01') * row_count
+    for pos in positions:
+        mask[pos] = 0
+    return mask
+
+
+# Функция удаления строк по маске
+def remove_rows(table_data: dict, mask: bytearray) -> None:
+    '''
+    table_data - данные таблицы,
+    mask - маска уцелевших строк.
+    Функция за один проход по каждому столбцу оставляет только строки,
+    отмеченные в маске. Столбцы изменяются на месте.
+    '''
+    for column in table_data.values():
+        compress_column(column, mask)
+
+
+# Функция получения числа строк таблицы
+def row_count(table_data: dict) -> int:
+    '''
+    table_data - данные таблицы.
+    Функция берет длину любого уже загруженного столбца, поэтому не
+    загружает столбцы ленивой таблицы (storage.LazyTable).
+    '''
+    for name in table_data.keys():
+        column = dict.get(table_data, name)
+        if column is not None:
+            return len(column)
+    return getattr(table_data, 'rows', 0)
+
+
+# Функция оценки размера таблицы в памяти
+def estimate_size(table_data: dict) -> int:
+    '''
+    table_data - данные таблицы (или результат select - список позиций).
+    Функция оценивает занимаемую таблицей память по первым элементам
+    каждого столбца, не проходя столбцы целиком. Размер компактных столбцов
+    (columns.py) известен точно.
+    '''
+    if not isinstance(table_data, dict):
+        table_data = {'': table_data}
+    total = sys.getsizeof(table_data)
+    for name in table_data.keys():
+        # dict.get не загружает ленивые столбцы (storage.LazyTable)
+        column = dict.get(table_data, name)
+        if column is None:
+            continue
+        if not isinstance(column, list):
+            total += column_bytes(column)
+            continue
+        total += sys.getsizeof(column)
+        sample = column[:SIZE_SAMPLE]
+        if sample:
+            avg = sum(map(sys.getsizeof, sample)) / len(sample)
+            total += int(avg * len(column))
+    return total
+
 
 # Функция отображения помощи
 def print_help() -> None:
@@ -84,29 +154,3 @@ def print_help() -> None:
         print(f'<command> {command} - {COMMANDS[command]}')
     
     return
-    
-
-@handle_db_errors
-# Функция получения/записи кэша
-def create_cacher():
-    cache = {}
-
-    def cache_result(key, value_func, mode, *args, **kwargs):
-        if mode in ('insert', 'update', 'delete', 'drop'):
-            for key_cache in list(cache.keys()):
-                if key_cache.split('_')[0] == key.split('_')[0]:
-                    del cache[key_cache]
-            return
-        else:
-            if key in cache:
-                print('Получено значение из кэша!')
-                return cache[key]
-            else:
-                result = value_func(*args, **kwargs)
-                cache[key] = result
-                print('Запрос кэширован.')
-                return result
-
-    return cache_result
-    
-    
@@ -0,0 +1,263 @@
+# src/primitive_db/wal.py
+import json as js
+import os
+import uuid
+from contextlib import ExitStack
+
+from .columns import pack_table
+from .constants import TABLE_PATH, WAL_COMPACT_MIN_BYTES
+from .decorators import RUN_OPTIONS, handle_db_errors, timed
+from .locks import table_lock
+from .metrics import count
+from .storage import snapshot_stamp, table_file, write_atomic
+from .utils import keep_mask, remove_rows, save_table_data
+
+# Формат записей журнала (одна JSON-строка на запись):
+#   ["i", [[id, значение1, ...], ...]] - вставка строк,
+#   ["u", столбец, [позиции], значение] - обновление одним значением,
+#   ["s", столбец, [позиции], [значения]] - обновление вычисленными значениями,
+#   ["d", [позиции]] - удаление,
+#   ["t", [записи]] - изменения транзакции или update нескольких столбцов
+#   (строка либо дописана целиком и применяется вся, либо оборвана при сбое
+#   и отрезается).
+# Первая строка журнала - заголовок {"base": отпечаток} снимка, поверх
+# которого журнал ведется (см. storage.snapshot_stamp).
+# Транзакция, изменившая несколько таблиц, сначала атомарно пишет файл
+# <uuid>.txn со строками для всех журналов и только потом дописывает их.
+# Если процесс упал посреди записи, recover_groups дописывает остаток.
+GROUP_SUFFIX = '.txn'
+
+
+# Функция получения пути журнала таблицы
+def log_path(table_name: str):
+    return TABLE_PATH / (table_name + '.log')
+
+
+# Функция дописывания записи в журнал
+@timed('wal')
+def append_record(table_name: str, record: list) -> None:
+    '''
+    table_name - имя таблицы,
+    record - запись журнала.
+    Функция дописывает одну запись в конец журнала таблицы. Стоимость записи
+    не зависит от размера таблицы. В пакетном режиме журнал не ведется:
+    изменения попадают на диск на контрольных точках и в конце работы.
+    '''
+    if not RUN_OPTIONS['wal']:
+        return
+    path = log_path(table_name)
+    write_lines(path, record_lines(table_name, path, [record]))
+
+
+# Функция получения строк журнала для записей
+def record_lines(table_name: str, path, records: list) -> str:
+    '''
+    table_name - имя таблицы,
+    path - путь журнала таблицы,
+    records - записи журнала.
+    Если журнала еще нет, строки начинаются с заголовка.
+    '''
+    lines = ''
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        lines = js.dumps({'base': snapshot_stamp(table_name)}) + '\n'
+    return lines + ''.join(js.dumps(record, separators=(',', ':')) + '\n' for record in records) # noqa: E501
+
+
+# Функция дописывания строк в журнал
+def write_lines(path, lines: str) -> None:
+    with open(path, 'a', encoding='utf-8') as log_file:
+        log_file.write(lines)
+    count('bytes_written', len(lines))
+
+
+# Функция записи изменений транзакции
+@timed('wal')
+def append_group(groups: dict) -> None:
+    '''
+    groups - {таблица: [записи журнала]}.
+    Изменения каждой таблицы дописываются в ее журнал одной строкой ["t", ...],
+    то есть одной записью на таблицу независимо от числа команд. Для
+    нескольких таблиц сначала атомарно (временный файл и rename) пишется
+    файл группы: после сбоя группа либо не видна совсем, либо дописывается
+    до конца (recover_groups). Вызывающий держит исключительные блокировки
+    всех таблиц группы.
+    '''
+    if not RUN_OPTIONS['wal']:
+        return
+    entries = {}
+    for table_name, records in groups.items():
+        if records:
+            path = log_path(table_name)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            entries[table_name] = {'offset': offset, 'lines': record_lines(table_name, path, [['t', records]])} # noqa: E501
+    group_path = None
+    if len(entries) > 1:
+        group_path = TABLE_PATH / (uuid.uuid4().hex + GROUP_SUFFIX)
+        write_atomic(group_path, js.dumps(entries))
+    for table_name, entry in entries.items():
+        write_lines(log_path(table_name), entry['lines'])
+    if group_path is not None:
+        os.remove(group_path)
+
+
+# Функция дозаписи групп изменений после сбоя
+def recover_groups() -> int:
+    '''
+    Функция находит файлы групп, которые не успел удалить упавший процесс,
+    и под блокировками их таблиц дописывает в журналы недостающие строки.
+    Журнал, в котором строки группы уже есть целиком, не трогается, а
+    оборванная строка группы заменяется целой. Возвращает число групп.
+    '''
+    recovered = 0
+    for group_path in sorted(TABLE_PATH.glob('*' + GROUP_SUFFIX)):
+        try:
+            with open(group_path, encoding='utf-8') as group_file:
+                entries = js.load(group_file)
+        except (OSError, ValueError):
+            continue
+        with ExitStack() as locks:
+            for table_name in sorted(entries):
+                locks.enter_context(table_lock(table_name, exclusive=True))
+            if not group_path.exists():
+                continue
+            for table_name, entry in entries.items():
+                recover_lines(log_path(table_name), entry['offset'], entry['lines'])
+            os.remove(group_path)
+        recovered += 1
+    return recovered
+
+
+# Функция дозаписи строк группы в журнал
+def recover_lines(path, offset: int, lines: str) -> None:
+    '''
+    path - путь журнала,
+    offset - размер журнала перед записью группы,
+    lines - строки группы.
+    Если журнал короче offset, он уже свернут в снимок (или удален вместе
+    с таблицей), и дописывать некуда.
+    '''
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size < offset:
+        return
+    if size >= offset + len(lines):
+        return
+    if size > offset:
+        os.truncate(path, offset)
+    write_lines(path, lines)
+
+
+# Функция применения записи журнала к данным таблицы
+def apply_record(table_data: dict, record: list) -> None:
+    '''
+    table_data - данные таблицы,
+    record - запись журнала.
+    Функция повторяет над столбцами таблицы операцию из журнала.
+    '''
+    columns = list(table_data.keys())
+    match record[0]:
+        case 'i':
+            for name, values in zip(columns, zip(*record[1])):
+                table_data[name].extend(values)
+        case 'u':
+            column = table_data[record[1]]
+            for pos in record[2]:
+                column[pos] = record[3]
+        case 's':
+            column = table_data[record[1]]
+            for pos, value in zip(record[2], record[3]):
+                column[pos] = value
+        case 'd':
+            remove_rows(table_data, keep_mask(len(table_data[columns[0]]), record[1]))
+        case 't':
+            for transaction_record in record[1]:
+                apply_record(table_data, transaction_record)
+
+
+# Функция восстановления таблицы по журналу
+@timed('replay')
+def replay(table_name: str, table_data: dict, offset: int = 0) -> int:
+    '''
+    table_name - имя таблицы,
+    table_data - данные, загруженные из снимка,
+    offset - с какого байта журнала читать (0 - весь журнал с заголовком).
+    Функция применяет к снимку записи журнала и возвращает их количество.
+    Журнал от старого снимка (сбой после записи снимка) удаляется.
+    Оборванная при сбое последняя строка отрезается. С offset применяются
+    только записи, которые другой процесс дописал после уже прочитанных.
+    '''
+    path = log_path(table_name)
+    if not os.path.exists(path):
+        return 0
+
+    applied = 0
+    good_offset = offset
+    with open(path, 'rb') as log_file:
+        if offset:
+            log_file.seek(offset)
+        else:
+            header = log_file.readline()
+            try:
+                base = js.loads(header)['base']
+            except (ValueError, KeyError, TypeError):
+                base = None
+            if base != snapshot_stamp(table_name):
+                log_file.close()
+                os.remove(path)
+                return 0
+            good_offset = log_file.tell()
+
+        for line in log_file:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = js.loads(line)
+            except ValueError:
+                break
+            apply_record(table_data, record)
+            applied += 1
+            good_offset += len(line)
+
+    count('bytes_read', good_offset - offset)
+    if not offset and applied:
+        # Столбцы, пустые в снимке, получают представление по данным журнала
+        pack_table(table_data)
+    if good_offset < os.path.getsize(path):
+        os.truncate(path, good_offset)
+    return applied
+
+
+# Функция проверки, пора ли сжимать журнал
+def needs_compaction(table_name: str) -> bool:
+    '''
+    table_name - имя таблицы.
+    Журнал сжимается, когда он становится больше снимка (но не меньше
+    WAL_COMPACT_MIN_BYTES), поэтому суммарная стоимость сжатий линейна.
+    Без журнала (пакетный режим) он не растет и проверять нечего.
+    '''
+    if not RUN_OPTIONS['wal']:
+        return False
+    path = log_path(table_name)
+    if not os.path.exists(path):
+        return False
+    log_size = os.path.getsize(path)
+    snapshot_size = os.path.getsize(table_file(table_name))
+    return log_size > max(WAL_COMPACT_MIN_BYTES, snapshot_size)
+
+
+# Функция сжатия журнала в снимок
+@handle_db_errors
+def compact(table_name: str, table_data: dict) -> None:
+    '''
+    table_name - имя таблицы,
+    table_data - актуальные данные таблицы.
+    Функция атомарно записывает новый снимок таблицы и удаляет журнал.
+    '''
+    if save_table_data(table_name=table_name, data=table_data):
+        remove_log(table_name)
+
+
+# Функция удаления журнала
+def remove_log(table_name: str) -> None:
+    path = log_path(table_name)
+    if os.path.exists(path):
+        os.remove(path)
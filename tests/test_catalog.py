@@ -0,0 +1,56 @@
+# tests/test_catalog.py
+import os
+import tempfile
+import unittest
+
+# Мета данные тестов лежат во временном каталоге: путь читается при импорте
+TEST_DIR = tempfile.mkdtemp()
+os.environ['PRIMITIVE_DB_META'] = os.path.join(TEST_DIR, 'db_meta.json')
+os.environ['PRIMITIVE_DB_DATA'] = TEST_DIR
+
+from src.primitive_db.catalog import (  # noqa: E402
+    CATALOG_STATE,
+    allocate_ids,
+    table_options,
+)
+from src.primitive_db.constants import META_FILEPATH, SEQUENCE_BLOCK  # noqa: E402
+from src.primitive_db.utils import load_metadata, save_metadata  # noqa: E402
+
+
+class AllocateIdsTest(unittest.TestCase):
+    def setUp(self):
+        CATALOG_STATE['sequences'].clear()
+        self.metadata = {'users': {'id': 'int', 'name': 'str'}}
+        table_options(self.metadata, 'users')
+        save_metadata(filepath=META_FILEPATH, data=self.metadata)
+
+    # Функция выдачи id пачками заданных размеров
+    def allocate(self, batches: list) -> list:
+        ids = []
+        for count in batches:
+            first_id = allocate_ids(self.metadata, 'users', [], count)
+            ids.extend(range(first_id, first_id + count))
+        return ids
+
+    def test_batches_across_blocks_are_contiguous(self):
+        batches = [SEQUENCE_BLOCK // 3, SEQUENCE_BLOCK, 1, SEQUENCE_BLOCK * 2, 7] * 3
+        ids = self.allocate(batches)
+        self.assertEqual(ids, list(range(1, sum(batches) + 1)))
+
+    def test_block_of_another_process_is_skipped(self):
+        first = self.allocate([10])
+        stored = load_metadata(filepath=META_FILEPATH)
+        taken = table_options(stored, 'users')['reserved'] + 500
+        table_options(stored, 'users')['reserved'] = taken
+        save_metadata(filepath=META_FILEPATH, data=stored)
+        # Текущий блок еще не кончился: id выдаются из него
+        self.assertEqual(self.allocate([5]), list(range(11, 16)))
+        # Новый блок начинается за границей другого процесса
+        rest = self.allocate([SEQUENCE_BLOCK * 2])
+        self.assertEqual(first, list(range(1, 11)))
+        self.assertEqual(rest[0], taken + 1)
+        self.assertEqual(rest, list(range(taken + 1, taken + 1 + SEQUENCE_BLOCK * 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()